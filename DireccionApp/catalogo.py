@@ -0,0 +1,108 @@
+# DireccionApp/catalogo.py
+"""
+Catálogo geográfico Región → Ciudad → Comuna en memoria.
+
+Son datos fijos (ver db_seed/insert_data.sql y la migración 0002), así
+que se leen una vez por proceso con 3 consultas y se guardan en
+estructuras inmutables (tuplas y MappingProxyType). Las vistas de los
+combos responden desde aquí, con ETag y Cache-Control; el árbol completo
+también se sirve como un JSON con hash de contenido en la URL, que el
+navegador puede guardar sin volver a pedirlo.
+
+Si se cambian las tablas de geografía hay que reiniciar el proceso (o
+llamar a recargar_catalogo()).
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from .models import Ciudad, Comuna, Region
+
+# Ciudades cuyo combo de comunas también muestra las de otras ciudades.
+# Santiago (22) incluye las provincias vecinas de la Región Metropolitana.
+CIUDADES_AGRUPADAS = MappingProxyType({
+    22: (22, 23, 24, 25, 26, 27),
+})
+
+
+@dataclass(frozen=True)
+class CatalogoGeografico:
+    regiones: tuple                 # ((regi_id, regi_nom), ...)
+    ciudades_por_region: MappingProxyType   # regi_id -> ((ciuda_id, ciuda_nom), ...)
+    comunas_por_ciudad: MappingProxyType    # ciuda_id -> ((comun_id, comun_nom), ...) con CIUDADES_AGRUPADAS
+    nombre_region: MappingProxyType         # regi_id -> regi_nom
+    nombre_ciudad: MappingProxyType         # ciuda_id -> ciuda_nom
+    nombre_comuna: MappingProxyType         # comun_id -> comun_nom
+    contenido: bytes                # árbol completo en JSON (bundle)
+    version: str                    # hash del contenido: ETag y nombre del bundle
+
+    def ciudades(self, regi_id):
+        return [{"ciuda_id": i, "ciuda_nom": n} for i, n in self.ciudades_por_region.get(regi_id, ())]
+
+    def comunas(self, ciuda_id):
+        return [{"comun_id": i, "comun_nom": n} for i, n in self.comunas_por_ciudad.get(ciuda_id, ())]
+
+
+def _agrupar(filas):
+    """[(padre, id, nombre)] ordenadas por nombre -> {padre: ((id, nombre), ...)}."""
+    grupos = {}
+    for padre, id_, nombre in filas:
+        grupos.setdefault(padre, []).append((id_, nombre))
+    return {padre: tuple(hijos) for padre, hijos in grupos.items()}
+
+
+def _cargar() -> CatalogoGeografico:
+    regiones = tuple(Region.objects.order_by("regi_nom").values_list("regi_id", "regi_nom"))
+    ciudades = list(Ciudad.objects.order_by("ciuda_nom").values_list("regi_id", "ciuda_id", "ciuda_nom"))
+    comunas = list(Comuna.objects.order_by("comun_nom").values_list("ciuda_id", "comun_id", "comun_nom"))
+
+    comunas_propias = _agrupar(comunas)
+    comunas_por_ciudad = dict(comunas_propias)
+    for ciuda_id, incluidas in CIUDADES_AGRUPADAS.items():
+        comunas_por_ciudad[ciuda_id] = tuple(sorted(
+            (c for incluida in incluidas for c in comunas_propias.get(incluida, ())),
+            key=lambda c: c[1],
+        ))
+
+    ciudades_por_region = _agrupar(ciudades)
+    arbol = {
+        "regiones": [{"regi_id": i, "regi_nom": n} for i, n in regiones],
+        "ciudades": {str(r): [[i, n] for i, n in hijos] for r, hijos in ciudades_por_region.items()},
+        "comunas": {str(c): [[i, n] for i, n in hijos] for c, hijos in comunas_por_ciudad.items()},
+    }
+    contenido = json.dumps(arbol, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode()
+
+    return CatalogoGeografico(
+        regiones=regiones,
+        ciudades_por_region=MappingProxyType(ciudades_por_region),
+        comunas_por_ciudad=MappingProxyType(comunas_por_ciudad),
+        nombre_region=MappingProxyType(dict(regiones)),
+        nombre_ciudad=MappingProxyType({ciuda_id: nom for _, ciuda_id, nom in ciudades}),
+        nombre_comuna=MappingProxyType({comun_id: nom for _, comun_id, nom in comunas}),
+        contenido=contenido,
+        version=hashlib.sha256(contenido).hexdigest()[:16],
+    )
+
+
+_catalogo = None
+_lock = threading.Lock()
+
+
+def obtener_catalogo() -> CatalogoGeografico:
+    """Catálogo del proceso (se carga la primera vez que se pide)."""
+    global _catalogo
+    if _catalogo is None:
+        with _lock:
+            if _catalogo is None:
+                _catalogo = _cargar()
+    return _catalogo
+
+
+def recargar_catalogo() -> CatalogoGeografico:
+    """Vuelve a leer las tablas (por ejemplo, tras cargar geografía nueva)."""
+    global _catalogo
+    with _lock:
+        _catalogo = _cargar()
+    return _catalogo
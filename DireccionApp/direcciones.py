@@ -0,0 +1,190 @@
+# DireccionApp/direcciones.py
+"""
+Direcciones compartidas y depuración en bloque.
+
+Cada fila de DIRECCION tiene una huella única (dire_hash) de sus campos
+normalizados, así que dos personas con la misma dirección apuntan a la
+misma fila. Al guardar, la persona pasa a apuntar a la fila con esa
+huella (o a una nueva); solo si la dirección que ya tenía no la comparte
+nadie más se edita en el lugar, lo que además permite corregir tildes o
+mayúsculas (misma huella, texto distinto). Si la comparte, la corrección
+no se puede aplicar (la huella es única y no se cambia la dirección de
+los demás): escritura_distinta() lo detecta para avisar a quien guardó.
+
+Las filas que quedan sin uso no se borran en cada escritura (antes un
+signal contaba referencias en cada borrado); las limpia en bloque
+`manage.py depurar_direcciones`, que además fusiona los duplicados
+anteriores a la huella.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, When
+
+from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.versiones import invalidar_version
+from .models import Direccion
+from .normalizacion import hash_direccion
+
+LOTE = 1000
+CAMPOS_TEXTO = ("dire_calle", "dire_num", "dire_otros", "dire_cod_postal")
+
+
+def _solo_la_usa_una(dire_id) -> bool:
+    return EmpresaPersona.objects.filter(emppe_dire_id=dire_id)[:2].count() <= 1
+
+
+def direccion_para(datos: dict, actual_id=None) -> Direccion:
+    """
+    Dirección con `datos` (dire_calle, dire_num, dire_otros,
+    dire_cod_postal, regi_id, ciuda_id, comun_id).
+
+    `actual_id` es la dirección que la persona usa hoy. Si ninguna otra
+    persona la comparte se actualiza en el lugar (salvo que los datos
+    nuevos ya existan en otra fila, que entonces se reutiliza). Si no,
+    se devuelve la existente con la misma huella o una nueva.
+    """
+    huella = hash_direccion(**datos)
+    existente = Direccion.objects.filter(dire_hash=huella).first()
+    if existente is not None and existente.pk != actual_id:
+        return existente
+
+    if actual_id is not None:
+        try:
+            with transaction.atomic():
+                actual = Direccion.objects.select_for_update().filter(pk=actual_id).first()
+                if actual is not None and _solo_la_usa_una(actual_id):
+                    meta = Direccion._meta
+                    for campo, valor in datos.items():
+                        setattr(actual, campo, meta.get_field(campo).to_python(valor))
+                    actual.save()
+                    return actual
+        except IntegrityError:
+            # Otra petición creó esa misma dirección en paralelo
+            return Direccion.objects.get(dire_hash=huella)
+
+    if existente is not None:
+        return existente
+    try:
+        with transaction.atomic():
+            return Direccion.objects.create(**datos)
+    except IntegrityError:
+        # Otra petición creó la misma dirección en paralelo
+        return Direccion.objects.get(dire_hash=huella)
+
+
+def escritura_distinta(direccion, datos: dict) -> bool:
+    """
+    True si `direccion` (la que devolvió direccion_para) guarda otra
+    escritura que `datos`: la misma huella ya existía, compartida, y la
+    corrección de tildes o mayúsculas no se aplicó.
+    """
+    meta = Direccion._meta
+    return any(
+        meta.get_field(campo).to_python(getattr(direccion, campo))
+        != meta.get_field(campo).to_python(datos[campo])
+        for campo in CAMPOS_TEXTO
+    )
+
+
+def fusionar_duplicados() -> dict:
+    """
+    Calcula la huella de las filas que no la tienen y, cuando coincide con
+    otra, reasigna sus personas a la sobreviviente (la que ya tenía huella
+    o la de menor id). Un UPDATE de personas por lote. La migración 0004
+    tiene su propia copia: no depende de este módulo.
+    """
+    huellas = 0
+    reasignadas = 0
+    vistas = {}       # huella -> pk sobreviviente marcada en esta pasada
+    ultimo = 0
+    while True:
+        lote = list(
+            Direccion.objects
+            .filter(dire_hash__isnull=True, pk__gt=ultimo)
+            .order_by("pk")[:LOTE]
+        )
+        if not lote:
+            break
+        ultimo = lote[-1].pk
+
+        por_huella = {}
+        for dire in lote:
+            por_huella.setdefault(dire.calcular_hash(), []).append(dire)
+        vistas.update(
+            Direccion.objects
+            .filter(dire_hash__in=list(por_huella))
+            .values_list("dire_hash", "pk")
+        )
+
+        marcar = []
+        reasignar = {}    # pk duplicado -> pk sobreviviente
+        for huella, filas in por_huella.items():
+            if huella not in vistas:
+                primera, *filas = filas
+                primera.dire_hash = huella
+                marcar.append(primera)
+                vistas[huella] = primera.pk
+            for dire in filas:
+                reasignar[dire.pk] = vistas[huella]
+
+        Direccion.objects.bulk_update(marcar, ["dire_hash"])
+        if reasignar:
+            reasignadas += (
+                EmpresaPersona.objects
+                .filter(emppe_dire_id__in=list(reasignar))
+                .update(emppe_dire_id=Case(
+                    *(When(emppe_dire_id=dup, then=sob) for dup, sob in reasignar.items())
+                ))
+            )
+        huellas += len(marcar)
+
+    return {"huellas": huellas, "personas_reasignadas": reasignadas}
+
+
+def _borrar_sin_uso() -> int:
+    """Borra por lotes las direcciones que ninguna persona usa."""
+    q = connection.ops.quote_name
+    tabla, pk = q(Direccion._meta.db_table), q(Direccion._meta.pk.column)
+    tabla_personas = q(EmpresaPersona._meta.db_table)
+    fk = q(EmpresaPersona._meta.get_field("emppe_dire").column)
+    borradas = 0
+    ultimo = 0
+    while True:
+        ids = list(
+            Direccion.objects
+            .filter(personas__isnull=True, pk__gt=ultimo)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:LOTE]
+        )
+        if not ids:
+            break
+        ultimo = ids[-1]
+
+        # Borrado directo (sin signals por fila); el NOT EXISTS evita
+        # borrar una fila que se empezó a usar entre la lectura y el DELETE
+        marcas = ", ".join(["%s"] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {tabla} WHERE {pk} IN ({marcas}) "
+                f"AND NOT EXISTS (SELECT 1 FROM {tabla_personas} p WHERE p.{fk} = {tabla}.{pk})",
+                ids,
+            )
+            borradas += cursor.rowcount
+    return borradas
+
+
+def depurar(simular=False) -> dict:
+    """
+    Fusiona direcciones duplicadas y borra las que no usa nadie, en una
+    transacción. Con `simular` se hace todo y al final se revierte, para
+    ver los conteos sin cambiar datos.
+    """
+    with transaction.atomic():
+        resumen = fusionar_duplicados()
+        resumen["borradas"] = _borrar_sin_uso()
+
+        if simular:
+            transaction.set_rollback(True)
+        elif resumen["personas_reasignadas"] or resumen["borradas"]:
+            # update() y el DELETE directo no disparan signals
+            invalidar_version("personas")
+    return resumen
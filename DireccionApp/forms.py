@@ -1,5 +1,18 @@
 from django import forms
-from .models import Direccion, Region, Ciudad, Comuna
+from .catalogo import obtener_catalogo
+from .direcciones import direccion_para, escritura_distinta
+from .models import Direccion
+
+VACIO = [("", "---------")]
+
+
+def _combo(id_html):
+    """Id de región/ciudad/comuna; las opciones válidas las pone __init__ desde el catálogo."""
+    return forms.TypedChoiceField(
+        coerce=int,
+        empty_value=None,
+        widget=forms.Select(attrs={'class': 'form-select', 'id': id_html}),
+    )
 
 # ==========================================
 # Formulario para Dirección
@@ -32,6 +45,15 @@ class DireccionForm(forms.ModelForm):
         })
     )
 
+    # Ids del catálogo en memoria, no ModelChoiceField: validar no consulta
+    # la base (ni el get del campo ni el chequeo de FK del modelo)
+    regi = _combo('id_regi')
+    ciuda = _combo('id_ciuda')
+    comun = _combo('id_comun')
+
+    # Lo llena save(): texto para mostrar si la corrección no se aplicó
+    aviso = ''
+
     class Meta:
         model = Direccion
         fields = [
@@ -39,9 +61,6 @@ class DireccionForm(forms.ModelForm):
             'dire_num',
             'dire_otros',
             'dire_cod_postal',
-            'regi',
-            'ciuda',
-            'comun'
         ]
         widgets = {
             'dire_num': forms.TextInput(attrs={
@@ -61,16 +80,82 @@ class DireccionForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Ej: 8320000'
             }),
-            'regi': forms.Select(attrs={
-                'class': 'form-select',
-                'id': 'id_regi'
-            }),
-            'ciuda': forms.Select(attrs={
-                'class': 'form-select',
-                'id': 'id_ciuda'
-            }),
-            'comun': forms.Select(attrs={
-                'class': 'form-select',
-                'id': 'id_comun'
-            }),
         }
+
+    # -----------------------------
+    #   COMBOS DEPENDIENTES
+    # -----------------------------
+    def __init__(self, *args, **kwargs):
+        """
+        Cada combo solo trae las opciones del padre elegido (el resto las
+        carga el JS desde el catálogo geográfico). Esas mismas opciones son
+        las válidas: una ciudad fuera de la región (o una comuna fuera de la
+        ciudad) se rechaza en memoria, sin consultar la base.
+        """
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            for campo in ('regi', 'ciuda', 'comun'):
+                self.initial.setdefault(campo, getattr(self.instance, f'{campo}_id'))
+
+        catalogo = obtener_catalogo()
+        regi_id = self._id_elegido('regi')
+        ciuda_id = self._id_elegido('ciuda')
+
+        self._opciones('regi', catalogo.regiones)
+        self._opciones(
+            'ciuda', catalogo.ciudades_por_region.get(regi_id, ()),
+            'La ciudad no pertenece a la región seleccionada.',
+        )
+        self._opciones(
+            'comun', catalogo.comunas_por_ciudad.get(ciuda_id, ()),
+            'La comuna no pertenece a la ciudad seleccionada.',
+        )
+
+    def _opciones(self, campo, opciones, error=None):
+        field = self.fields[campo]
+        field.choices = VACIO + list(opciones)
+        if error:
+            field.error_messages['invalid_choice'] = error
+
+    # -----------------------------
+    #   GUARDAR (DIRECCIÓN COMPARTIDA)
+    # -----------------------------
+    def save(self, commit=True):
+        """
+        Devuelve la dirección con los datos del formulario (ver
+        direcciones.direccion_para): la instancia se edita en el lugar solo
+        si ninguna otra persona la comparte; si no, la existente con la
+        misma huella o una nueva. Quien llama debe asignar el resultado a la
+        persona y, si `self.aviso` no está vacío, mostrarlo: la dirección
+        quedó con la escritura que ya tenía registrada.
+        """
+        datos = self.cleaned_data
+        valores = {
+            'dire_calle': datos['dire_calle'],
+            'dire_num': datos['dire_num'],
+            'dire_otros': datos.get('dire_otros') or None,
+            'dire_cod_postal': datos.get('dire_cod_postal') or None,
+            'regi_id': datos['regi'],
+            'ciuda_id': datos['ciuda'],
+            'comun_id': datos['comun'],
+        }
+        direccion = direccion_para(valores, actual_id=self.instance.pk)
+        self.aviso = ''
+        if escritura_distinta(direccion, valores):
+            self.aviso = (
+                f'La dirección quedó como "{direccion.dire_calle} {direccion.dire_num}": '
+                'ya está registrada con esa escritura y puede estar compartida con otras '
+                'personas, así que la corrección de tildes o mayúsculas no se aplicó.'
+            )
+        return direccion
+
+    def _id_elegido(self, campo):
+        """Id elegido en el POST o, sin POST, el de la instancia/initial."""
+        if self.is_bound:
+            valor = self.data.get(self.add_prefix(campo))
+        else:
+            valor = self.initial.get(campo) or getattr(self.instance, f'{campo}_id', None)
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,27 @@
+# DireccionApp/management/commands/depurar_direcciones.py
+from django.core.management.base import BaseCommand
+
+from DireccionApp.direcciones import depurar
+
+
+class Command(BaseCommand):
+    help = (
+        "Fusiona direcciones duplicadas (misma huella normalizada) y borra en "
+        "bloque las que ninguna persona usa. Córrelo de forma periódica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--simular",
+            action="store_true",
+            help="Muestra los conteos sin guardar cambios.",
+        )
+
+    def handle(self, *args, **options):
+        resumen = depurar(simular=options["simular"])
+        prefijo = "[simulación] " if options["simular"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}Huellas calculadas: {resumen['huellas']}, "
+            f"personas reasignadas: {resumen['personas_reasignadas']}, "
+            f"direcciones borradas: {resumen['borradas']}."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DireccionApp', '0002_seed_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='direccion',
+            name='dire_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
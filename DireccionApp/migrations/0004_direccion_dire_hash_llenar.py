@@ -0,0 +1,94 @@
+# Generated by Django 4.2.16 on 2026-10-19 21:40
+
+import hashlib
+import unicodedata
+
+from django.db import migrations
+from django.db.models import Case, When
+
+LOTE = 1000
+
+
+# Copia de DireccionApp.normalizacion tal como estaba al crear la
+# migración: si la huella cambia después, esta migración no debe cambiar.
+def _texto(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = texto.replace('.', ' ').replace(',', ' ')
+    return ' '.join(texto.lower().split())
+
+
+def _numero(valor):
+    texto = str(valor if valor is not None else '').strip()
+    return str(int(texto)) if texto.isdigit() else texto
+
+
+def _huella(dire):
+    partes = [
+        _texto(dire.dire_calle),
+        _numero(dire.dire_num),
+        _texto(dire.dire_otros),
+        _texto(dire.dire_cod_postal).replace(' ', ''),
+        str(dire.regi_id or ''),
+        str(dire.ciuda_id or ''),
+        str(dire.comun_id or ''),
+    ]
+    return hashlib.sha256('|'.join(partes).encode()).hexdigest()
+
+
+def llenar_huellas(apps, schema_editor):
+    # Las filas antiguas sin huella se fusionan con sus duplicados y quedan
+    # con dire_hash: así direccion_para() las encuentra y no crea otra fila.
+    # Misma pasada que direcciones.fusionar_duplicados(), sin importarla.
+    Direccion = apps.get_model('DireccionApp', 'Direccion')
+    EmpresaPersona = apps.get_model('EmpresaPersonaApp', 'EmpresaPersona')
+
+    vistas = {}       # huella -> pk sobreviviente
+    ultimo = 0
+    while True:
+        lote = list(
+            Direccion.objects
+            .filter(dire_hash__isnull=True, pk__gt=ultimo)
+            .order_by('pk')[:LOTE]
+        )
+        if not lote:
+            break
+        ultimo = lote[-1].pk
+
+        por_huella = {}
+        for dire in lote:
+            por_huella.setdefault(_huella(dire), []).append(dire)
+        vistas.update(
+            Direccion.objects
+            .filter(dire_hash__in=list(por_huella))
+            .values_list('dire_hash', 'pk')
+        )
+
+        marcar = []
+        reasignar = {}    # pk duplicado -> pk sobreviviente
+        for huella, filas in por_huella.items():
+            if huella not in vistas:
+                primera, *filas = filas
+                primera.dire_hash = huella
+                marcar.append(primera)
+                vistas[huella] = primera.pk
+            for dire in filas:
+                reasignar[dire.pk] = vistas[huella]
+
+        Direccion.objects.bulk_update(marcar, ['dire_hash'])
+        if reasignar:
+            EmpresaPersona.objects.filter(emppe_dire_id__in=list(reasignar)).update(
+                emppe_dire_id=Case(*(When(emppe_dire_id=dup, then=sob) for dup, sob in reasignar.items()))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DireccionApp', '0003_direccion_dire_hash'),
+        ('EmpresaPersonaApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(llenar_huellas, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 # DireccionesApp/models.py
 from django.db import models
 
+from .normalizacion import hash_direccion
+
 # =============================================================
 # Modelos para Direcciones: Región, Ciudad, Comuna, Dirección
 # =============================================================
@@ -64,11 +66,31 @@ class Direccion(models.Model):
     ciuda = models.ForeignKey(Ciudad, on_delete=models.DO_NOTHING, db_column='CIUDA_ID')
     comun = models.ForeignKey(Comuna, on_delete=models.DO_NOTHING, db_column='COMUN_ID')
 
+    # Huella de los campos normalizados: direcciones idénticas se comparten
+    # (ver direcciones.direccion_para). La migración 0004 la calcula para
+    # las filas anteriores.
+    dire_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
     class Meta:
         db_table = 'DIRECCION'
         managed = True 
         ordering = ['dire_id']
 
+    def calcular_hash(self) -> str:
+        return hash_direccion(
+            self.dire_calle, self.dire_num, self.dire_otros, self.dire_cod_postal,
+            self.regi_id, self.ciuda_id, self.comun_id,
+        )
+
+    def save(self, *args, **kwargs):
+        self.dire_hash = self.calcular_hash()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "dire_hash"}
+
+        super().save(*args, **kwargs)
+
     def __str__(self):
         try:
             return f"{self.dire_calle} {self.dire_num}, {self.comun.comun_nom}"
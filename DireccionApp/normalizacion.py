@@ -0,0 +1,36 @@
+# DireccionApp/normalizacion.py
+"""
+Huella (hash) de una dirección para compartir filas idénticas.
+
+Dos direcciones son "la misma" si coinciden calle, número, otros y código
+postal normalizados (sin tildes, minúsculas, sin puntos/comas y con
+espacios simples) y la misma región, ciudad y comuna.
+"""
+import hashlib
+import unicodedata
+
+
+def normalizar_texto(texto) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = texto.replace(".", " ").replace(",", " ")
+    return " ".join(texto.lower().split())
+
+
+def _numero(valor) -> str:
+    texto = str(valor if valor is not None else "").strip()
+    return str(int(texto)) if texto.isdigit() else texto
+
+
+def hash_direccion(dire_calle, dire_num, dire_otros, dire_cod_postal, regi_id, ciuda_id, comun_id) -> str:
+    """SHA-256 hex de los campos normalizados (ver Direccion.dire_hash)."""
+    partes = [
+        normalizar_texto(dire_calle),
+        _numero(dire_num),
+        normalizar_texto(dire_otros),
+        normalizar_texto(dire_cod_postal).replace(" ", ""),
+        str(regi_id or ""),
+        str(ciuda_id or ""),
+        str(comun_id or ""),
+    ]
+    return hashlib.sha256("|".join(partes).encode()).hexdigest()
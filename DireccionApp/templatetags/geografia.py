@@ -0,0 +1,13 @@
+# DireccionApp/templatetags/geografia.py
+from django import template
+from django.urls import reverse
+
+from DireccionApp.catalogo import obtener_catalogo
+
+register = template.Library()
+
+
+@register.simple_tag
+def url_catalogo_geografico():
+    """URL del bundle Región → Ciudad → Comuna con el hash de la versión actual."""
+    return reverse("catalogo_geografico", kwargs={"version": obtener_catalogo().version})
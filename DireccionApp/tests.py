@@ -0,0 +1,169 @@
+from django.test import TestCase
+
+from EmpresaPersonaApp.models import EmpresaPersona
+from .catalogo import obtener_catalogo
+from .direcciones import depurar, direccion_para, escritura_distinta
+from .forms import DireccionForm
+from .models import Comuna, Direccion
+
+
+def datos_direccion(comuna, **cambios):
+    return {
+        "dire_calle": "Av. Perez",
+        "dire_num": "742",
+        "dire_otros": None,
+        "dire_cod_postal": None,
+        "regi_id": comuna.ciuda.regi_id,
+        "ciuda_id": comuna.ciuda_id,
+        "comun_id": comuna.pk,
+        **cambios,
+    }
+
+
+def crear_persona(rut, direccion):
+    return EmpresaPersona.objects.create(
+        emppe_rut=rut, emppe_nom=f"Persona {rut}", emppe_fono1="+56912345678",
+        emppe_mail1="a@b.cl", emppe_dire=direccion,
+    )
+
+
+class DireccionParaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.comuna = Comuna.objects.select_related("ciuda").get(comun_nom="Providencia")
+
+    def test_comparte_la_misma_direccion_normalizada(self):
+        primera = direccion_para(datos_direccion(self.comuna))
+        segunda = direccion_para(datos_direccion(self.comuna, dire_calle="AV PÉREZ", dire_num="0742"))
+        self.assertEqual(primera.pk, segunda.pk)
+        self.assertEqual(Direccion.objects.count(), 1)
+
+    def test_sin_otra_persona_se_edita_en_el_lugar(self):
+        direccion = direccion_para(datos_direccion(self.comuna))
+        crear_persona("11.111.111-1", direccion)
+
+        # Corrección de tilde: misma huella, texto nuevo guardado
+        corregida = direccion_para(datos_direccion(self.comuna, dire_calle="Av. Pérez"), actual_id=direccion.pk)
+        self.assertEqual(corregida.pk, direccion.pk)
+        self.assertEqual(Direccion.objects.get(pk=direccion.pk).dire_calle, "Av. Pérez")
+
+        # Dirección distinta: tampoco deja una fila huérfana
+        nueva = direccion_para(datos_direccion(self.comuna, dire_num="100"), actual_id=direccion.pk)
+        self.assertEqual(nueva.pk, direccion.pk)
+        self.assertEqual(Direccion.objects.count(), 1)
+
+    def test_compartida_no_se_edita(self):
+        direccion = direccion_para(datos_direccion(self.comuna))
+        crear_persona("11.111.111-1", direccion)
+        crear_persona("22.222.222-2", direccion)
+
+        nueva = direccion_para(datos_direccion(self.comuna, dire_num="100"), actual_id=direccion.pk)
+        self.assertNotEqual(nueva.pk, direccion.pk)
+        self.assertEqual(Direccion.objects.get(pk=direccion.pk).dire_num, 742)
+
+    def test_correccion_de_compartida_se_reporta(self):
+        direccion = direccion_para(datos_direccion(self.comuna))
+        crear_persona("11.111.111-1", direccion)
+        crear_persona("22.222.222-2", direccion)
+
+        datos = datos_direccion(self.comuna, dire_calle="Av. Pérez")
+        misma = direccion_para(datos, actual_id=direccion.pk)
+        self.assertEqual(misma.pk, direccion.pk)
+        self.assertEqual(Direccion.objects.get(pk=direccion.pk).dire_calle, "Av. Perez")
+        self.assertTrue(escritura_distinta(misma, datos))
+        self.assertFalse(escritura_distinta(misma, datos_direccion(self.comuna, dire_num="0742")))
+
+    def test_reutiliza_otra_existente_aunque_la_actual_sea_propia(self):
+        otra = direccion_para(datos_direccion(self.comuna, dire_num="100"))
+        propia = direccion_para(datos_direccion(self.comuna))
+        crear_persona("11.111.111-1", propia)
+
+        elegida = direccion_para(datos_direccion(self.comuna, dire_num="100"), actual_id=propia.pk)
+        self.assertEqual(elegida.pk, otra.pk)
+        self.assertEqual(Direccion.objects.get(pk=propia.pk).dire_num, 742)
+
+
+class DepurarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        comuna = Comuna.objects.select_related("ciuda").get(comun_nom="Providencia")
+        cls.con_huella = direccion_para(datos_direccion(comuna))
+        # Filas anteriores a la huella (dire_hash NULL), una duplicada;
+        # update() no pasa por save(), que calcularía la huella
+        cls.duplicada = Direccion.objects.create(**datos_direccion(comuna, dire_num="8"))
+        cls.antigua = Direccion.objects.create(**datos_direccion(comuna, dire_num="9"))
+        cls.sin_uso = direccion_para(datos_direccion(comuna, dire_num="1"))
+        Direccion.objects.filter(pk=cls.duplicada.pk).update(dire_calle="AV. PEREZ", dire_num=742)
+        Direccion.objects.filter(pk__in=[cls.duplicada.pk, cls.antigua.pk]).update(dire_hash=None)
+
+        cls.persona_a = crear_persona("11.111.111-1", cls.con_huella)
+        cls.persona_b = crear_persona("22.222.222-2", cls.duplicada)
+        cls.persona_c = crear_persona("33.333.333-3", cls.antigua)
+
+    def test_fusiona_duplicados_y_borra_sin_uso(self):
+        resumen = depurar()
+        self.assertEqual(resumen, {"huellas": 1, "personas_reasignadas": 1, "borradas": 2})
+
+        self.persona_b.refresh_from_db()
+        self.assertEqual(self.persona_b.emppe_dire_id, self.con_huella.pk)
+        self.assertEqual(
+            set(Direccion.objects.values_list("pk", flat=True)), {self.con_huella.pk, self.antigua.pk}
+        )
+        self.assertIsNotNone(Direccion.objects.get(pk=self.antigua.pk).dire_hash)
+
+    def test_simular_no_cambia_nada(self):
+        resumen = depurar(simular=True)
+        self.assertEqual(resumen["borradas"], 2)
+        self.assertEqual(Direccion.objects.count(), 4)
+        self.persona_b.refresh_from_db()
+        self.assertEqual(self.persona_b.emppe_dire_id, self.duplicada.pk)
+
+
+class DireccionFormTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.comuna = Comuna.objects.select_related("ciuda").get(comun_nom="Providencia")
+        cls.otra = Comuna.objects.select_related("ciuda").get(comun_nom="Algarrobo")
+
+    def post(self, comuna, **cambios):
+        datos = {"dire_calle": "Av. Perez", "dire_num": "742", "regi": comuna.ciuda.regi_id,
+                 "ciuda": comuna.ciuda_id, "comun": comuna.pk}
+        datos.update(cambios)
+        return DireccionForm(datos)
+
+    def test_valida_sin_consultar_la_base(self):
+        obtener_catalogo()
+        form = self.post(self.comuna)
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["comun"], self.comuna.pk)
+
+    def test_padres_que_no_corresponden(self):
+        form = self.post(self.comuna, ciuda=self.otra.ciuda_id)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["ciuda"], ["La ciudad no pertenece a la región seleccionada."])
+
+        form = self.post(self.comuna, comun=self.otra.pk)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors["comun"], ["La comuna no pertenece a la ciudad seleccionada."])
+
+    def test_instancia_marca_sus_combos(self):
+        direccion = direccion_para(datos_direccion(self.comuna))
+        form = DireccionForm(instance=direccion)
+        self.assertEqual(form["comun"].value(), self.comuna.pk)
+        self.assertIn(f'value="{self.comuna.pk}" selected', str(form["comun"]))
+
+    def test_aviso_si_la_correccion_no_se_aplica(self):
+        direccion = direccion_para(datos_direccion(self.comuna))
+        crear_persona("11.111.111-1", direccion)
+        crear_persona("22.222.222-2", direccion)
+
+        form = DireccionForm(self.post(self.comuna, dire_calle="Av. Pérez").data, instance=direccion)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().pk, direccion.pk)
+        self.assertIn('"Av. Perez 742"', form.aviso)
+
+        form = self.post(self.comuna, dire_num="100")
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(form.aviso, "")
@@ -1,49 +1,69 @@
 # DireccionApp/views.py
-from django.http import JsonResponse
-from .models import Ciudad, Comuna
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .catalogo import obtener_catalogo
+
+# Los combos cambian solo si cambia el catálogo (ETag = versión del catálogo)
+COMBOS_MAX_AGE = 60 * 60
+BUNDLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _etag_catalogo(request, *args, **kwargs):
+    return obtener_catalogo().version
+
+
+def _cacheable(response, max_age, inmutable=False):
+    patch_cache_control(response, public=True, max_age=max_age, immutable=inmutable)
+    return response
 
 
 # ==========================================
 # Listar ciudades según región seleccionada
 # ==========================================
+@condition(etag_func=_etag_catalogo)
 def ciudades_por_region(request, regi_id):
     """
     Devuelve las ciudades que pertenecen a una región específica.
     Utilizado en los combobox dinámicos del formulario Dirección.
     """
-    ciudades = (
-        Ciudad.objects
-        .filter(regi_id=regi_id)  # o regi__regi_id=regi_id según tu modelo
-        .values('ciuda_id', 'ciuda_nom')
-        .order_by('ciuda_nom')
+    return _cacheable(
+        JsonResponse(obtener_catalogo().ciudades(regi_id), safe=False),
+        COMBOS_MAX_AGE,
     )
-    return JsonResponse(list(ciudades), safe=False)
 
 
 # ==========================================
 # Listar comunas según ciudad seleccionada
 # ==========================================
+@condition(etag_func=_etag_catalogo)
 def comunas_por_ciudad(request, ciuda_id):
     """
     Devuelve las comunas asociadas a una ciudad.
-    Regla práctica: si el usuario eligió Santiago (ciuda_id=22),
-    también se muestran comunas de provincias vecinas (23..27).
+    Las ciudades de catalogo.CIUDADES_AGRUPADAS (Santiago) incluyen
+    también las comunas de sus provincias vecinas.
+    """
+    return _cacheable(
+        JsonResponse(obtener_catalogo().comunas(ciuda_id), safe=False),
+        COMBOS_MAX_AGE,
+    )
+
+
+# ==========================================
+# Árbol completo (bundle con hash en la URL)
+# ==========================================
+def catalogo_geografico(request, version):
+    """
+    Región → Ciudad → Comuna completo. La URL lleva el hash del contenido,
+    así que se puede guardar para siempre; una versión vieja redirige a
+    la actual.
     """
-    ciuda_id = int(ciuda_id)
-
-    if ciuda_id == 22:
-        comunas_qs = (
-            Comuna.objects
-            .filter(ciuda_id__in=[22, 23, 24, 25, 26, 27])
-            .values('comun_id', 'comun_nom')
-            .order_by('comun_nom')
-        )
-    else:
-        comunas_qs = (
-            Comuna.objects
-            .filter(ciuda_id=ciuda_id)
-            .values('comun_id', 'comun_nom')
-            .order_by('comun_nom')
-        )
-
-    return JsonResponse(list(comunas_qs), safe=False)
+    catalogo = obtener_catalogo()
+    if version != catalogo.version:
+        return redirect("catalogo_geografico", version=catalogo.version)
+
+    response = HttpResponse(catalogo.contenido, content_type="application/json; charset=utf-8")
+    response["ETag"] = f'"{catalogo.version}"'
+    return _cacheable(response, BUNDLE_MAX_AGE, inmutable=True)
@@ -0,0 +1,54 @@
+# EmpresaPersona/pruebas.py
+"""
+Datos de prueba compartidos por los tests de las apps: empresas con
+dirección, documentos con sus líneas y la sesión de administrador que pide
+RoleRequiredMiddleware. El runner no lo recoge como módulo de tests.
+"""
+from datetime import date
+from itertools import count
+
+from django.core.cache import cache
+
+from DireccionApp.models import Comuna, Direccion
+from EmpresaPersonaApp.models import EmpresaPersona
+from FacturacionApp.models import DetalleDoc, Documento, FormaPago, TipoTransaccion, Transaccion
+
+INGRESO = "INGRESO"
+EGRESO = "EGRESO"
+
+_numeros = count(1)
+
+
+def crear_empresa(rut, comuna_nom):
+    comuna = Comuna.objects.select_related("ciuda").get(comun_nom=comuna_nom)
+    direccion = Direccion.objects.create(
+        dire_calle="Calle", dire_num=1,
+        regi_id=comuna.ciuda.regi_id, ciuda_id=comuna.ciuda_id, comun_id=comuna.pk,
+    )
+    return EmpresaPersona.objects.create(
+        emppe_rut=rut, emppe_nom=f"Empresa {rut}", emppe_fono1="+56912345678",
+        emppe_mail1="a@b.cl", emppe_sit="ambos", emppe_dire=direccion,
+    )
+
+
+def crear_documento(empresa, tipo, lineas, fecha=date(2024, 3, 10), estado="PENDIENTE"):
+    """lineas: [(producto, cantidad, pagado)]; el tipo (INGRESO/EGRESO) va en la primera transacción."""
+    doc = Documento.objects.create(
+        docum_num=next(_numeros), docum_estado=estado, empresa=empresa,
+        tipo_doc_id=1, docum_fecha_emi=fecha,
+        forma_pago=FormaPago.objects.create(tipo_pago_id=1, fpago_dias=30),
+    )
+    for producto, cantidad, pagado in lineas:
+        DetalleDoc.objects.create(documento=doc, producto=producto, dedoc_cant=cantidad, dedoc_pagado=pagado)
+    Transaccion.objects.create(
+        documento=doc, tipo=TipoTransaccion.objects.get(tipo_trans=tipo), trans_fecha=fecha, trans_monto=0,
+    )
+    return doc
+
+
+class SesionAdminMixin:
+    def setUp(self):
+        cache.clear()
+        sesion = self.client.session
+        sesion["user_role"] = "admin"
+        sesion.save()
@@ -98,6 +98,15 @@ DATABASES = {
     }
 }
 
+# Caché compartida entre procesos (versiones de datos, ETags, cachés de APIs).
+# Basada en archivos para no depender de servicios extra en el hosting.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -166,3 +175,12 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # Dirección que aparecerá como remitente en el correo impreso en consola
 DEFAULT_FROM_EMAIL = "no-reply@teknetau.cl"
 
+# ==========================================
+#  ADJUNTOS EXCEL DE PRODUCTOS
+# ==========================================
+# True: se leen en un hilo después de la subida. En hostings sin hilos
+# (uWSGI sin enable-threads, PythonAnywhere) poner False: se leen en la
+# misma petición. Los PENDIENTE se reintentan con una tarea programada:
+#   python manage.py procesar_adjuntos --minutos 5
+ADJUNTOS_EN_SEGUNDO_PLANO = True
+
@@ -0,0 +1,32 @@
+# EmpresaPersonaApp/descargas.py
+"""
+Descargas CSV en streaming, compartidas por los exportes de todas las apps.
+
+Las filas se escriben a medida que se generan (sin armar el archivo en
+memoria), con ";" como separador y BOM UTF-8 para que Excel lea bien los
+acentos.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de escribirla."""
+    def write(self, valor):
+        return valor
+
+
+def respuesta_csv(nombre_archivo, encabezados, filas):
+    """StreamingHttpResponse con `encabezados` y luego cada fila (lista) de `filas`."""
+    writer = csv.writer(_Eco(), delimiter=";")
+
+    def lineas():
+        yield "\ufeff"  # BOM
+        yield writer.writerow(encabezados)
+        for fila in filas:
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(lineas(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return response
@@ -0,0 +1,381 @@
+# EmpresaPersonaApp/estados_cuenta.py
+"""
+Motor de estados de cuenta ("Reporte deuda cliente").
+
+calcular_estados_cuenta() arma las filas de todos los clientes pedidos con
+UNA consulta agrupada por documento; los render_* convierten un estado ya
+calculado (datos planos, serializables) en el archivo Excel o PDF. Como los
+renderizadores no tocan la BD, el comando estados_cuenta_masivo los reparte
+en un pool de procesos y junta los archivos en un ZIP. Las vistas web
+renderizan en su propio proceso (procesos=1): no se hace fork ni se cierran
+conexiones dentro de una petición.
+
+Los modelos se importan dentro de calcular_estados_cuenta() para que los
+procesos hijos (spawn en Windows) puedan importar este módulo sin levantar
+Django.
+"""
+import io
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+import openpyxl
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.utils import get_column_letter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+FORMATOS = ("excel", "pdf")
+EXTENSIONES = {"excel": "xlsx", "pdf": "pdf"}
+
+
+def _suma_lineas(cantidad):
+    """SUM(cantidad * produ_bruto) de las líneas del documento (0 si no hay)."""
+    return Coalesce(
+        Sum(
+            F(f"detalles__{cantidad}") * F("detalles__producto__produ_bruto"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+# ==============================
+#   CÁLCULO (una consulta)
+# ==============================
+def calcular_estados_cuenta(personas, hoy=None):
+    """
+    Devuelve {emppe_id: estado} para las personas del queryset `personas`.
+
+    estado = {
+        "persona": {"id", "nombre", "rut"},
+        "filas": [{"doc", "fecha", "venc", "tipo", "estado", "neto", "iva",
+                   "bruto", "pagado", "pendiente", "dias"}, ...],
+        "saldo_favor": int,   # INGRESO pendiente
+        "saldo_contra": int,  # EGRESO pendiente
+    }
+    """
+    from FacturacionApp.models import Documento, Transaccion
+
+    hoy = hoy or timezone.now().date()
+
+    estados = {
+        p["emppe_id"]: {
+            "persona": {"id": p["emppe_id"], "nombre": p["emppe_nom"], "rut": p["emppe_rut"]},
+            "filas": [],
+            "saldo_favor": 0,
+            "saldo_contra": 0,
+        }
+        for p in personas.values("emppe_id", "emppe_nom", "emppe_rut")
+    }
+
+    # Tipo de la primera transacción del documento (igual que transacciones.first())
+    primera_trans = (
+        Transaccion.objects
+        .filter(documento=OuterRef("pk"))
+        .order_by("pk")
+        .values("tipo__tipo_trans")[:1]
+    )
+
+    documentos = (
+        Documento.objects
+        .filter(empresa__in=personas)
+        .exclude(docum_estado="ANULADO")
+        .annotate(
+            trans_tipo=Subquery(primera_trans),
+            total_bruto=_suma_lineas("dedoc_cant"),
+            total_pagado=_suma_lineas("dedoc_pagado"),
+        )
+        .values(
+            "empresa_id", "docum_num", "docum_fecha_emi", "docum_fecha_ven",
+            "docum_estado", "trans_tipo", "total_bruto", "total_pagado",
+        )
+        .order_by("empresa_id", "docum_fecha_ven", "docum_num")
+    )
+
+    for doc in documentos:
+        estado = estados.get(doc["empresa_id"])
+        if estado is None:
+            continue
+
+        total_bruto = int(doc["total_bruto"] or 0)
+        pagado = int(doc["total_pagado"] or 0)
+        pendiente = max(total_bruto - pagado, 0)
+
+        trans_tipo = "EGRESO" if "EGRESO" in (doc["trans_tipo"] or "").upper() else "INGRESO"
+        if pendiente > 0:
+            if trans_tipo == "INGRESO":
+                estado["saldo_favor"] += pendiente
+            else:
+                estado["saldo_contra"] += pendiente
+
+        neto = round(total_bruto / 1.19) if total_bruto else 0
+        iva = total_bruto - neto
+
+        venc = doc["docum_fecha_ven"]
+        dias_vencida = ""
+        if venc and venc < hoy and pendiente > 0:
+            dias_vencida = (hoy - venc).days
+
+        estado["filas"].append({
+            "doc": doc["docum_num"],
+            "fecha": doc["docum_fecha_emi"],
+            "venc": venc,
+            "tipo": trans_tipo,
+            "estado": doc["docum_estado"],
+            "neto": neto,
+            "iva": iva,
+            "bruto": total_bruto,
+            "pagado": pagado,
+            "pendiente": pendiente,
+            "dias": dias_vencida,
+        })
+
+    return estados
+
+
+def clientes_deudores():
+    """
+    Queryset de los clientes activos con saldo pendiente a favor: algún
+    documento no anulado y no EGRESO (mismo criterio que
+    calcular_estados_cuenta) con líneas por pagar. Una consulta, sin armar
+    los estados: sirve para contarlos antes de calcularlos.
+    """
+    from EmpresaPersonaApp.models import EmpresaPersona
+    from FacturacionApp.models import Documento, Transaccion
+
+    primera_trans = (
+        Transaccion.objects
+        .filter(documento=OuterRef("pk"))
+        .order_by("pk")
+        .values("tipo__tipo_trans")[:1]
+    )
+    con_saldo = (
+        Documento.objects
+        .exclude(docum_estado="ANULADO")
+        .annotate(
+            trans_tipo=Subquery(primera_trans),
+            pendiente=_suma_lineas("dedoc_cant") - _suma_lineas("dedoc_pagado"),
+        )
+        .filter(Q(trans_tipo__isnull=True) | ~Q(trans_tipo__icontains="EGRESO"), pendiente__gt=0)
+        .values("empresa_id")
+    )
+    return EmpresaPersona.objects.filter(
+        emppe_est=True,
+        emppe_sit__in=["cliente", "ambos"],
+        pk__in=con_saldo,
+    )
+
+
+def estados_deudores(hoy=None):
+    """Estados de cuenta de los clientes activos con saldo pendiente a favor."""
+    return [
+        estado for estado in calcular_estados_cuenta(clientes_deudores(), hoy).values()
+        if estado["saldo_favor"] > 0
+    ]
+
+
+# ==============================
+#   RENDER EXCEL
+# ==============================
+def render_excel(estado) -> bytes:
+    persona = estado["persona"]
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Reporte"
+
+    thin = Side(style="thin", color="D0D0D0")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    fill_title = PatternFill("solid", fgColor="F2F2F2")
+    fill_header = PatternFill("solid", fgColor="E7EEF8")
+
+    bold = Font(bold=True)
+    title_font = Font(bold=True, size=14)
+
+    # Título
+    ws["A1"] = "Reporte deuda cliente"
+    ws["A1"].font = title_font
+    ws["A1"].fill = fill_title
+    ws.merge_cells("A1:K1")
+    ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
+    ws.row_dimensions[1].height = 22
+
+    # Datos cliente
+    ws["A3"] = "Cliente"
+    ws["A3"].font = bold
+    ws["B3"] = persona["nombre"] or ""
+    ws["D3"] = "RUT"
+    ws["D3"].font = bold
+    ws["E3"] = persona["rut"] or ""
+
+    # Saldos
+    ws["A5"] = "Saldo pendiente a favor"
+    ws["A5"].font = bold
+    ws["B5"] = estado["saldo_favor"]
+
+    ws["D5"] = "Saldo pendiente en contra"
+    ws["D5"].font = bold
+    ws["E5"] = estado["saldo_contra"]
+
+    for c in ["B5", "E5"]:
+        ws[c].number_format = '#,##0'
+
+    # Encabezados tabla
+    headers = [
+        "Doc", "Fecha", "Vencimiento", "Tipo", "Estado",
+        "Valor neto", "IVA", "Valor Bruto", "Pagado", "Saldo pendiente", "Días Vencida"
+    ]
+    start_row = 7
+    for col, h in enumerate(headers, start=1):
+        cell = ws.cell(row=start_row, column=col, value=h)
+        cell.font = bold
+        cell.fill = fill_header
+        cell.border = border
+        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+    # Filas
+    r = start_row + 1
+    for f in estado["filas"]:
+        ws.cell(r, 1, f["doc"]).border = border
+        ws.cell(r, 2, f["fecha"].strftime("%d/%m/%Y") if f["fecha"] else "").border = border
+        ws.cell(r, 3, f["venc"].strftime("%d/%m/%Y") if f["venc"] else "").border = border
+        ws.cell(r, 4, f["tipo"]).border = border
+        ws.cell(r, 5, f["estado"]).border = border
+
+        for idx, key in enumerate(["neto", "iva", "bruto", "pagado", "pendiente"], start=6):
+            c = ws.cell(r, idx, int(f[key] or 0))
+            c.number_format = '#,##0'
+            c.border = border
+            c.alignment = Alignment(horizontal="right")
+
+        ws.cell(r, 11, f["dias"]).border = border
+        r += 1
+
+    # Anchos (para que se vea “tipo reporte”)
+    widths = [10, 12, 12, 10, 12, 12, 10, 14, 12, 15, 10]
+    for i, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+
+    salida = io.BytesIO()
+    wb.save(salida)
+    return salida.getvalue()
+
+
+# ==============================
+#   RENDER PDF
+# ==============================
+def render_pdf(estado) -> bytes:
+    persona = estado["persona"]
+    salida = io.BytesIO()
+
+    p = canvas.Canvas(salida, pagesize=letter)
+    y = 760
+
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(50, y, "Reporte deuda cliente")
+    y -= 25
+
+    p.setFont("Helvetica", 10)
+    p.drawString(50, y, f"Cliente: {persona['nombre'] or ''}   |   RUT: {persona['rut'] or ''}")
+    y -= 16
+    p.drawString(50, y, f"Saldo pendiente a favor: ${estado['saldo_favor']:,}".replace(",", "."))
+    y -= 14
+    p.drawString(50, y, f"Saldo pendiente en contra: ${estado['saldo_contra']:,}".replace(",", "."))
+    y -= 22
+
+    p.setFont("Helvetica-Bold", 9)
+    p.drawString(50, y, "Doc")
+    p.drawString(90, y, "Emisión")
+    p.drawString(150, y, "Venc.")
+    p.drawString(210, y, "Tipo")
+    p.drawString(255, y, "Estado")
+    p.drawRightString(430, y, "Bruto")
+    p.drawRightString(500, y, "Pagado")
+    p.drawRightString(570, y, "Pend.")
+    y -= 12
+
+    p.setFont("Helvetica", 9)
+    for f in estado["filas"]:
+        if y < 80:
+            p.showPage()
+            y = 760
+            p.setFont("Helvetica", 9)
+
+        p.drawString(50, y, str(f["doc"]))
+        p.drawString(90, y, f["fecha"].strftime("%d/%m/%Y") if f["fecha"] else "")
+        p.drawString(150, y, f["venc"].strftime("%d/%m/%Y") if f["venc"] else "")
+        p.drawString(210, y, f["tipo"])
+        p.drawString(255, y, f["estado"])
+        p.drawRightString(430, y, f"${f['bruto']:,}".replace(",", "."))
+        p.drawRightString(500, y, f"${f['pagado']:,}".replace(",", "."))
+        p.drawRightString(570, y, f"${f['pendiente']:,}".replace(",", "."))
+        y -= 12
+
+    p.showPage()
+    p.save()
+    return salida.getvalue()
+
+
+RENDERIZADORES = {"excel": render_excel, "pdf": render_pdf}
+
+
+# ==============================
+#   MODO MASIVO (ZIP)
+# ==============================
+def _nombre_archivo(estado, formato):
+    persona = estado["persona"]
+    base = get_valid_filename(f"{persona['id']}_{persona['nombre'] or ''}") or str(persona["id"])
+    return f"reporte_{base}.{EXTENSIONES[formato]}"
+
+
+def _render_trabajo(trabajo):
+    """Se ejecuta en el proceso hijo: (formato, estado) -> (nombre, contenido)."""
+    formato, estado = trabajo
+    return _nombre_archivo(estado, formato), RENDERIZADORES[formato](estado)
+
+
+def procesos_por_defecto() -> int:
+    """Un proceso por CPU (solo para el comando; las vistas usan 1)."""
+    return os.cpu_count() or 1
+
+
+def escribir_zip_estados(estados, formatos, destino, procesos=1):
+    """
+    Renderiza cada estado en cada formato y escribe los archivos en el ZIP
+    `destino` (ruta o archivo abierto) a medida que van saliendo. Con
+    procesos=1 todo ocurre en el proceso actual; con más se usa un pool
+    (solo desde el comando: hace fork y cierra las conexiones del proceso).
+    Devuelve la cantidad de archivos.
+    """
+    trabajos = [(formato, estado) for estado in estados for formato in formatos]
+    if not trabajos:
+        with zipfile.ZipFile(destino, "w"):
+            return 0
+
+    procesos = max(1, min(procesos, len(trabajos)))
+    escritos = 0
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        if procesos == 1:
+            for trabajo in trabajos:
+                zf.writestr(*_render_trabajo(trabajo))
+                escritos += 1
+            return escritos
+
+        # Los hijos no usan la BD: se cierran las conexiones para que un fork
+        # no herede (y luego cierre) el socket de MySQL del proceso padre.
+        connections.close_all()
+        chunksize = max(1, len(trabajos) // (procesos * 4))
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            for nombre, contenido in pool.map(_render_trabajo, trabajos, chunksize=chunksize):
+                zf.writestr(nombre, contenido)
+                escritos += 1
+    return escritos
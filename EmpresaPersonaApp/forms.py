@@ -2,6 +2,7 @@
 from django import forms
 from .models import EmpresaPersona
 from .validacionesEmPer import (
+    normalizar_rut,
     validar_rut_chileno,
     validar_nombre,
     validar_alias,
@@ -91,6 +92,14 @@ class EmpresaPersonaForm(forms.ModelForm):
     def clean_emppe_rut(self):
         rut = self.cleaned_data.get('emppe_rut')
         validar_rut_chileno(rut)
+
+        # Unicidad sobre el RUT normalizado (12.345.678-5 == 12345678-5)
+        qs = EmpresaPersona.objects.filter(emppe_rut_norm=normalizar_rut(rut))
+        if self.instance.pk:
+            qs = qs.exclude(pk=self.instance.pk)
+        if qs.exists():
+            raise forms.ValidationError("Este RUT ya está registrado.")
+
         return rut
 
     def clean_emppe_nom(self):
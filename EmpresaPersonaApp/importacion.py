@@ -0,0 +1,335 @@
+# EmpresaPersonaApp/importacion.py
+"""
+Importación masiva de Empresas/Personas (+ Dirección) desde XLSX o CSV.
+
+Flujo:
+1. Se leen todas las filas (openpyxl en modo read_only / csv).
+2. Cada fila pasa por los validadores de validacionesEmPer y se resuelve
+   Región/Ciudad/Comuna por nombre contra un mapa armado con 3 consultas.
+3. La unicidad de RUT se revisa para TODO el archivo con una sola consulta
+   (más los repetidos dentro del mismo archivo).
+4. Las filas válidas se insertan por bloques: bulk_create de las
+   Direcciones que aún no existen (se comparten por huella, ver
+   DireccionApp/direcciones.py) y luego de EmpresaPersona, cada bloque en
+   su propia transacción.
+Las filas con error se devuelven para armar el archivo de errores.
+"""
+import csv
+import io
+import unicodedata
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from openpyxl import Workbook, load_workbook
+
+from DireccionApp.models import Ciudad, Comuna, Direccion, Region
+from DireccionApp.normalizacion import hash_direccion
+from .models import EmpresaPersona
+from .validacionesEmPer import (
+    normalizar_rut,
+    validar_alias,
+    validar_email,
+    validar_fono1,
+    validar_fono2,
+    validar_nombre,
+    validar_rut_chileno,
+)
+from .versiones import invalidar_version
+
+COLUMNAS = [
+    "RUT", "NOMBRE", "ALIAS", "FONO1", "FONO2", "MAIL1", "MAIL2", "SITUACION",
+    "REGION", "CIUDAD", "COMUNA", "CALLE", "NUMERO", "OTROS", "COD_POSTAL",
+]
+
+EJEMPLO = [
+    "76.543.210-3", "Comercial Ejemplo", "Ejemplo", "+56912345678", "", "contacto@ejemplo.cl", "",
+    "cliente", "Metropolitana de Santiago", "Santiago", "Providencia", "Av. Siempre Viva", 742, "", "",
+]
+
+SITUACIONES = {"cliente", "proveedor", "ambos"}
+
+# Largo máximo por columna (mismos max_length de los modelos)
+LARGOS = {
+    "RUT": 11, "NOMBRE": 100, "ALIAS": 100, "FONO1": 15, "FONO2": 15,
+    "MAIL1": 100, "MAIL2": 100, "CALLE": 100, "OTROS": 50, "COD_POSTAL": 10,
+}
+
+BLOQUE = 500
+
+
+# ==============================
+#   LECTURA DEL ARCHIVO
+# ==============================
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def leer_filas(archivo):
+    """
+    Devuelve (encabezados, [(n_fila, {columna: valor}), ...]) para .xlsx o .csv.
+    Lanza ValueError si el archivo no se puede leer o no trae las columnas.
+    """
+    nombre = (archivo.name or "").lower()
+
+    if nombre.endswith(".csv"):
+        contenido = archivo.read().decode("utf-8-sig", errors="replace")
+        try:
+            dialecto = csv.Sniffer().sniff(contenido[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        filas = list(csv.reader(io.StringIO(contenido), dialecto))
+    else:
+        try:
+            workbook = load_workbook(archivo, read_only=True, data_only=True)
+        except Exception:
+            raise ValueError("No se pudo leer el archivo. Verifica que sea un .xlsx o .csv válido.")
+        filas = [list(fila) for fila in workbook.active.iter_rows(values_only=True)]
+        workbook.close()
+
+    if not filas:
+        raise ValueError("El archivo está vacío.")
+
+    encabezados = [_texto(h).upper() for h in filas[0]]
+    faltantes = [c for c in COLUMNAS if c not in encabezados]
+    if faltantes:
+        raise ValueError(
+            "Faltan columnas en la plantilla: " + ", ".join(faltantes)
+            + ". Descarga nuevamente la plantilla y vuelve a intentarlo."
+        )
+
+    posiciones = {c: encabezados.index(c) for c in COLUMNAS}
+    datos = []
+    for n_fila, fila in enumerate(filas[1:], start=2):
+        if not any(_texto(v) for v in fila):
+            continue  # fila completamente vacía
+        datos.append((n_fila, {
+            c: _texto(fila[i]) if i < len(fila) else ""
+            for c, i in posiciones.items()
+        }))
+    return datos
+
+
+# ==============================
+#   MAPA GEOGRÁFICO EN MEMORIA
+# ==============================
+def _clave(nombre):
+    """Nombre comparable: sin tildes, minúsculas y espacios simples."""
+    nombre = unicodedata.normalize("NFKD", nombre or "")
+    nombre = "".join(c for c in nombre if not unicodedata.combining(c))
+    return " ".join(nombre.lower().split())
+
+
+class MapaGeografico:
+    """Región -> Ciudad -> Comuna por nombre, cargado con 3 consultas."""
+
+    def __init__(self):
+        self.regiones = {_clave(nom): pk for pk, nom in Region.objects.values_list("regi_id", "regi_nom")}
+
+        self.ciudades = {}                       # (regi_id, clave) -> ciuda_id
+        ciudad_region = {}                       # ciuda_id -> regi_id
+        for pk, nom, regi_id in Ciudad.objects.values_list("ciuda_id", "ciuda_nom", "regi_id"):
+            self.ciudades[(regi_id, _clave(nom))] = pk
+            ciudad_region[pk] = regi_id
+
+        self.comunas_ciudad = {}                 # (ciuda_id, clave) -> comun_id
+        self.comunas_region = {}                 # (regi_id, clave) -> comun_id
+        for pk, nom, ciuda_id in Comuna.objects.values_list("comun_id", "comun_nom", "ciuda_id"):
+            self.comunas_ciudad[(ciuda_id, _clave(nom))] = pk
+            self.comunas_region.setdefault((ciudad_region.get(ciuda_id), _clave(nom)), pk)
+
+    def resolver(self, region, ciudad, comuna):
+        """Devuelve (regi_id, ciuda_id, comun_id) o lanza ValidationError."""
+        regi_id = self.regiones.get(_clave(region))
+        if not regi_id:
+            raise ValidationError(f"Región '{region}' no existe.")
+
+        ciuda_id = self.ciudades.get((regi_id, _clave(ciudad)))
+        if not ciuda_id:
+            raise ValidationError(f"Ciudad '{ciudad}' no pertenece a la región '{region}'.")
+
+        # La comuna se busca en la ciudad y, si no está, en la región
+        # (ej: Santiago ofrece comunas de las provincias vecinas).
+        comun_id = (
+            self.comunas_ciudad.get((ciuda_id, _clave(comuna)))
+            or self.comunas_region.get((regi_id, _clave(comuna)))
+        )
+        if not comun_id:
+            raise ValidationError(f"Comuna '{comuna}' no pertenece a la región '{region}'.")
+
+        return regi_id, ciuda_id, comun_id
+
+
+# ==============================
+#   VALIDACIÓN POR FILA
+# ==============================
+def _validar_fila(fila, mapa):
+    """Devuelve (persona_kwargs, direccion_kwargs) o lanza ValidationError."""
+    for columna, largo in LARGOS.items():
+        if len(fila[columna]) > largo:
+            raise ValidationError(f"{columna} supera los {largo} caracteres.")
+
+    for columna in ("RUT", "NOMBRE", "FONO1", "MAIL1", "CALLE", "NUMERO"):
+        if not fila[columna]:
+            raise ValidationError(f"{columna} es obligatorio.")
+
+    try:
+        validar_rut_chileno(fila["RUT"])
+    except ValueError:
+        raise ValidationError("Ingrese un RUT válido.")
+    validar_nombre(fila["NOMBRE"])
+    validar_alias(fila["ALIAS"])
+    validar_fono1(fila["FONO1"])
+    validar_fono2(fila["FONO2"])
+    validar_email(fila["MAIL1"])
+    if fila["MAIL2"]:
+        validar_email(fila["MAIL2"])
+
+    situacion = (fila["SITUACION"] or "cliente").lower()
+    if situacion not in SITUACIONES:
+        raise ValidationError("SITUACION debe ser cliente, proveedor o ambos.")
+
+    try:
+        numero = int(fila["NUMERO"])
+    except ValueError:
+        raise ValidationError("NUMERO debe ser numérico.")
+
+    regi_id, ciuda_id, comun_id = mapa.resolver(fila["REGION"], fila["CIUDAD"], fila["COMUNA"])
+
+    persona = {
+        "emppe_rut": fila["RUT"],
+        "emppe_rut_norm": normalizar_rut(fila["RUT"]),
+        "emppe_nom": fila["NOMBRE"],
+        "emppe_alias": fila["ALIAS"] or None,
+        "emppe_fono1": fila["FONO1"],
+        "emppe_fono2": fila["FONO2"] or None,
+        "emppe_mail1": fila["MAIL1"],
+        "emppe_mail2": fila["MAIL2"] or None,
+        "emppe_est": True,
+        "emppe_sit": situacion,
+    }
+    direccion = {
+        "dire_calle": fila["CALLE"],
+        "dire_num": numero,
+        "dire_otros": fila["OTROS"] or None,
+        "dire_cod_postal": fila["COD_POSTAL"] or None,
+        "regi_id": regi_id,
+        "ciuda_id": ciuda_id,
+        "comun_id": comun_id,
+    }
+    return persona, direccion
+
+
+def importar_personas(archivo):
+    """
+    Importa el archivo y devuelve (creados, errores), donde errores es una
+    lista de (n_fila, fila, mensaje) para armar el archivo de errores.
+    """
+    filas = leer_filas(archivo)
+    mapa = MapaGeografico()
+
+    errores = []
+    validas = []          # (n_fila, fila, persona_kwargs, direccion_kwargs)
+    vistos = {}           # rut_norm -> n_fila (repetidos dentro del archivo)
+
+    for n_fila, fila in filas:
+        try:
+            persona, direccion = _validar_fila(fila, mapa)
+        except ValidationError as exc:
+            errores.append((n_fila, fila, " ".join(exc.messages)))
+            continue
+
+        rut_norm = persona["emppe_rut_norm"]
+        if rut_norm in vistos:
+            errores.append((n_fila, fila, f"RUT repetido en el archivo (fila {vistos[rut_norm]})."))
+            continue
+        vistos[rut_norm] = n_fila
+        validas.append((n_fila, fila, persona, direccion))
+
+    # Unicidad contra la BD: una sola consulta para todo el archivo
+    existentes = set(
+        EmpresaPersona.objects
+        .filter(emppe_rut_norm__in=list(vistos))
+        .values_list("emppe_rut_norm", flat=True)
+    )
+    pendientes = []
+    for item in validas:
+        if item[2]["emppe_rut_norm"] in existentes:
+            errores.append((item[0], item[1], "Este RUT ya está registrado."))
+        else:
+            pendientes.append(item)
+
+    creados = 0
+    for i in range(0, len(pendientes), BLOQUE):
+        bloque = pendientes[i:i + BLOQUE]
+        try:
+            with transaction.atomic():
+                huellas = [hash_direccion(**d) for _, _, _, d in bloque]
+
+                # Direcciones ya registradas (o repetidas en el bloque) se reutilizan
+                ids_dire = dict(
+                    Direccion.objects
+                    .filter(dire_hash__in=set(huellas))
+                    .values_list("dire_hash", "pk")
+                )
+                nuevas = {}
+                for huella, (_, _, _, d) in zip(huellas, bloque):
+                    if huella not in ids_dire and huella not in nuevas:
+                        # bulk_create no pasa por save(): la huella va explícita
+                        nuevas[huella] = Direccion(dire_hash=huella, **d)
+                if nuevas:
+                    # MySQL no devuelve los PK del bulk_create: se leen por huella
+                    Direccion.objects.bulk_create(list(nuevas.values()), batch_size=BLOQUE)
+                    ids_dire.update(
+                        Direccion.objects
+                        .filter(dire_hash__in=list(nuevas))
+                        .values_list("dire_hash", "pk")
+                    )
+
+                EmpresaPersona.objects.bulk_create(
+                    [
+                        EmpresaPersona(emppe_dire_id=ids_dire[huella], **p)
+                        for (_, _, p, _), huella in zip(bloque, huellas)
+                    ],
+                    batch_size=BLOQUE,
+                )
+        except IntegrityError:
+            # Otro usuario registró alguno de estos RUT (o direcciones) mientras se importaba
+            errores.extend(
+                (n_fila, fila, "No se pudo guardar: datos registrados en paralelo. Reintenta esta fila.")
+                for n_fila, fila, _, _ in bloque
+            )
+            continue
+        creados += len(bloque)
+
+    if creados:
+        # bulk_create no dispara signals
+        invalidar_version("personas")
+
+    errores.sort(key=lambda e: e[0])
+    return creados, errores
+
+
+# ==============================
+#   ARCHIVOS DE SALIDA
+# ==============================
+def libro_plantilla():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Empresas y Personas"
+    ws.append(COLUMNAS)
+    ws.append(EJEMPLO)
+    return wb
+
+
+def libro_errores(errores):
+    """Mismas columnas de la plantilla + FILA y ERROR, solo con las filas rechazadas."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Errores")
+    ws.append(["FILA", "ERROR", *COLUMNAS])
+    for n_fila, fila, mensaje in errores:
+        ws.append([n_fila, mensaje, *(fila.get(c, "") for c in COLUMNAS)])
+    return wb
@@ -0,0 +1,62 @@
+# EmpresaPersonaApp/management/commands/estados_cuenta_masivo.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from EmpresaPersonaApp.estados_cuenta import (
+    FORMATOS,
+    calcular_estados_cuenta,
+    escribir_zip_estados,
+    estados_deudores,
+    procesos_por_defecto,
+)
+from EmpresaPersonaApp.models import EmpresaPersona
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera en un ZIP los estados de cuenta (Excel/PDF) de los clientes "
+        "activos con deuda pendiente, o de los IDs indicados. Pensado para "
+        "la cobranza mensual."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--salida",
+            help="Ruta del ZIP (por defecto estados_cuenta_AAAAMMDD.zip).",
+        )
+        parser.add_argument(
+            "--formato",
+            choices=[*FORMATOS, "ambos"],
+            default="pdf",
+        )
+        parser.add_argument(
+            "--ids",
+            help="IDs de EmpresaPersona separados por coma (en vez de todos los deudores).",
+        )
+        parser.add_argument(
+            "--procesos",
+            type=int,
+            default=None,
+            help="Procesos para renderizar (por defecto, uno por CPU).",
+        )
+
+    def handle(self, *args, **options):
+        formato = options["formato"]
+        formatos = FORMATOS if formato == "ambos" else (formato,)
+
+        if options["ids"]:
+            try:
+                ids = [int(x) for x in options["ids"].split(",") if x.strip()]
+            except ValueError:
+                raise CommandError("--ids debe ser una lista de números separados por coma.")
+            estados = list(calcular_estados_cuenta(EmpresaPersona.objects.filter(pk__in=ids)).values())
+        else:
+            estados = estados_deudores()
+
+        salida = options["salida"] or f"estados_cuenta_{timezone.localdate():%Y%m%d}.zip"
+        procesos = options["procesos"] or procesos_por_defecto()
+        escritos = escribir_zip_estados(estados, formatos, salida, procesos=procesos)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{escritos} archivo(s) de {len(estados)} cliente(s) escritos en {salida}."
+        ))
@@ -0,0 +1,80 @@
+# EmpresaPersonaApp/management/commands/normalizar_ruts.py
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.validacionesEmPer import normalizar_rut
+
+
+class Command(BaseCommand):
+    help = (
+        "Rellena EMPRESAPERSONA.emppe_rut_norm (CUERPO+DV) para los registros "
+        "existentes. Si dos registros normalizan al mismo RUT se informan y "
+        "no se actualizan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Cantidad de filas por UPDATE (por defecto 1000).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo informa lo que haría, sin escribir en la BD.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        # 1) Una sola pasada por la tabla (solo las columnas necesarias)
+        por_rut = defaultdict(list)
+        filas = (
+            EmpresaPersona.objects
+            .only("emppe_id", "emppe_rut", "emppe_rut_norm")
+            .order_by("emppe_id")
+            .iterator(chunk_size=batch_size)
+        )
+        for persona in filas:
+            if persona.emppe_rut:
+                por_rut[normalizar_rut(persona.emppe_rut)].append(persona)
+
+        # 2) Separar duplicados (requieren revisión manual)
+        pendientes = []
+        duplicados = 0
+        for rut_norm, personas in por_rut.items():
+            if len(personas) > 1:
+                duplicados += 1
+                ids = ", ".join(str(p.emppe_id) for p in personas)
+                self.stdout.write(self.style.WARNING(
+                    f"RUT {rut_norm} repetido en los registros {ids}; se omite."
+                ))
+                continue
+
+            persona = personas[0]
+            if persona.emppe_rut_norm != rut_norm:
+                persona.emppe_rut_norm = rut_norm
+                pendientes.append(persona)
+
+        if dry_run:
+            self.stdout.write(
+                f"[dry-run] {len(pendientes)} registro(s) por actualizar, "
+                f"{duplicados} RUT(s) duplicado(s)."
+            )
+            return
+
+        # 3) Escritura por lotes
+        with transaction.atomic():
+            EmpresaPersona.objects.bulk_update(
+                pendientes, ["emppe_rut_norm"], batch_size=batch_size
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Se normalizaron {len(pendientes)} RUT(s). "
+            f"{duplicados} RUT(s) duplicado(s) quedaron sin normalizar."
+        ))
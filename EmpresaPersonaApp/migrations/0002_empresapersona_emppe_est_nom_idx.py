@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmpresaPersonaApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='empresapersona',
+            index=models.Index(fields=['emppe_est', 'emppe_nom'], name='emppe_est_nom_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmpresaPersonaApp', '0002_empresapersona_emppe_est_nom_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresapersona',
+            name='emppe_rut_norm',
+            field=models.CharField(blank=True, editable=False, max_length=10, null=True, unique=True, verbose_name='RUT normalizado'),
+        ),
+    ]
@@ -1,8 +1,10 @@
 # EmpresaPersonaApp/models.py
-from django.db import models, transaction
-from django.db.models.signals import post_delete
+from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from DireccionApp.models import Direccion
+from .validacionesEmPer import normalizar_rut
+from .versiones import invalidar_version
 
 
 # =========================
@@ -22,6 +24,16 @@ class EmpresaPersona(models.Model):
         unique=True,
         verbose_name="RUT"
     )
+    # RUT canónico (CUERPO+DV, ej: 76543210K). Se calcula en save();
+    # es el que garantiza unicidad y el que usan las búsquedas por RUT.
+    emppe_rut_norm = models.CharField(
+        max_length=10,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="RUT normalizado"
+    )
     emppe_nom = models.CharField(
         max_length=100,
         verbose_name="Nombre o Razón Social"
@@ -90,24 +102,36 @@ class EmpresaPersona(models.Model):
         verbose_name = "Empresa o Persona"
         verbose_name_plural = "Empresas y Personas"
         ordering = ['emppe_nom']
+        indexes = [
+            # Pestañas del listado (activos/inactivos) ordenadas por nombre
+            models.Index(fields=['emppe_est', 'emppe_nom'], name='emppe_est_nom_idx'),
+        ]
 
     def __str__(self):
         return f"{self.emppe_nom} ({self.emppe_rut})"
 
+    def save(self, *args, **kwargs):
+        self.emppe_rut_norm = normalizar_rut(self.emppe_rut) if self.emppe_rut else None
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "emppe_rut" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "emppe_rut_norm"}
+
+        super().save(*args, **kwargs)
+
+
+# Las direcciones que quedan sin uso (persona borrada o dirección
+# cambiada) ya no se borran una a una aquí: las limpia en bloque
+# `manage.py depurar_direcciones` (ver DireccionApp/direcciones.py).
+
 
 # =============================
-#   SIGNAL: BORRAR DIRECCIÓN
+#   SIGNAL: VERSIÓN "personas"
 # =============================
+@receiver(post_save, sender=EmpresaPersona)
 @receiver(post_delete, sender=EmpresaPersona)
-def borrar_direccion_asociada(sender, instance: EmpresaPersona, **kwargs):
-    """
-    Al eliminar una EmpresaPersona, si su dirección no está siendo usada
-    por nadie más, se borra automáticamente.
-    (OJO: en tu caso ya no borras EmpresaPersona desde la app, sino que
-    la inhabilitas cambiando emppe_est a False. De todas maneras,
-    este signal queda por si se borra desde el admin o por scripts.)
-    """
-    dire = instance.emppe_dire
-    if dire and dire.personas.count() == 0:
-        with transaction.atomic():
-            dire.delete()
+@receiver(post_save, sender=Direccion)
+@receiver(post_delete, sender=Direccion)
+def invalidar_version_personas(sender, **kwargs):
+    """Cualquier cambio en personas o direcciones cambia el ETag de obtener_personas_json."""
+    invalidar_version("personas")
@@ -0,0 +1,148 @@
+import io
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import Workbook
+
+from DireccionApp.models import Direccion
+from EmpresaPersona.pruebas import INGRESO, SesionAdminMixin, crear_documento, crear_empresa
+from ProductoServicioApp.models import ProductoServicio
+from . import views
+from .importacion import COLUMNAS, EJEMPLO, importar_personas
+from .models import EmpresaPersona
+
+
+def archivo_xlsx(filas, nombre="personas.xlsx"):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(COLUMNAS)
+    for fila in filas:
+        ws.append(fila)
+    archivo = io.BytesIO()
+    wb.save(archivo)
+    archivo.seek(0)
+    archivo.name = nombre
+    return archivo
+
+
+def fila(rut, **cambios):
+    datos = dict(zip(COLUMNAS, EJEMPLO))
+    datos.update(RUT=rut, **cambios)
+    return [datos[c] for c in COLUMNAS]
+
+
+class ImportarPersonasTests(TestCase):
+    def test_crea_personas_y_comparte_direcciones(self):
+        creados, errores = importar_personas(archivo_xlsx([
+            fila("11111111-1"),
+            fila("22222222-2", CALLE="AV. SIEMPRE VIVA"),   # misma dirección normalizada
+            fila("33333333-3", NUMERO=100),
+        ]))
+        self.assertEqual((creados, errores), (3, []))
+        self.assertEqual(Direccion.objects.count(), 2)
+
+        por_rut = dict(EmpresaPersona.objects.values_list("emppe_rut_norm", "emppe_dire__dire_num"))
+        self.assertEqual(por_rut, {"111111111": 742, "222222222": 742, "333333333": 100})
+
+    def test_reporta_errores_por_fila(self):
+        EmpresaPersona.objects.create(
+            emppe_rut="44.444.444-4", emppe_nom="Existente", emppe_fono1="+56912345678", emppe_mail1="a@b.cl",
+        )
+        creados, errores = importar_personas(archivo_xlsx([
+            fila("11111111-1"),
+            fila("11111111-1"),
+            fila("44444444-4"),
+            fila("12345678-9"),
+            fila("55555555-5", COMUNA="Algarrobo"),
+        ]))
+        self.assertEqual(creados, 1)
+        self.assertEqual([n for n, _, _ in errores], [3, 4, 5, 6])
+        self.assertIn("repetido", errores[0][2])
+        self.assertIn("ya está registrado", errores[1][2])
+
+
+class ExportZipTests(SesionAdminMixin, TestCase):
+    def test_limite_de_clientes_en_la_web(self):
+        url = reverse("export_personas_zip")
+        with mock.patch.object(views, "ZIP_WEB_MAX_CLIENTES", 2):
+            respuesta = self.client.get(url, {"ids": "1,2,3"})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("estados_cuenta_masivo", respuesta.json()["error"])
+
+    def test_deudores_se_cuentan_antes_de_calcular(self):
+        producto = ProductoServicio.objects.create(produ_sku="Z-1", produ_nom="Item", produ_bruto=1000)
+        for rut, comuna in (("11.111.111-1", "Providencia"), ("22.222.222-2", "Ñuñoa"), ("33.333.333-3", "Algarrobo")):
+            crear_documento(crear_empresa(rut, comuna), INGRESO, [(producto, 2, 1)])
+        # Pagado por completo: no es deudor
+        pagado = EmpresaPersona.objects.create(
+            emppe_rut="44.444.444-4", emppe_nom="Al día", emppe_fono1="+56912345678",
+            emppe_mail1="a@b.cl", emppe_sit="cliente",
+        )
+        crear_documento(pagado, INGRESO, [(producto, 2, 2)])
+
+        url = reverse("export_personas_zip")
+        with mock.patch.object(views, "ZIP_WEB_MAX_CLIENTES", 2), \
+                mock.patch("EmpresaPersonaApp.estados_cuenta.calcular_estados_cuenta") as calcular:
+            respuesta = self.client.get(url, {"deudores": "1"})
+        self.assertEqual(respuesta.status_code, 400)
+        calcular.assert_not_called()
+
+        with mock.patch.object(views, "ZIP_WEB_MAX_CLIENTES", 3):
+            respuesta = self.client.get(url, {"deudores": "1"})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_zip_en_el_mismo_proceso(self):
+        importar_personas(archivo_xlsx([fila("11111111-1")]))
+        persona = EmpresaPersona.objects.get()
+        with mock.patch("EmpresaPersonaApp.estados_cuenta.ProcessPoolExecutor") as pool:
+            respuesta = self.client.get(reverse("export_personas_zip"), {"ids": str(persona.pk), "formato": "ambos"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "application/zip")
+        pool.assert_not_called()
+
+
+class BuscarRutTests(SesionAdminMixin, TestCase):
+    def post(self, cuerpo):
+        return self.client.post(reverse("api_buscar_rut"), cuerpo, content_type="application/json")
+
+    def test_json_que_no_es_objeto(self):
+        for cuerpo in ("[]", '"x"', "3"):
+            with self.subTest(cuerpo=cuerpo):
+                self.assertEqual(self.post(cuerpo).status_code, 400)
+
+    def test_ruts_y_prefijos_juntos(self):
+        respuesta = self.post(json.dumps({"ruts": ["11.111.111-1"], "prefijos": ["1111"]}))
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_exacta_en_lote(self):
+        EmpresaPersona.objects.create(
+            emppe_rut="11.111.111-1", emppe_nom="Uno", emppe_fono1="+56912345678", emppe_mail1="a@b.cl",
+        )
+        data = self.post(json.dumps({"ruts": ["111111111", "22.222.222-2", "1-2"]})).json()
+        self.assertEqual(data["resultados"]["111111111"]["nombre"], "Uno")
+        self.assertIsNone(data["resultados"]["22.222.222-2"])
+        self.assertEqual(data["invalidos"], ["1-2"])
+
+
+class PersonasJsonTests(SesionAdminMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for rut, situacion in (("11.111.111-1", "cliente"), ("22.222.222-2", "proveedor"), ("33.333.333-3", "ambos")):
+            EmpresaPersona.objects.create(
+                emppe_rut=rut, emppe_nom=situacion, emppe_fono1="+56912345678", emppe_mail1="a@b.cl",
+                emppe_sit=situacion,
+            )
+
+    def ids(self, nombre, situacion):
+        respuesta = self.client.get(reverse(nombre), {"situacion": situacion, "fields": "id"})
+        return sorted(p["id"] for p in respuesta.json()["results"])
+
+    def test_situacion_igual_que_api_personas(self):
+        for situacion in ("cliente", "proveedor", "ambos"):
+            with self.subTest(situacion=situacion):
+                self.assertEqual(
+                    self.ids("obtener_personas_json", situacion), self.ids("api_personas", situacion)
+                )
+        self.assertEqual(len(self.ids("obtener_personas_json", "cliente")), 2)
@@ -6,6 +6,9 @@ urlpatterns = [
     # Vista principal de Empresa/Persona (lista + creación en modal)
     path("empresa_clientes/", views.empresa_clientes, name="empresa_clientes"),
 
+    # Filas de la tabla (paginadas y filtradas en el servidor)
+    path("api/personas/", views.api_personas, name="api_personas"),
+
     # Editar datos del cliente/proveedor (se usa con el modal de edición)
     path("editar/<int:pk>/", views.editar_persona, name="editar_persona"),
 
@@ -15,6 +18,13 @@ urlpatterns = [
     # Habilitar cliente/proveedor previamente inhabilitado
     path("habilitar/<int:pk>/", views.habilitar_persona, name="habilitar_persona"),
 
+    # Importación masiva desde plantilla (.xlsx / .csv)
+    path("plantilla/", views.descargar_plantilla_personas, name="descargar_plantilla_personas"),
+    path("importar/", views.importar_personas_archivo, name="importar_personas"),
+
+    # Búsqueda exacta / por prefijo de RUT (acepta lotes)
+    path("api/rut/", views.api_buscar_rut, name="api_buscar_rut"),
+
     # Endpoint JSON opcional
     path("obtener_personas_json/", views.obtener_personas_json, name="obtener_personas_json"),
 
@@ -24,6 +34,9 @@ urlpatterns = [
     path("persona/<int:pk>/export/excel/", views.export_persona_excel, name="export_persona_excel"),
     path("persona/<int:pk>/export/pdf/", views.export_persona_pdf, name="export_persona_pdf"),
 
+    # Estados de cuenta masivos (selección o deudores) en un ZIP
+    path("personas/export/zip/", views.export_personas_zip, name="export_personas_zip"),
+
     path("cc_clientes/", views.cc_clientes, name="cc_clientes"),
 
 ]
@@ -45,6 +45,28 @@ def validar_rut_chileno(rut: str):
         raise ValidationError("Ingrese un RUT válido.")
 
 
+# --------------------------
+# ✅ NORMALIZAR RUT
+# --------------------------
+def limpiar_rut(rut) -> str:
+    """
+    Quita puntos, espacios y guiones y pasa a mayúsculas (12.345.678-k -> 12345678K).
+    Sirve también para prefijos de búsqueda, que pueden venir sin DV.
+    """
+    return re.sub(r"[.\s-]", "", str(rut or "")).upper()
+
+
+def normalizar_rut(rut) -> str:
+    """
+    Forma canónica CUERPO+DV de un RUT completo, sin ceros a la izquierda:
+    12.345.678-k, 12345678-K y 012345678k -> 12345678K.
+    No valida el dígito verificador (para eso está validar_rut_chileno).
+    """
+    rut = limpiar_rut(rut)
+    cuerpo, dv = rut[:-1], rut[-1:]
+    return f"{cuerpo.lstrip('0')}{dv}"
+
+
 # --------------------------
 # ✅ VALIDAR NOMBRE
 # --------------------------
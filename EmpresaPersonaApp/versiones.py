@@ -0,0 +1,38 @@
+# EmpresaPersonaApp/versiones.py
+"""
+Versiones de datos para ETags y cachés.
+
+Cada "nombre" (ej: "personas") tiene una versión guardada en la caché
+compartida (ver CACHES en settings). Al escribir datos se llama a
+invalidar_version(); quien cachea o arma un ETag usa obtener_version()
+como parte de la clave, así nunca se sirve una respuesta anterior a la
+última escritura.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+_PREFIJO = "version:"
+
+
+def obtener_version(nombre: str) -> str:
+    """Versión actual de `nombre` (se crea la primera vez que se pide)."""
+    clave = _PREFIJO + nombre
+    version = cache.get(clave)
+    if version is None:
+        version = str(time.time_ns())
+        # add() no pisa una versión creada en paralelo por otro proceso
+        if not cache.add(clave, version, timeout=None):
+            version = cache.get(clave, version)
+    return version
+
+
+def invalidar_version(nombre: str) -> None:
+    """
+    Genera una versión nueva para `nombre` cuando la transacción actual
+    confirma (si no hay transacción, de inmediato).
+    """
+    transaction.on_commit(
+        lambda: cache.set(_PREFIJO + nombre, str(time.time_ns()), timeout=None)
+    )
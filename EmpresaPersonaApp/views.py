@@ -1,95 +1,215 @@
 # EmpresaPersonaApp/views.py
 from datetime import datetime, timedelta
 from decimal import ROUND_HALF_UP, Decimal
+from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Count, F, OuterRef, Q, Sum, Prefetch
 from django.db.models.expressions import Subquery
 from django.db.models.functions import Coalesce, TruncMonth
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.contrib import messages  
+from django.core.exceptions import ValidationError
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+import json
+import tempfile
 
 from UsuariosApp.forms import LoginForm
 from UsuariosApp.models import PasswordResetCode,UsuarioSistema
 
 from .models import EmpresaPersona
 from .forms import EmpresaPersonaForm
+from .validacionesEmPer import limpiar_rut, normalizar_rut, validar_rut_chileno
+from .versiones import obtener_version
+from . import importacion
+from .estados_cuenta import (
+    FORMATOS,
+    calcular_estados_cuenta,
+    clientes_deudores,
+    escribir_zip_estados,
+    estados_deudores,
+    render_excel,
+    render_pdf,
+)
 from DireccionApp.models import Direccion
 from DireccionApp.forms import DireccionForm
 from FacturacionApp.models import DetalleDoc, Documento
 from ProyectoApp.models import Proyecto
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
 
 
 # =====================================
 #   VISTA PRINCIPAL EMPRESA/PERSONA
 # =====================================
-@transaction.atomic
 def empresa_clientes(request):
     """
     Vista principal de gestión de Empresa/Persona:
-    - Lista todas las personas (clientes/proveedores)
+    - Renderiza la página; las filas de la tabla se piden a api_personas
+      (paginadas y filtradas en el servidor).
     - Permite crear nuevas desde el modal.
-    - Separa habilitados vs deshabilitados para usarlos en pestañas.
     """
-
-    # Consultamos todas las personas con su dirección relacionada
-    personas = EmpresaPersona.objects.select_related(
-        "emppe_dire__regi", "emppe_dire__ciuda", "emppe_dire__comun"
-    ).all()
-
-    # Subgrupos por estado
-    personas_habilitadas = personas.filter(emppe_est=True)
-    personas_deshabilitadas = personas.filter(emppe_est=False)
-
     if request.method == "POST":
         # Formularios de creación
         form_p = EmpresaPersonaForm(request.POST)
         form_d = DireccionForm(request.POST)
 
         if form_p.is_valid() and form_d.is_valid():
-            # Guardamos primero la dirección
-            direccion = form_d.save()
-            # Luego la persona, enlazando la dirección
-            persona = form_p.save(commit=False)
-            persona.emppe_dire = direccion
-            persona.save()
+            with transaction.atomic():
+                # Guardamos primero la dirección
+                direccion = form_d.save()
+                # Luego la persona, enlazando la dirección
+                persona = form_p.save(commit=False)
+                persona.emppe_dire = direccion
+                persona.save()
 
             messages.success(
                 request,
                 f'Se ha creado el cliente/proveedor "{persona.emppe_nom}" correctamente.'
             )
+            if form_d.aviso:
+                messages.warning(request, form_d.aviso)
             return redirect("empresa_clientes")
 
         # ❗Si hay errores, se vuelve a renderizar con los formularios con errores
-        context = {
-            # En la tabla mostraremos TODAS las personas y filtraremos por JS (pestañas)
-            "personas": personas,
-            "personas_habilitadas": personas_habilitadas,
-            "personas_deshabilitadas": personas_deshabilitadas,
-            "form_p": form_p,
-            "form_d": form_d,
-        }
-        return render(request, "empresa_persona/empresa_clientes.html", context)
+    else:
+        # GET normal
+        form_p = EmpresaPersonaForm()
+        form_d = DireccionForm()
 
-    # GET normal
     context = {
-        "personas": personas,
-        "personas_habilitadas": personas_habilitadas,
-        "personas_deshabilitadas": personas_deshabilitadas,
-        "form_p": EmpresaPersonaForm(),
-        "form_d": DireccionForm(),
+        "form_p": form_p,
+        "form_d": form_d,
     }
     return render(request, "empresa_persona/empresa_clientes.html", context)
 
 
+# =====================================
+#   API: LISTADO PAGINADO EMPRESA/PERSONA
+# =====================================
+PERSONAS_POR_PAGINA = 25
+PERSONAS_MAX_POR_PAGINA = 100
+
+# Orden permitido (?orden=...) -> columnas reales
+PERSONAS_ORDEN = {
+    "nombre": "emppe_nom",
+    "-nombre": "-emppe_nom",
+    "rut": "emppe_rut",
+    "-rut": "-emppe_rut",
+    "id": "emppe_id",
+    "-id": "-emppe_id",
+}
+
+
+def _direccion_dict(p):
+    dire = p.emppe_dire
+    return {
+        "calle": dire.dire_calle if dire else "",
+        "num": dire.dire_num if dire else "",
+        "otros": dire.dire_otros if dire else "",
+        "regi_id": dire.regi_id if dire else None,
+        "ciuda_id": dire.ciuda_id if dire else None,
+        "comun_id": dire.comun_id if dire else None,
+        "region": dire.regi.regi_nom if dire and dire.regi else "",
+        "ciudad": dire.ciuda.ciuda_nom if dire and dire.ciuda else "",
+        "comuna": dire.comun.comun_nom if dire and dire.comun else "",
+        "codigo_postal": dire.dire_cod_postal if dire else "",
+    }
+
+
+# Campo JSON -> (columna en BD, cómo se obtiene el valor)
+PERSONA_CAMPOS = {
+    "id": ("emppe_id", lambda p: p.emppe_id),
+    "rut": ("emppe_rut", lambda p: p.emppe_rut),
+    "nombre": ("emppe_nom", lambda p: p.emppe_nom),
+    "alias": ("emppe_alias", lambda p: p.emppe_alias or ""),
+    "fono1": ("emppe_fono1", lambda p: p.emppe_fono1),
+    "fono2": ("emppe_fono2", lambda p: p.emppe_fono2 or ""),
+    "mail1": ("emppe_mail1", lambda p: p.emppe_mail1),
+    "mail2": ("emppe_mail2", lambda p: p.emppe_mail2 or ""),
+    "estado": ("emppe_est", lambda p: "Activo" if p.emppe_est else "Inactivo"),
+    "situacion": ("emppe_sit", lambda p: p.emppe_sit),
+    "direccion": ("emppe_dire", _direccion_dict),
+}
+
+
+def _persona_dict(p, campos=PERSONA_CAMPOS):
+    """
+    Serializa una EmpresaPersona (con su dirección ya cargada por select_related).
+    `campos` limita las llaves del resultado (ver PERSONA_CAMPOS).
+    """
+    return {campo: PERSONA_CAMPOS[campo][1](p) for campo in campos}
+
+
+def _filtrar_situacion(qs, situacion):
+    """cliente / proveedor incluyen a los marcados "ambos"; ambos solo a esos."""
+    if situacion == "cliente":
+        return qs.filter(emppe_sit__in=["cliente", "ambos"])
+    if situacion == "proveedor":
+        return qs.filter(emppe_sit__in=["proveedor", "ambos"])
+    if situacion == "ambos":
+        return qs.filter(emppe_sit="ambos")
+    return qs
+
+
+def _filtrar_personas(qs, params):
+    """
+    Aplica los filtros del listado:
+    - estado: activos | inactivos | todos (pestañas, por emppe_est)
+    - situacion: cliente | proveedor | ambos | todos
+    - q: texto libre sobre RUT / nombre (o ID exacto si es numérico)
+    """
+    estado = params.get("estado", "activos")
+    if estado == "activos":
+        qs = qs.filter(emppe_est=True)
+    elif estado == "inactivos":
+        qs = qs.filter(emppe_est=False)
+
+    qs = _filtrar_situacion(qs, params.get("situacion", "todos"))
+
+    q = (params.get("q") or "").strip()
+    if q:
+        filtro = Q(emppe_rut__icontains=q) | Q(emppe_nom__icontains=q)
+        if q.isdigit():
+            filtro |= Q(emppe_id=int(q))
+        qs = qs.filter(filtro)
+
+    return qs
+
+
+def api_personas(request):
+    """
+    Página de Empresas/Personas para la tabla de empresa_clientes.
+    Solo se consultan (y se unen con Dirección/Región/Ciudad/Comuna)
+    las filas de la página pedida.
+    """
+    personas = _filtrar_personas(EmpresaPersona.objects.all(), request.GET)
+
+    orden = PERSONAS_ORDEN.get(request.GET.get("orden", ""), "emppe_nom")
+    personas = personas.select_related(
+        "emppe_dire__regi", "emppe_dire__ciuda", "emppe_dire__comun"
+    ).order_by(orden, "emppe_id")
+
+    try:
+        por_pagina = int(request.GET.get("por_pagina", PERSONAS_POR_PAGINA))
+    except ValueError:
+        por_pagina = PERSONAS_POR_PAGINA
+    por_pagina = max(1, min(por_pagina, PERSONAS_MAX_POR_PAGINA))
+
+    paginator = Paginator(personas, por_pagina)
+    pagina = paginator.get_page(request.GET.get("page"))
+
+    return JsonResponse({
+        "results": [_persona_dict(p) for p in pagina.object_list],
+        "page": pagina.number,
+        "num_pages": paginator.num_pages,
+        "count": paginator.count,
+        "has_next": pagina.has_next(),
+        "has_previous": pagina.has_previous(),
+    })
+
+
 # ===============================
 #      EDITAR PERSONA
 # ===============================
@@ -103,12 +223,15 @@ def editar_persona(request, pk):
         form_d = DireccionForm(request.POST, instance=direccion)
 
         if form_p.is_valid() and form_d.is_valid():
-            form_d.save()
+            # La dirección puede ser compartida: se apunta a la que corresponde
+            persona.emppe_dire = form_d.save()
             form_p.save()
             messages.success(
                 request,
                 f'Se ha actualizado la información de "{persona.emppe_nom}".'
             )
+            if form_d.aviso:
+                messages.warning(request, form_d.aviso)
             return redirect("ver_persona", pk=persona.pk)
 
     # 🔥 NUEVO: renderizar solo el formulario si es GET (para modal)
@@ -171,6 +294,54 @@ def habilitar_persona(request, pk):
     return JsonResponse({"error": "Método no permitido"}, status=405)
 
 
+# =================================
+#   IMPORTACIÓN MASIVA (XLSX / CSV)
+# ================================
+def descargar_plantilla_personas(request):
+    """Plantilla Excel con las columnas que espera importar_personas_archivo."""
+    response = HttpResponse(
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    response["Content-Disposition"] = 'attachment; filename="plantilla_empresas_personas.xlsx"'
+    importacion.libro_plantilla().save(response)
+    return response
+
+
+def importar_personas_archivo(request):
+    """
+    Carga masiva de clientes/proveedores desde la plantilla (.xlsx o .csv).
+    Las filas válidas se guardan; si alguna falla se descarga un Excel con
+    solo esas filas y la columna ERROR, listo para corregir y volver a subir.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    archivo = request.FILES.get("archivo")
+    if not archivo:
+        messages.error(request, "Debes seleccionar un archivo .xlsx o .csv.")
+        return redirect("empresa_clientes")
+
+    try:
+        creados, errores = importacion.importar_personas(archivo)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect("empresa_clientes")
+
+    if not errores:
+        messages.success(request, f"Se importaron {creados} cliente(s)/proveedor(es) correctamente.")
+        return redirect("empresa_clientes")
+
+    # Con errores: se responde directamente el archivo de filas rechazadas
+    response = HttpResponse(
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    response["Content-Disposition"] = 'attachment; filename="errores_importacion.xlsx"'
+    response["X-Importados"] = str(creados)
+    response["X-Rechazados"] = str(len(errores))
+    importacion.libro_errores(errores).save(response)
+    return response
+
+
 # =========================
 #       OTRAS VISTAS
 # =========================
@@ -403,43 +574,208 @@ def dashboard(request):
 
     return render(request, "login/dashboard.html", context)
 
+# =========================
+#   API: BÚSQUEDA POR RUT
+# =========================
+RUT_LOTE_MAX = 1000          # RUTs por llamada
+RUT_PREFIJO_MAX = 20         # resultados por prefijo
+RUT_CHUNK_IN = 500           # tamaño de cada IN (...) contra la BD
+
+
+def _rut_dict(p):
+    return {
+        "id": p.emppe_id,
+        "rut": p.emppe_rut,
+        "rut_norm": p.emppe_rut_norm,
+        "nombre": p.emppe_nom,
+        "estado": "Activo" if p.emppe_est else "Inactivo",
+        "situacion": p.emppe_sit,
+    }
+
+
+@csrf_exempt
+def api_buscar_rut(request):
+    """
+    Búsqueda por RUT sobre la columna normalizada (índice único).
+
+    - Exacta, en lote:  GET ?rut=12.345.678-5&rut=76543210K
+                        POST {"ruts": ["12.345.678-5", ...]}
+      -> {"resultados": {rut_enviado: persona | null}, "invalidos": [...]}
+    - Por prefijo:      GET ?prefijo=7654 (o POST {"prefijos": [...]})
+      -> {"resultados": {prefijo: [persona, ...]}}
+
+    Las respuestas tienen formas distintas: una llamada con ruts y prefijos a
+    la vez se rechaza con 400.
+    """
+    if request.method == "POST":
+        try:
+            payload = json.loads(request.body.decode("utf-8") or "{}")
+        except json.JSONDecodeError:
+            return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({"success": False, "error": "El JSON debe ser un objeto"}, status=400)
+        ruts = payload.get("ruts") or []
+        prefijos = payload.get("prefijos") or []
+    elif request.method == "GET":
+        ruts = request.GET.getlist("rut")
+        prefijos = request.GET.getlist("prefijo")
+    else:
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    if not isinstance(ruts, list) or not isinstance(prefijos, list):
+        return JsonResponse({"success": False, "error": "ruts/prefijos deben ser listas"}, status=400)
+
+    if ruts and prefijos:
+        return JsonResponse(
+            {"success": False, "error": "Envía ruts o prefijos, no ambos en la misma llamada."},
+            status=400,
+        )
+
+    if len(ruts) + len(prefijos) > RUT_LOTE_MAX:
+        return JsonResponse(
+            {"success": False, "error": f"Máximo {RUT_LOTE_MAX} RUTs por llamada."},
+            status=400,
+        )
+
+    # ---------- Exacta (lote) ----------
+    if ruts:
+        invalidos = []
+        norm_por_rut = {}
+        for rut in ruts:
+            try:
+                validar_rut_chileno(str(rut))
+            except (ValidationError, ValueError):
+                invalidos.append(rut)
+                continue
+            norm_por_rut[rut] = normalizar_rut(rut)
+
+        normalizados = sorted(set(norm_por_rut.values()))
+        encontrados = {}
+        for i in range(0, len(normalizados), RUT_CHUNK_IN):
+            for p in EmpresaPersona.objects.filter(
+                emppe_rut_norm__in=normalizados[i:i + RUT_CHUNK_IN]
+            ):
+                encontrados[p.emppe_rut_norm] = _rut_dict(p)
+
+        return JsonResponse({
+            "success": True,
+            "resultados": {rut: encontrados.get(norm) for rut, norm in norm_por_rut.items()},
+            "invalidos": invalidos,
+        })
+
+    # ---------- Por prefijo ----------
+    resultados = {}
+    for prefijo in prefijos:
+        limpio = limpiar_rut(prefijo)
+        if not limpio:
+            resultados[prefijo] = []
+            continue
+        personas = (
+            EmpresaPersona.objects
+            .filter(emppe_rut_norm__startswith=limpio.lstrip("0"))
+            .order_by("emppe_rut_norm")[:RUT_PREFIJO_MAX]
+        )
+        resultados[prefijo] = [_rut_dict(p) for p in personas]
+
+    return JsonResponse({"success": True, "resultados": resultados})
+
+
 # =========================
 #   DATOS EN FORMATO JSON
 # =========================
+PERSONAS_JSON_LIMITE = 200
+PERSONAS_JSON_LIMITE_MAX = 1000
+PERSONAS_JSON_CHUNK = 500     # filas por lectura en el volcado completo
+
+
+def _personas_json_params(request):
+    """Lee ?fields=, ?estado=, ?situacion= (comunes a la página y al volcado)."""
+    campos = [
+        c.strip() for c in request.GET.get("fields", "").split(",")
+        if c.strip() in PERSONA_CAMPOS
+    ] or list(PERSONA_CAMPOS)
+
+    personas = EmpresaPersona.objects.all()
+
+    estado = request.GET.get("estado", "").lower()
+    if estado in ("activo", "activos", "true", "1"):
+        personas = personas.filter(emppe_est=True)
+    elif estado in ("inactivo", "inactivos", "false", "0"):
+        personas = personas.filter(emppe_est=False)
+
+    # Mismo criterio que api_personas
+    personas = _filtrar_situacion(personas, request.GET.get("situacion", "").lower())
+
+    # Solo las columnas (y joins) que piden los campos elegidos
+    columnas = {"emppe_id"} | {PERSONA_CAMPOS[c][0] for c in campos}
+    if "direccion" in campos:
+        personas = personas.select_related(
+            "emppe_dire__regi", "emppe_dire__ciuda", "emppe_dire__comun"
+        )
+    else:
+        columnas.discard("emppe_dire")
+    personas = personas.only(*columnas).order_by("emppe_id")
+
+    return personas, campos
+
+
+def _personas_json_etag(request):
+    """El ETag cambia con cada escritura en personas/direcciones y con los parámetros."""
+    return f'personas-{obtener_version("personas")}-{request.GET.urlencode()}'
+
+
+def _personas_json_stream(personas, campos):
+    """Codifica el arreglo JSON de a una fila, sin armar la lista completa en memoria."""
+    yield "["
+    primero = True
+    for p in personas.iterator(chunk_size=PERSONAS_JSON_CHUNK):
+        yield ("" if primero else ",") + json.dumps(_persona_dict(p, campos))
+        primero = False
+    yield "]"
+
+
+@condition(etag_func=_personas_json_etag)
 def obtener_personas_json(request):
     """
-    Devuelve todas las empresas/personas en formato JSON.
-    Ideal para usar con fetch() o DataTables en empresa_clientes.html.
+    Empresas/personas en formato JSON para integraciones.
+
+    - Paginado por cursor (orden por emppe_id):
+        ?limit=200&cursor=<next_cursor de la respuesta anterior>
+        -> {"results": [...], "next_cursor": "123" | null}
+    - Volcado completo en streaming: ?completo=1 -> arreglo JSON
+    - ?fields=id,rut,nombre,...   elige campos (ver PERSONA_CAMPOS)
+    - ?estado=activo|inactivo  ?situacion=cliente|proveedor|ambos
+    Responde 304 si el If-None-Match coincide con la versión actual.
     """
-    personas = EmpresaPersona.objects.select_related(
-        "emppe_dire__regi", "emppe_dire__ciuda", "emppe_dire__comun"
-    ).all()
+    personas, campos = _personas_json_params(request)
 
-    data = []
-    for p in personas:
-        data.append({
-            "id": p.emppe_id,
-            "rut": p.emppe_rut,
-            "nombre": p.emppe_nom,
-            "alias": p.emppe_alias or "",
-            "fono1": p.emppe_fono1,
-            "fono2": p.emppe_fono2 or "",
-            "mail1": p.emppe_mail1,
-            "mail2": p.emppe_mail2 or "",
-            "estado": "Activo" if p.emppe_est else "Inactivo",
-            "situacion": p.emppe_sit,
-            "direccion": {
-                "calle": p.emppe_dire.dire_calle if p.emppe_dire else "",
-                "num": p.emppe_dire.dire_num if p.emppe_dire else "",
-                "otros": p.emppe_dire.dire_otros if p.emppe_dire else "",
-                "region": p.emppe_dire.regi.regi_nom if p.emppe_dire and p.emppe_dire.regi else "",
-                "ciudad": p.emppe_dire.ciuda.ciuda_nom if p.emppe_dire and p.emppe_dire.ciuda else "",
-                "comuna": p.emppe_dire.comun.comun_nom if p.emppe_dire and p.emppe_dire.comun else "",
-                "codigo_postal": p.emppe_dire.dire_cod_postal if p.emppe_dire else "",
-            },
-        })
+    if request.GET.get("completo") in ("1", "true"):
+        return StreamingHttpResponse(
+            _personas_json_stream(personas, campos),
+            content_type="application/json",
+        )
 
-    return JsonResponse(data, safe=False)
+    try:
+        limite = int(request.GET.get("limit", PERSONAS_JSON_LIMITE))
+    except ValueError:
+        limite = PERSONAS_JSON_LIMITE
+    limite = max(1, min(limite, PERSONAS_JSON_LIMITE_MAX))
+
+    cursor = request.GET.get("cursor", "")
+    if cursor:
+        if not cursor.isdigit():
+            return JsonResponse({"error": "cursor inválido"}, status=400)
+        personas = personas.filter(emppe_id__gt=int(cursor))
+
+    # Se pide una fila extra para saber si hay otra página
+    filas = list(personas[:limite + 1])
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    return JsonResponse({
+        "results": [_persona_dict(p, campos) for p in filas],
+        "next_cursor": str(filas[-1].emppe_id) if hay_mas else None,
+    })
 
 # ==================
 #  VER PERSONA
@@ -453,12 +789,12 @@ def ver_persona(request, pk):
         form_d = DireccionForm(request.POST, instance=direccion)
 
         if form_p.is_valid() and form_d.is_valid():
-            direccion = form_d.save()
-            persona.emppe_dire = direccion
-            persona.save()
+            persona.emppe_dire = form_d.save()
             form_p.save()
 
             messages.success(request, "Datos del cliente y dirección actualizados correctamente.")
+            if form_d.aviso:
+                messages.warning(request, form_d.aviso)
             return redirect("ver_persona", pk=persona.pk)
     else:
         form_p = EmpresaPersonaForm(instance=persona)
@@ -602,151 +938,13 @@ def ver_persona(request, pk):
 #========================
 def export_persona_excel(request, pk):
     persona = get_object_or_404(EmpresaPersona, pk=pk)
-    hoy = timezone.now().date()
-
-    documentos = (
-        Documento.objects
-        .filter(empresa=persona)
-        .exclude(docum_estado="ANULADO")
-        .prefetch_related("detalles__producto", "transacciones__tipo")
-        .order_by("docum_fecha_ven", "docum_num")
-    )
-
-    # --- helper: tipo trans ---
-    def get_trans_tipo(doc):
-        t = ""
-        if doc.transacciones.exists() and doc.transacciones.first().tipo:
-            t = (doc.transacciones.first().tipo.tipo_trans or "").upper()
-        return "EGRESO" if "EGRESO" in t else "INGRESO"
-
-    # --- preparar filas + saldos ---
-    filas = []
-    saldo_favor = 0   # INGRESO pendiente
-    saldo_contra = 0  # EGRESO pendiente
-
-    for doc in documentos:
-        total_bruto = 0
-        pagado = 0
-
-        for det in doc.detalles.all():
-            precio = int(det.producto.produ_bruto) if det.producto and det.producto.produ_bruto else 0
-            total_bruto += int(det.dedoc_cant or 0) * precio
-            pagado += int(det.dedoc_pagado or 0) * precio
-
-        pendiente = max(total_bruto - pagado, 0)
-
-        trans_tipo = get_trans_tipo(doc)
-        if pendiente > 0:
-            if trans_tipo == "INGRESO":
-                saldo_favor += pendiente
-            else:
-                saldo_contra += pendiente
-
-        neto = round(total_bruto / 1.19) if total_bruto else 0
-        iva = total_bruto - neto
-
-        dias_vencida = ""
-        if doc.docum_fecha_ven and doc.docum_fecha_ven < hoy and pendiente > 0:
-            dias_vencida = (hoy - doc.docum_fecha_ven).days
-
-        filas.append({
-            "doc": doc.docum_num,
-            "fecha": doc.docum_fecha_emi,
-            "venc": doc.docum_fecha_ven,
-            "tipo": trans_tipo,
-            "estado": doc.docum_estado,
-            "neto": neto,
-            "iva": iva,
-            "bruto": total_bruto,
-            "pagado": pagado,
-            "pendiente": pendiente,
-            "dias": dias_vencida,
-        })
+    estado = calcular_estados_cuenta(EmpresaPersona.objects.filter(pk=persona.pk))[persona.pk]
 
-    # --- Excel ---
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Reporte"
-
-    thin = Side(style="thin", color="D0D0D0")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-
-    fill_title = PatternFill("solid", fgColor="F2F2F2")
-    fill_header = PatternFill("solid", fgColor="E7EEF8")
-
-    bold = Font(bold=True)
-    title_font = Font(bold=True, size=14)
-
-    # Título
-    ws["A1"] = "Reporte deuda cliente"
-    ws["A1"].font = title_font
-    ws["A1"].fill = fill_title
-    ws.merge_cells("A1:K1")
-    ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-    ws.row_dimensions[1].height = 22
-
-    # Datos cliente
-    ws["A3"] = "Cliente"
-    ws["A3"].font = bold
-    ws["B3"] = persona.emppe_nom or ""
-    ws["D3"] = "RUT"
-    ws["D3"].font = bold
-    ws["E3"] = persona.emppe_rut or ""
-
-    # Saldos
-    ws["A5"] = "Saldo pendiente a favor"
-    ws["A5"].font = bold
-    ws["B5"] = saldo_favor
-
-    ws["D5"] = "Saldo pendiente en contra"
-    ws["D5"].font = bold
-    ws["E5"] = saldo_contra
-
-    for c in ["B5", "E5"]:
-        ws[c].number_format = '#,##0'
-
-    # Encabezados tabla (similar a tu formato)
-    headers = [
-        "Doc", "Fecha", "Vencimiento", "Tipo", "Estado",
-        "Valor neto", "IVA", "Valor Bruto", "Pagado", "Saldo pendiente", "Días Vencida"
-    ]
-    start_row = 7
-    for col, h in enumerate(headers, start=1):
-        cell = ws.cell(row=start_row, column=col, value=h)
-        cell.font = bold
-        cell.fill = fill_header
-        cell.border = border
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-
-    # Filas
-    r = start_row + 1
-    for f in filas:
-        ws.cell(r, 1, f["doc"]).border = border
-        ws.cell(r, 2, f["fecha"].strftime("%d/%m/%Y") if f["fecha"] else "").border = border
-        ws.cell(r, 3, f["venc"].strftime("%d/%m/%Y") if f["venc"] else "").border = border
-        ws.cell(r, 4, f["tipo"]).border = border
-        ws.cell(r, 5, f["estado"]).border = border
-
-        for idx, key in enumerate(["neto", "iva", "bruto", "pagado", "pendiente"], start=6):
-            c = ws.cell(r, idx, int(f[key] or 0))
-            c.number_format = '#,##0'
-            c.border = border
-            c.alignment = Alignment(horizontal="right")
-
-        ws.cell(r, 11, f["dias"]).border = border
-        r += 1
-
-    # Anchos (para que se vea “tipo reporte”)
-    widths = [10, 12, 12, 10, 12, 12, 10, 14, 12, 15, 10]
-    for i, w in enumerate(widths, start=1):
-        ws.column_dimensions[get_column_letter(i)].width = w
-
-    # Response
     response = HttpResponse(
+        render_excel(estado),
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
     response["Content-Disposition"] = f'attachment; filename=reporte_{persona.emppe_nom}.xlsx'
-    wb.save(response)
     return response
 
 #========================
@@ -754,98 +952,67 @@ def export_persona_excel(request, pk):
 #========================
 def export_persona_pdf(request, pk):
     persona = get_object_or_404(EmpresaPersona, pk=pk)
-    hoy = timezone.now().date()
-
-    documentos = (
-        Documento.objects
-        .filter(empresa=persona)
-        .exclude(docum_estado="ANULADO")
-        .prefetch_related("detalles__producto", "transacciones__tipo")
-        .order_by("docum_fecha_ven", "docum_num")
-    )
-
-    def get_trans_tipo(doc):
-        t = ""
-        if doc.transacciones.exists() and doc.transacciones.first().tipo:
-            t = (doc.transacciones.first().tipo.tipo_trans or "").upper()
-        return "EGRESO" if "EGRESO" in t else "INGRESO"
-
-    filas = []
-    saldo_favor = 0
-    saldo_contra = 0
+    estado = calcular_estados_cuenta(EmpresaPersona.objects.filter(pk=persona.pk))[persona.pk]
 
-    for doc in documentos:
-        total_bruto = 0
-        pagado = 0
-        for det in doc.detalles.all():
-            precio = int(det.producto.produ_bruto) if det.producto and det.producto.produ_bruto else 0
-            total_bruto += int(det.dedoc_cant or 0) * precio
-            pagado += int(det.dedoc_pagado or 0) * precio
-
-        pendiente = max(total_bruto - pagado, 0)
-        trans_tipo = get_trans_tipo(doc)
-
-        if pendiente > 0:
-            if trans_tipo == "INGRESO":
-                saldo_favor += pendiente
-            else:
-                saldo_contra += pendiente
-
-        dias_vencida = ""
-        if doc.docum_fecha_ven and doc.docum_fecha_ven < hoy and pendiente > 0:
-            dias_vencida = (hoy - doc.docum_fecha_ven).days
+    response = HttpResponse(render_pdf(estado), content_type="application/pdf")
+    response["Content-Disposition"] = f'attachment; filename=reporte_{persona.emppe_nom}.pdf'
+    return response
 
-        filas.append((doc.docum_num, doc.docum_fecha_emi, doc.docum_fecha_ven, trans_tipo, doc.docum_estado, total_bruto, pagado, pendiente, dias_vencida))
+#========================
+#  EXPORTAR MASIVO (ZIP)
+#========================
+ZIP_WEB_MAX_CLIENTES = 200
 
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename=reporte_{persona.emppe_nom}.pdf'
 
-    p = canvas.Canvas(response, pagesize=letter)
-    y = 760
-
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, y, "Reporte deuda cliente")
-    y -= 25
-
-    p.setFont("Helvetica", 10)
-    p.drawString(50, y, f"Cliente: {persona.emppe_nom or ''}   |   RUT: {persona.emppe_rut or ''}")
-    y -= 16
-    p.drawString(50, y, f"Saldo pendiente a favor: ${saldo_favor:,}".replace(",", "."))
-    y -= 14
-    p.drawString(50, y, f"Saldo pendiente en contra: ${saldo_contra:,}".replace(",", "."))
-    y -= 22
-
-    p.setFont("Helvetica-Bold", 9)
-    p.drawString(50, y, "Doc")
-    p.drawString(90, y, "Emisión")
-    p.drawString(150, y, "Venc.")
-    p.drawString(210, y, "Tipo")
-    p.drawString(255, y, "Estado")
-    p.drawRightString(430, y, "Bruto")
-    p.drawRightString(500, y, "Pagado")
-    p.drawRightString(570, y, "Pend.")
-    y -= 12
-
-    p.setFont("Helvetica", 9)
-    for (num, fe, fv, tipo, estado, bruto, pagado, pend, dias) in filas:
-        if y < 80:
-            p.showPage()
-            y = 760
-            p.setFont("Helvetica", 9)
-
-        p.drawString(50, y, str(num))
-        p.drawString(90, y, fe.strftime("%d/%m/%Y") if fe else "")
-        p.drawString(150, y, fv.strftime("%d/%m/%Y") if fv else "")
-        p.drawString(210, y, tipo)
-        p.drawString(255, y, estado)
-        p.drawRightString(430, y, f"${bruto:,}".replace(",", "."))
-        p.drawRightString(500, y, f"${pagado:,}".replace(",", "."))
-        p.drawRightString(570, y, f"${pend:,}".replace(",", "."))
-        y -= 12
-
-    p.showPage()
-    p.save()
-    return response
+def export_personas_zip(request):
+    """
+    Estados de cuenta de varios clientes en un ZIP.
+    - ?ids=1,2,3 (o ids repetidos): selección explícita
+    - ?deudores=1: todos los clientes activos con deuda pendiente
+    - ?formato=excel|pdf|ambos (por defecto pdf)
+    Se renderiza en este mismo proceso y con un máximo de
+    ZIP_WEB_MAX_CLIENTES clientes; para más, el comando
+    estados_cuenta_masivo (usa un pool de procesos).
+    """
+    demasiados = JsonResponse(
+        {
+            "error": f"Máximo {ZIP_WEB_MAX_CLIENTES} clientes por descarga. "
+                     "Para más usa: python manage.py estados_cuenta_masivo",
+        },
+        status=400,
+    )
+    formato = request.GET.get("formato", "pdf")
+    formatos = FORMATOS if formato == "ambos" else (formato,)
+    if any(f not in FORMATOS for f in formatos):
+        return JsonResponse({"error": "Formato no válido"}, status=400)
+
+    if request.GET.get("deudores") in ("1", "true"):
+        # Se cuentan antes de calcular sus estados de cuenta
+        if clientes_deudores().count() > ZIP_WEB_MAX_CLIENTES:
+            return demasiados
+        estados = estados_deudores()
+    else:
+        ids = [
+            int(x) for valor in request.GET.getlist("ids")
+            for x in valor.split(",") if x.strip().isdigit()
+        ]
+        if not ids:
+            return JsonResponse({"error": "Debes indicar ids o deudores=1"}, status=400)
+        if len(set(ids)) > ZIP_WEB_MAX_CLIENTES:
+            return demasiados
+        estados = list(calcular_estados_cuenta(EmpresaPersona.objects.filter(pk__in=ids)).values())
+
+    archivo = tempfile.TemporaryFile()
+    escribir_zip_estados(estados, formatos, archivo, procesos=1)
+    archivo.seek(0)
+
+    fecha = timezone.localdate().strftime("%Y%m%d")
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f"estados_cuenta_{fecha}.zip",
+        content_type="application/zip",
+    )
 
 def _clp_int(value: Decimal) -> int:
     """Redondea a CLP (entero) evitando decimales infinitos."""
@@ -0,0 +1,202 @@
+# FacturacionApp/gasto_proveedores.py
+"""
+Gasto por proveedor × producto × mes (tabla GASTO_PROVEEDOR).
+
+Se calcula desde los documentos EGRESO no anulados: el proveedor es la
+empresa del documento y el bruto de cada línea es dedoc_cant × produ_bruto
+(igual que Documento.total). La tabla se mantiene al día por tramos: las
+escrituras de documentos/detalles marcan los pares (proveedor, mes) y los
+cambios de precio marcan sus productos; al confirmar la transacción solo
+esos tramos se recalculan con una consulta agrupada. Las señales no
+consultan el tipo del documento: marcan cualquier escritura que toque
+campos que la tabla usa (ver CAMPOS_GASTO) y el recálculo, que solo lee
+EGRESO, deja igual los tramos que no tienen compras. Cambios como
+dedoc_pagado no marcan nada. `python manage.py recalcular_gasto_proveedores`
+la reconstruye completa.
+"""
+import weakref
+from datetime import date
+
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import DetalleDoc, GastoProveedor, Transaccion
+
+BLOQUE = 1000
+
+# conexión -> lote abierto en su transacción. La única referencia fuerte al
+# lote es la cola on_commit de Django: si la transacción se revierte Django
+# la descarta, el lote se libera y su entrada desaparece sola.
+_lotes = weakref.WeakValueDictionary()
+
+# Campos que usa la tabla: un save(update_fields=...) sin ninguno no marca
+CAMPOS_GASTO = {
+    "Documento": {"empresa", "docum_fecha_emi", "docum_estado"},
+    "DetalleDoc": {"documento", "producto", "dedoc_cant"},
+    "Transaccion": {"documento", "tipo"},
+}
+
+
+def inicio_mes(fecha) -> date:
+    return fecha.replace(day=1)
+
+
+def _mes_siguiente(mes: date) -> date:
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+# ==============================
+#   CONSULTA AGRUPADA (origen)
+# ==============================
+def _lineas_egreso():
+    """Líneas de documentos EGRESO no anulados (tipo según la primera transacción)."""
+    primera_trans = (
+        Transaccion.objects
+        .filter(documento=OuterRef("documento"))
+        .order_by("pk")
+        .values("tipo__tipo_trans")[:1]
+    )
+    return (
+        DetalleDoc.objects
+        .filter(producto__isnull=False)
+        .exclude(documento__docum_estado="ANULADO")
+        .annotate(tipo_trans=Subquery(primera_trans))
+        .filter(tipo_trans__icontains="EGRESO")
+    )
+
+
+def _agrupar(lineas):
+    return (
+        lineas
+        .annotate(mes_emi=TruncMonth("documento__docum_fecha_emi"))
+        .values("documento__empresa_id", "producto_id", "mes_emi")
+        .annotate(
+            total_cant=Sum("dedoc_cant"),
+            total_bruto=Sum(F("dedoc_cant") * F("producto__produ_bruto"), output_field=IntegerField()),
+        )
+        .order_by()
+    )
+
+
+def _filas(agrupado, pares=None):
+    for fila in agrupado.iterator(chunk_size=BLOQUE):
+        mes = fila["mes_emi"]
+        if pares is not None and (fila["documento__empresa_id"], mes) not in pares:
+            continue
+        yield GastoProveedor(
+            emppe_id=fila["documento__empresa_id"],
+            produ_id=fila["producto_id"],
+            mes=mes,
+            cantidad=fila["total_cant"] or 0,
+            bruto=fila["total_bruto"] or 0,
+        )
+
+
+# ==============================
+#   REFRESCO POR TRAMOS
+# ==============================
+def refrescar(pares):
+    """Recalcula los tramos (emppe_id, mes) indicados."""
+    pares = {(emppe_id, inicio_mes(mes)) for emppe_id, mes in pares if emppe_id and mes}
+    if not pares:
+        return
+
+    empresas = {e for e, _ in pares}
+    desde = min(m for _, m in pares)
+    hasta = _mes_siguiente(max(m for _, m in pares))
+
+    lineas = _lineas_egreso().filter(
+        documento__empresa_id__in=empresas,
+        documento__docum_fecha_emi__gte=desde,
+        documento__docum_fecha_emi__lt=hasta,
+    )
+    filas = list(_filas(_agrupar(lineas), pares))
+
+    tramos = Q()
+    for emppe_id, mes in pares:
+        tramos |= Q(emppe_id=emppe_id, mes=mes)
+
+    with transaction.atomic():
+        GastoProveedor.objects.filter(tramos).delete()
+        GastoProveedor.objects.bulk_create(filas, batch_size=BLOQUE)
+
+
+def refrescar_productos(produ_ids):
+    """Recalcula todas las filas de los productos indicados (cambio de precio)."""
+    produ_ids = sorted(set(produ_ids))
+    for i in range(0, len(produ_ids), BLOQUE):
+        bloque = produ_ids[i:i + BLOQUE]
+        filas = list(_filas(_agrupar(_lineas_egreso().filter(producto_id__in=bloque))))
+        with transaction.atomic():
+            GastoProveedor.objects.filter(produ_id__in=bloque).delete()
+            GastoProveedor.objects.bulk_create(filas, batch_size=BLOQUE)
+
+
+def reconstruir() -> int:
+    """Reconstruye toda la tabla. Devuelve la cantidad de filas."""
+    with transaction.atomic():
+        GastoProveedor.objects.all().delete()
+        filas = list(_filas(_agrupar(_lineas_egreso())))
+        GastoProveedor.objects.bulk_create(filas, batch_size=BLOQUE)
+    return len(filas)
+
+
+def toca_gasto(modelo, update_fields) -> bool:
+    """¿Un save con estos update_fields puede cambiar la tabla?"""
+    return update_fields is None or bool(CAMPOS_GASTO[modelo.__name__] & set(update_fields))
+
+
+class _Lote:
+    """Tramos y productos marcados en una transacción; se refrescan juntos al confirmar."""
+
+    def __init__(self):
+        self.pares = set()
+        self.productos = set()
+        self.ejecutado = False
+
+    def __call__(self):
+        self.ejecutado = True
+        refrescar(self.pares)
+        refrescar_productos(self.productos)
+
+
+def _lote_actual():
+    """
+    Lote de la transacción en curso: el primero que se pide registra un solo
+    transaction.on_commit y los siguientes reutilizan ese lote. None fuera de
+    atomic().
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        return None
+    lote = _lotes.get(conexion)
+    if lote is None or lote.ejecutado:
+        lote = _lotes[conexion] = _Lote()
+        transaction.on_commit(lote)
+    return lote
+
+
+def marcar(emppe_id, fecha):
+    """
+    Marca el tramo (proveedor, mes) para recalcularlo cuando la transacción
+    actual confirme; las marcas revertidas se descartan con su lote. Fuera
+    de atomic() el tramo se refresca de inmediato.
+    """
+    if not emppe_id or not fecha:
+        return
+    par = (emppe_id, inicio_mes(fecha))
+    lote = _lote_actual()
+    if lote is None:
+        refrescar([par])
+    else:
+        lote.pares.add(par)
+
+
+def marcar_productos(produ_ids):
+    """Como marcar(), para productos cuyo precio cambió: se recalculan todas sus filas."""
+    lote = _lote_actual()
+    if lote is None:
+        refrescar_productos(produ_ids)
+    else:
+        lote.productos.update(produ_ids)
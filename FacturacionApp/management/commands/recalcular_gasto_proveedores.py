@@ -0,0 +1,15 @@
+# FacturacionApp/management/commands/recalcular_gasto_proveedores.py
+from django.core.management.base import BaseCommand
+
+from FacturacionApp.gasto_proveedores import reconstruir
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye GASTO_PROVEEDOR (proveedor × producto × mes) desde los "
+        "documentos EGRESO. Úsalo tras migrar o tras cambios hechos fuera de la aplicación."
+    )
+
+    def handle(self, *args, **options):
+        filas = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Gasto por proveedor reconstruido: {filas} fila(s)."))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('EmpresaPersonaApp', '0003_empresapersona_emppe_rut_norm'),
+        ('ProductoServicioApp', '0004_historialprecio'),
+        ('FacturacionApp', '0004_alter_documento_docum_estado_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GastoProveedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('bruto', models.BigIntegerField(default=0)),
+                ('emppe', models.ForeignKey(db_column='EMPPE_ID', on_delete=django.db.models.deletion.CASCADE, related_name='gastos', to='EmpresaPersonaApp.empresapersona')),
+                ('produ', models.ForeignKey(db_column='PRODU_ID', on_delete=django.db.models.deletion.CASCADE, related_name='gastos', to='ProductoServicioApp.productoservicio')),
+            ],
+            options={
+                'db_table': 'GASTO_PROVEEDOR',
+                'indexes': [models.Index(fields=['mes', 'emppe'], name='gasto_mes_emppe_idx'), models.Index(fields=['produ', 'mes'], name='gasto_produ_mes_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='gastoproveedor',
+            constraint=models.UniqueConstraint(fields=('emppe', 'produ', 'mes'), name='gasto_proveedor_unico'),
+        ),
+    ]
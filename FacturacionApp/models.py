@@ -1,9 +1,12 @@
 # FacturacionApp/models.py
 from datetime import date
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from EmpresaPersonaApp.models import EmpresaPersona
-from ProyectoApp.models import Proyecto
+from ProyectoApp.models import Proyecto, invalidar_version_proyecto
 from ProductoServicioApp.models import ProductoServicio
+from ProductoServicioApp.precios import precios_cambiados
 
 
 # ───────── TABLAS MAESTRAS ───────── #
@@ -320,3 +323,125 @@ class Transaccion(models.Model):
         return f"{self.tipo.tipo_trans} - {self.trans_monto}"
 
 
+# ───────── GASTO POR PROVEEDOR (precalculado) ───────── #
+
+class GastoProveedor(models.Model):
+    """
+    Compras (documentos EGRESO) por proveedor × producto × mes.
+    Tabla derivada: la mantiene gasto_proveedores.py, no se edita a mano.
+    """
+    emppe = models.ForeignKey(
+        EmpresaPersona,
+        on_delete=models.CASCADE,
+        db_column="EMPPE_ID",
+        related_name="gastos",
+    )
+    produ = models.ForeignKey(
+        ProductoServicio,
+        on_delete=models.CASCADE,
+        db_column="PRODU_ID",
+        related_name="gastos",
+    )
+    mes = models.DateField()  # primer día del mes de emisión
+    cantidad = models.PositiveIntegerField(default=0)
+    bruto = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "GASTO_PROVEEDOR"
+        constraints = [
+            models.UniqueConstraint(fields=["emppe", "produ", "mes"], name="gasto_proveedor_unico"),
+        ]
+        indexes = [
+            models.Index(fields=["mes", "emppe"], name="gasto_mes_emppe_idx"),
+            models.Index(fields=["produ", "mes"], name="gasto_produ_mes_idx"),
+        ]
+
+
+# ───────── SIGNALS: documentos → tablas derivadas y versiones de proyecto ───────── #
+
+@receiver(pre_save, sender=Documento)
+def marcar_documento_anterior(sender, instance: Documento, update_fields=None, **kwargs):
+    """
+    Compara con la fila guardada: si cambia el proyecto se invalida el
+    anterior; si cambia de proveedor/fecha o entra/sale de ANULADO, se marca
+    el tramo anterior y post_save marca el nuevo.
+    """
+    from .gasto_proveedores import marcar
+
+    instance._gasto_cambio = False
+    if not instance.pk:
+        return
+    if update_fields is not None and not {"empresa", "docum_fecha_emi", "docum_estado", "proyecto"} & set(update_fields):
+        return
+    anterior = (
+        Documento.objects
+        .filter(pk=instance.pk)
+        .values_list("empresa_id", "docum_fecha_emi", "proyecto_id", "docum_estado")
+        .first()
+    )
+    if not anterior:
+        return
+    empresa_id, fecha_emi, proyecto_id, estado = anterior
+    if proyecto_id != instance.proyecto_id:
+        invalidar_version_proyecto(proyecto_id)
+
+    cambio_tramo = (empresa_id, fecha_emi) != (instance.empresa_id, instance.docum_fecha_emi)
+    cambio_anulado = (estado == "ANULADO") != (instance.docum_estado == "ANULADO")
+    if cambio_tramo or cambio_anulado:
+        if cambio_tramo:
+            marcar(empresa_id, fecha_emi)
+        instance._gasto_cambio = True
+
+
+@receiver(post_save, sender=Documento)
+def marcar_documento_modificado(sender, instance: Documento, **kwargs):
+    from .gasto_proveedores import marcar
+
+    invalidar_version_proyecto(instance.proyecto_id)
+    # Un documento nuevo aún no tiene transacciones: lo marca la primera que se guarde
+    if getattr(instance, "_gasto_cambio", False):
+        instance._gasto_cambio = False
+        marcar(instance.empresa_id, instance.docum_fecha_emi)
+
+
+@receiver(post_delete, sender=Documento)
+def marcar_documento_borrado(sender, instance: Documento, **kwargs):
+    from .gasto_proveedores import marcar
+
+    marcar(instance.empresa_id, instance.docum_fecha_emi)
+    invalidar_version_proyecto(instance.proyecto_id)
+
+
+@receiver(post_save, sender=DetalleDoc)
+@receiver(post_delete, sender=DetalleDoc)
+@receiver(post_save, sender=Transaccion)
+@receiver(post_delete, sender=Transaccion)
+def marcar_detalle_modificado(sender, instance, signal, update_fields=None, **kwargs):
+    from .gasto_proveedores import marcar, toca_gasto
+
+    if type(instance).documento.is_cached(instance):
+        doc = instance.documento
+        datos = (doc.empresa_id, doc.docum_fecha_emi, doc.proyecto_id)
+    else:
+        datos = (
+            Documento.objects
+            .filter(pk=instance.documento_id)
+            .values_list("empresa_id", "docum_fecha_emi", "proyecto_id")
+            .first()
+        )
+    # Si el documento ya no existe, su propio post_delete marcó todo
+    if not datos:
+        return
+    invalidar_version_proyecto(datos[2])
+
+    if signal is post_save and not toca_gasto(sender, update_fields):
+        return  # ej. solo dedoc_pagado
+    marcar(datos[0], datos[1])
+
+
+@receiver(precios_cambiados)
+def marcar_productos_repreciados(sender, produ_ids, **kwargs):
+    """El bruto de la tabla usa produ_bruto: un precio nuevo recalcula sus filas."""
+    from .gasto_proveedores import marcar_productos
+
+    marcar_productos(produ_ids)
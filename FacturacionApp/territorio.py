@@ -0,0 +1,112 @@
+# FacturacionApp/territorio.py
+"""
+Ingresos, egresos y saldos pendientes por Región / Ciudad / Comuna.
+
+La ubicación es la dirección de la empresa del documento
+(EmpresaPersona.emppe_dire). Una sola consulta agrupada sobre las líneas
+de los documentos no anulados (tipo según la primera transacción, ver
+ProyectoApp/finanzas.py) agrupa por los ids geográficos; los nombres se
+ponen después desde el catálogo en memoria, sin joins a las tablas de
+geografía.
+"""
+from django.db.models import Q
+
+from DireccionApp.catalogo import obtener_catalogo
+from ProyectoApp.finanzas import (
+    ESTADOS_POR_COBRAR,
+    TIPO_EGRESO,
+    TIPO_INGRESO,
+    bruto_lineas,
+    es_tipo,
+    pendiente_lineas,
+    tipo_primera_transaccion,
+)
+from .models import DetalleDoc
+
+_DIRE = "documento__empresa__emppe_dire__"
+
+# nivel -> campos de agrupación (de mayor a menor)
+NIVELES = {
+    "region": ("regi_id",),
+    "ciudad": ("regi_id", "ciuda_id"),
+    "comuna": ("regi_id", "ciuda_id", "comun_id"),
+}
+
+COLUMNAS = (
+    ("region", "Región"),
+    ("ciudad", "Ciudad"),
+    ("comuna", "Comuna"),
+    ("ingresos", "Ingresos"),
+    ("egresos", "Egresos"),
+    ("por_cobrar", "Por cobrar"),
+    ("por_pagar", "Por pagar"),
+)
+
+SIN_DIRECCION = "Sin dirección"
+
+# campo de agrupación -> clave en las filas de salida
+_CLAVES = {"regi_id": "region", "ciuda_id": "ciudad", "comun_id": "comuna"}
+
+
+def columnas(nivel) -> list[tuple[str, str]]:
+    """COLUMNAS del `nivel`: solo los territorios hasta ese nivel + montos."""
+    fuera = set(_CLAVES.values()) - {_CLAVES[campo] for campo in NIVELES[nivel]}
+    return [(clave, titulo) for clave, titulo in COLUMNAS if clave not in fuera]
+
+
+def resumen_territorio(nivel="region", desde=None, hasta=None):
+    """
+    Queryset de dicts, una fila por territorio del `nivel` pedido, con
+    ingresos/egresos brutos y lo pendiente de cada uno (PENDIENTE/MITAD).
+    `desde`/`hasta` filtran por fecha de emisión.
+    """
+    es_ingreso = es_tipo(TIPO_INGRESO)
+    es_egreso = es_tipo(TIPO_EGRESO)
+    pendiente = Q(documento__docum_estado__in=ESTADOS_POR_COBRAR)
+
+    lineas = (
+        DetalleDoc.objects
+        .filter(producto__isnull=False)
+        .exclude(documento__docum_estado="ANULADO")
+    )
+    if desde:
+        lineas = lineas.filter(documento__docum_fecha_emi__gte=desde)
+    if hasta:
+        lineas = lineas.filter(documento__docum_fecha_emi__lte=hasta)
+
+    campos = [_DIRE + campo for campo in NIVELES[nivel]]
+    return (
+        lineas
+        .annotate(tipo_doc_trans=tipo_primera_transaccion())
+        .values(*campos)
+        .annotate(
+            ingresos=bruto_lineas(filter=es_ingreso),
+            egresos=bruto_lineas(filter=es_egreso),
+            por_cobrar=pendiente_lineas(filter=es_ingreso & pendiente),
+            por_pagar=pendiente_lineas(filter=es_egreso & pendiente),
+        )
+        .order_by(*campos)
+    )
+
+
+def filas_territorio(nivel="region", desde=None, hasta=None) -> list[dict]:
+    """Filas de resumen_territorio con nombres del catálogo, de más a menos ingresos."""
+    catalogo = obtener_catalogo()
+    nombres = {
+        "regi_id": catalogo.nombre_region,
+        "ciuda_id": catalogo.nombre_ciudad,
+        "comun_id": catalogo.nombre_comuna,
+    }
+
+    filas = []
+    for fila in resumen_territorio(nivel, desde, hasta):
+        salida = {}
+        for campo in NIVELES[nivel]:
+            id_ = fila[_DIRE + campo]
+            salida[_CLAVES[campo]] = {"id": id_, "nombre": nombres[campo].get(id_, SIN_DIRECCION)}
+        for clave in ("ingresos", "egresos", "por_cobrar", "por_pagar"):
+            salida[clave] = fila[clave] or 0
+        filas.append(salida)
+
+    filas.sort(key=lambda f: -f["ingresos"])
+    return filas
@@ -1,3 +1,149 @@
+from datetime import date
+
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+
+from EmpresaPersona.pruebas import EGRESO, INGRESO, SesionAdminMixin, crear_documento, crear_empresa
+from ProductoServicioApp.models import ProductoServicio
+from ProductoServicioApp.precios import registrar_historial
+from .gasto_proveedores import reconstruir
+from .models import GastoProveedor
+from .territorio import filas_territorio
+
+
+# ==============================
+#   TERRITORIO
+# ==============================
+class TerritorioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = ProductoServicio.objects.create(produ_sku="T-1", produ_nom="Item", produ_bruto=1000)
+        cls.providencia = crear_empresa("11.111.111-1", "Providencia")
+        cls.nunoa = crear_empresa("22.222.222-2", "Ñuñoa")
+        cls.algarrobo = crear_empresa("33.333.333-3", "Algarrobo")
+
+        crear_documento(cls.providencia, INGRESO, [(cls.producto, 3, 1)])
+        crear_documento(cls.nunoa, INGRESO, [(cls.producto, 2, 2)], estado="PAGADO")
+        crear_documento(cls.nunoa, EGRESO, [(cls.producto, 4, 0)])
+        crear_documento(cls.algarrobo, INGRESO, [(cls.producto, 1, 0)])
+        crear_documento(cls.algarrobo, INGRESO, [(cls.producto, 9, 0)], estado="ANULADO")
+        crear_documento(cls.algarrobo, EGRESO, [(cls.producto, 5, 0)], fecha=date(2023, 1, 5))
+
+    def test_por_region_suma_ingresos_egresos_y_pendientes(self):
+        filas = filas_territorio("region")
+        rm = next(f for f in filas if f["region"]["nombre"] == "Metropolitana de Santiago")
+        self.assertEqual(rm["ingresos"], 5000)
+        self.assertEqual(rm["egresos"], 4000)
+        self.assertEqual(rm["por_cobrar"], 2000)   # PAGADO no cuenta como pendiente
+        self.assertEqual(rm["por_pagar"], 4000)
+
+    def test_anulados_fuera_y_orden_por_ingresos(self):
+        filas = filas_territorio("region")
+        self.assertEqual([f["ingresos"] for f in filas], [5000, 1000])
+        otra = filas[1]
+        self.assertEqual(otra["egresos"], 5000)
+
+    def test_por_comuna_y_rango_de_fechas(self):
+        filas = filas_territorio("comuna", desde=date(2024, 1, 1), hasta=date(2024, 12, 31))
+        por_comuna = {f["comuna"]["nombre"]: f for f in filas}
+        self.assertEqual(set(por_comuna), {"Providencia", "Ñuñoa", "Algarrobo"})
+        self.assertEqual(por_comuna["Ñuñoa"]["ingresos"], 2000)
+        self.assertEqual(por_comuna["Algarrobo"]["egresos"], 0)
+
+
+# ==============================
+#   GASTO POR PROVEEDOR
+# ==============================
+class GastoProveedorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = ProductoServicio.objects.create(produ_sku="G-1", produ_nom="Insumo", produ_bruto=500)
+        cls.proveedor = crear_empresa("44.444.444-4", "Providencia")
+
+    def test_solo_egresos_no_anulados(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 2, 0)])
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 1, 0)], fecha=date(2024, 3, 20))
+            crear_documento(self.proveedor, INGRESO, [(self.producto, 7, 0)])
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 5, 0)], estado="ANULADO")
+
+        gasto = GastoProveedor.objects.get()
+        self.assertEqual((gasto.mes, gasto.cantidad, gasto.bruto), (date(2024, 3, 1), 3, 1500))
+        self.assertEqual(reconstruir(), 1)
+
+    def test_un_solo_refresco_por_transaccion(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 2, 0)])
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 1, 0)], fecha=date(2024, 4, 2))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_marcar_pagado_no_refresca(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            doc = crear_documento(self.proveedor, EGRESO, [(self.producto, 2, 0)])
+        detalle = doc.detalles.get()
+        detalle.dedoc_pagado = 2
+        # Solo el UPDATE: la señal no consulta nada ni agenda un refresco
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            detalle.save(update_fields=["dedoc_pagado"])
+        self.assertEqual(callbacks, [])
+
+    def test_cambio_de_precio_refresca_sus_filas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_documento(self.proveedor, EGRESO, [(self.producto, 2, 0)])
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductoServicio.objects.filter(pk=self.producto.pk).update(produ_bruto=800)
+            self.producto.refresh_from_db()
+            registrar_historial([self.producto], "formulario")
+        self.assertEqual(GastoProveedor.objects.get().bruto, 1600)
+
+    def test_marcas_revertidas_no_se_refrescan(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    crear_documento(self.proveedor, EGRESO, [(self.producto, 4, 0)])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertFalse(GastoProveedor.objects.exists())
+
+
+# ==============================
+#   PARÁMETROS INVÁLIDOS -> 400 (no 500)
+# ==============================
+class ParametrosInvalidosTests(SesionAdminMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ProductoServicio.objects.create(produ_sku="P-1", produ_nom="Primero", produ_bruto=100)
+        ProductoServicio.objects.create(produ_sku="P-2", produ_nom="Segundo", produ_bruto=200)
+
+    def get(self, nombre, **params):
+        return self.client.get(reverse(f"facturacionapp:{nombre}"), params)
+
+    def test_gasto_mes_imposible(self):
+        self.assertEqual(self.get("api_gasto_proveedores", desde="2024-13").status_code, 400)
+        self.assertEqual(self.get("export_gasto_proveedores", hasta="2024-00").status_code, 400)
+
+    def test_gasto_per_page_cero(self):
+        respuesta = self.get("api_gasto_proveedores", per_page="0")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["results"], [])
+
+    def test_territorio_fecha_o_nivel_invalido(self):
+        self.assertEqual(self.get("api_territorio", desde="2024-02-30").status_code, 400)
+        self.assertEqual(self.get("api_territorio", nivel="pais").status_code, 400)
+        self.assertEqual(self.get("export_territorio", hasta="2024-13-01").status_code, 400)
+        self.assertEqual(self.get("api_territorio", nivel="comuna").status_code, 200)
+
+    def test_buscar_productos_fecha_invalida(self):
+        self.assertEqual(self.get("api_buscar_productos", fecha="2024-13-45").status_code, 400)
+
+    def test_buscar_productos_limite_minimo_uno(self):
+        respuesta = self.get("api_buscar_productos", limit="0")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()["results"]), 1)
 
-# Create your tests here.
+    def test_precios_a_fecha_invalida(self):
+        producto = ProductoServicio.objects.first()
+        respuesta = self.get("api_precios_a_fecha", fecha="2024-02-30", ids=str(producto.pk))
+        self.assertEqual(respuesta.status_code, 400)
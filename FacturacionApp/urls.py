@@ -1,14 +1,20 @@
 from django.urls import path
 from . import views
+from ProyectoApp import views as proyecto_views
 
 app_name = "facturacionapp"
 
 urlpatterns = [
     path("", views.lista_documentos, name="lista_documentos"),
     path("nuevo/", views.crear_documento, name="crear_documento"),
+    path("nuevo/validar/", views.api_validar_documento, name="api_validar_documento"),
     path("editar/<int:pk>/", views.editar_documento_post, name="editar_documento_post"),
     path("anular/<int:pk>/", views.anular_documento, name="anular_documento"),
 
+    # Buscador de productos para el detalle (crear / editar)
+    path("api/productos/", views.api_buscar_productos, name="api_buscar_productos"),
+    path("api/productos/precios/", views.api_precios_a_fecha, name="api_precios_a_fecha"),
+
     # API GET por PK
     path("api/documento/<int:pk>/", views.api_get_documento, name="api_get_documento"),
 
@@ -19,13 +25,21 @@ urlpatterns = [
     ),
 
     # 🔥 NUEVO ENDPOINT
-    path("proyecto/<int:proyecto_id>/documentos/", 
-         views.api_documentos_por_proyecto, 
+    path("proyecto/<int:proye_idt>/documentos/",
+         proyecto_views.api_documentos_por_proyecto,
          name="api_documentos_por_proyecto"),
 
+    # Gasto por proveedor × producto × mes
+    path("api/gasto-proveedores/", views.api_gasto_proveedores, name="api_gasto_proveedores"),
+    path("export/gasto-proveedores/", views.export_gasto_proveedores, name="export_gasto_proveedores"),
+
+    # Ingresos / egresos / pendientes por región, ciudad o comuna
+    path("api/territorio/", views.api_territorio, name="api_territorio"),
+    path("export/territorio/", views.export_territorio, name="export_territorio"),
+
     path("export/pdf/", views.export_pdf_all, name="export_pdf_all"),
     path("export/excel/", views.export_excel_all, name="export_excel_all"),
 
-    path("api/documento/<int:doc_id>/quitar/", views.api_quitar_documento, name="api_quitar_documento"),
+    path("api/documento/<int:doc_id>/quitar/", proyecto_views.api_quitar_documento, name="api_quitar_documento"),
 
 ]
@@ -1,9 +1,14 @@
 # FacturacionApp/views.py
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q, Sum
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+import hashlib
 import json
 
 from reportlab.lib.pagesizes import letter
@@ -13,10 +18,16 @@ from openpyxl.styles import Font
 
 from .models import (
     Documento, DetalleDoc, Transaccion,
-    TipoTransaccion, TipoPago, FormaPago, Proyecto
+    TipoTransaccion, TipoPago, FormaPago,
+    GastoProveedor,
 )
 from ProductoServicioApp.models import ProductoServicio
+from ProductoServicioApp.precios import precios_a_fecha
+from ProductoServicioApp.vigencia import errores_vigencia, productos_vigentes
+from EmpresaPersonaApp.descargas import respuesta_csv
+from EmpresaPersonaApp.versiones import obtener_version
 from .forms import DocumentoForm
+from .territorio import NIVELES, columnas as columnas_territorio, filas_territorio
 
 
 # ============================================================
@@ -88,13 +99,111 @@ def _facturacion_context(doc_form):
         "doc_form": doc_form,
         "tipos_trans": TipoTransaccion.objects.all(),
         "tipos_pago": TipoPago.objects.all(),
-        "productos": ProductoServicio.objects.all(),
+        # Los productos se buscan con api_buscar_productos (no se embebe el catálogo)
 
         "errores": False,
         "external_errors": {},
     }
 
 
+# ============================================================
+# API: BUSCADOR DE PRODUCTOS (typeahead del detalle)
+# ============================================================
+PRODUCTOS_BUSQUEDA_LIMITE = 20
+PRODUCTOS_BUSQUEDA_MAX = 50
+PRODUCTOS_BUSQUEDA_CACHE_SEGUNDOS = 60
+
+
+def api_buscar_productos(request):
+    """
+    GET ?q=texto&limit=20 -> productos cuyo SKU o nombre EMPIEZA con q
+    (prefijo: usa los índices de produ_sku y produ_nom).
+    Con ?fecha=AAAA-MM-DD solo devuelve los vigentes a esa fecha.
+    """
+    q = request.GET.get("q", "").strip()
+    try:
+        limite = int(request.GET.get("limit", PRODUCTOS_BUSQUEDA_LIMITE))
+    except ValueError:
+        limite = PRODUCTOS_BUSQUEDA_LIMITE
+    limite = max(1, min(limite, PRODUCTOS_BUSQUEDA_MAX))
+    try:
+        fecha = parse_date(request.GET.get("fecha", "") or "")
+    except ValueError:
+        return JsonResponse({"error": "fecha no válida: usa AAAA-MM-DD"}, status=400)
+
+    # La versión de productos cambia con cada escritura: nunca se sirve un precio viejo
+    consulta = hashlib.md5(q.lower().encode()).hexdigest()
+    clave = f"productos-busqueda-{obtener_version('productos')}-{limite}-{fecha or ''}-{consulta}"
+    resultados = cache.get(clave)
+    if resultados is None:
+        productos = ProductoServicio.objects.order_by("produ_nom", "produ_id")
+        if fecha:
+            productos = productos_vigentes(fecha, productos)
+        if q:
+            productos = productos.filter(Q(produ_sku__istartswith=q) | Q(produ_nom__istartswith=q))
+
+        resultados = [
+            {
+                "id": p["produ_id"],
+                "sku": p["produ_sku"],
+                "nombre": p["produ_nom"],
+                "precio": p["produ_bruto"],
+                "vigencia_inicio": p["produ_vigencia_inicio"].isoformat() if p["produ_vigencia_inicio"] else None,
+                "vigencia_fin": p["produ_vigencia_fin"].isoformat() if p["produ_vigencia_fin"] else None,
+            }
+            for p in productos.values(
+                "produ_id", "produ_sku", "produ_nom", "produ_bruto",
+                "produ_vigencia_inicio", "produ_vigencia_fin",
+            )[:limite]
+        ]
+        cache.set(clave, resultados, PRODUCTOS_BUSQUEDA_CACHE_SEGUNDOS)
+
+    return JsonResponse({"results": resultados})
+
+
+# ============================================================
+# API: PRECIOS A UNA FECHA (historial)
+# ============================================================
+PRECIOS_IDS_MAX = 500
+
+
+def api_precios_a_fecha(request):
+    """
+    GET ?fecha=AAAA-MM-DD&ids=1,2,3 -> precio vigente de cada producto a esa
+    fecha según HistorialPrecio (para auditar o repreciar documentos antiguos
+    sin tocar sus totales actuales).
+    """
+    try:
+        fecha = parse_date(request.GET.get("fecha", "") or "")
+    except ValueError:
+        fecha = None
+    if not fecha:
+        return JsonResponse({"error": "Debes indicar fecha=AAAA-MM-DD"}, status=400)
+
+    ids = [int(x) for x in request.GET.get("ids", "").split(",") if x.strip().isdigit()]
+    if not ids or len(ids) > PRECIOS_IDS_MAX:
+        return JsonResponse({"error": f"Debes indicar entre 1 y {PRECIOS_IDS_MAX} ids de productos"}, status=400)
+
+    precios = precios_a_fecha(ids, fecha)
+    return JsonResponse({
+        "fecha": fecha.isoformat(),
+        "precios": {
+            str(produ_id): (
+                {
+                    "bruto": h.bruto,
+                    "neto": h.neto,
+                    "iva": h.iva,
+                    "dscto": h.dscto,
+                    "vigente_desde": h.fecha_vigencia.isoformat(),
+                    "origen": h.origen,
+                }
+                if (h := precios.get(produ_id)) else None
+            )
+            for produ_id in ids
+        },
+    })
+
+
 # ============================================================
 # LISTA DOCUMENTOS (ÚNICA PANTALLA)
 # ============================================================
@@ -125,17 +234,19 @@ def anular_documento(request, pk):
 # CREAR DOCUMENTO + DETALLE (UN SOLO SUBMIT)
 # ============================================================
 
-def crear_documento(request):
-    if request.method != "POST":
-        return redirect("facturacionapp:lista_documentos")
-
-    form = DocumentoForm(request.POST)
+def _validar_documento(datos):
+    """
+    Valida el POST de creación sin escribir nada.
+    Devuelve (form, detalle_data, dias_pago_int, external_field_errors);
+    los errores quedan en form.errors.
+    """
+    form = DocumentoForm(datos)
 
     # Campos externos
-    tipo_pago_id = request.POST.get("tipo_pago")
-    dias_pago = request.POST.get("fpago_dias")
-    tipo_trans_id = request.POST.get("tipo_trans")
-    detalle_json = request.POST.get("detalle_json")
+    tipo_pago_id = datos.get("tipo_pago")
+    dias_pago = datos.get("fpago_dias")
+    tipo_trans_id = datos.get("tipo_trans")
+    detalle_json = datos.get("detalle_json")
 
     errores_externos = []
     external_field_errors = {}
@@ -195,49 +306,48 @@ def crear_documento(request):
     # Validar formulario base
     form.is_valid()
 
-    # Validaciones de fecha con vigencias
+    # Validaciones de fecha con vigencias (solo trae los productos fuera de rango)
     if not form.errors:
-        docum_fecha_emi = form.cleaned_data.get("docum_fecha_emi")
-        docum_fecha_recl = form.cleaned_data.get("docum_fecha_recl")
-
         ids = [item["id"] for item in detalle_data if "id" in item]
-        productos = ProductoServicio.objects.filter(pk__in=ids)
-        map_prod = {str(p.pk): p for p in productos}
-
-        for item in detalle_data:
-            prod = map_prod.get(str(item["id"]))
-            if not prod:
-                continue
-
-            inicio = prod.produ_vigencia_inicio
-            fin = prod.produ_vigencia_fin
-
-            # Validaciones fecha emisión / reclamo
-            if docum_fecha_emi:
-                if inicio and docum_fecha_emi < inicio:
-                    form.add_error("docum_fecha_emi",
-                        f"La emisión para {prod.produ_nom} debe ser ≥ {inicio}."
-                    )
-                if fin and docum_fecha_emi > fin:
-                    form.add_error("docum_fecha_emi",
-                        f"La emisión para {prod.produ_nom} debe ser ≤ {fin}."
-                    )
-
-            if docum_fecha_recl:
-                if inicio and docum_fecha_recl < inicio:
-                    form.add_error("docum_fecha_recl",
-                        f"El reclamo para {prod.produ_nom} debe ser ≥ {inicio}."
-                    )
-                if fin and docum_fecha_recl > fin:
-                    form.add_error("docum_fecha_recl",
-                        f"El reclamo para {prod.produ_nom} debe ser ≤ {fin}."
-                    )
+        for campo, mensaje in errores_vigencia(
+            ids,
+            form.cleaned_data.get("docum_fecha_emi"),
+            form.cleaned_data.get("docum_fecha_recl"),
+        ):
+            form.add_error(campo, mensaje)
 
     # Enviar errores externos
     for e in errores_externos:
         form.add_error(None, e)
 
+    return form, detalle_data, dias_pago_int, external_field_errors
+
+
+@require_POST
+def api_validar_documento(request):
+    """
+    Validación previa del formulario de creación (sin escribir ni renderizar):
+    el modal la llama antes de enviar y solo hace el submit si no hay errores.
+    """
+    form, _, _, external_field_errors = _validar_documento(request.POST)
+    return JsonResponse({
+        "success": not form.errors,
+        "errores": form.errors,
+        "external_errors": external_field_errors,
+    })
+
+
+@transaction.atomic
+def crear_documento(request):
+    if request.method != "POST":
+        return redirect("facturacionapp:lista_documentos")
+
+    form, detalle_data, dias_pago_int, external_field_errors = _validar_documento(request.POST)
+    tipo_pago_id = request.POST.get("tipo_pago")
+    tipo_trans_id = request.POST.get("tipo_trans")
+
     if form.errors:
+        # Solo llega aquí si el navegador no pasó por api_validar_documento
         context = _facturacion_context(form)
         context["errores"] = True
         context["external_errors"] = external_field_errors
@@ -422,6 +532,7 @@ def api_toggle_pagado_detalle(request, doc_id):
 # EDITAR DOCUMENTO (POST)
 # ============================================================
 
+@transaction.atomic
 def editar_documento_post(request, pk):
     doc = get_object_or_404(Documento, pk=pk)
 
@@ -670,107 +781,161 @@ def export_excel_all(request):
 
 
 # ============================================================
-# VISTA: CONTABILIDAD POR PROYECTO
+# GASTO POR PROVEEDOR × PRODUCTO × MES (tabla precalculada)
 # ============================================================
-def api_documentos_por_proyecto(request, proyecto_id):
-    proyecto = get_object_or_404(Proyecto, pk=proyecto_id)
+GASTO_POR_PAGINA = 100
+GASTO_MAX_POR_PAGINA = 500
 
-    documentos = Documento.objects.filter(proyecto=proyecto).select_related(
-        "empresa", "tipo_doc"
-    )
 
-    # ---------------------------------------------
-    # 🟩 COSTO TOTAL DEL PROYECTO (nuevo campo)
-    # ---------------------------------------------
-    proye_cost = proyecto.proye_cost if hasattr(proyecto, "proye_cost") else 0
+def _mes_param(params, nombre):
+    """AAAA-MM -> primer día del mes (None si viene vacío); ValueError si no es un mes válido."""
+    valor = params.get(nombre, "")
+    if not valor:
+        return None
+    try:
+        mes = parse_date(f"{valor}-01")
+    except ValueError:  # formato correcto pero mes imposible (2024-13)
+        mes = None
+    if mes is None:
+        raise ValueError(f"{nombre} debe tener el formato AAAA-MM")
+    return mes
+
+
+def _filtrar_gasto(params):
+    """
+    ?proveedor=ID&producto=ID&desde=AAAA-MM&hasta=AAAA-MM sobre GastoProveedor.
+    ValueError si desde/hasta no son meses válidos (las vistas responden 400).
+    """
+    gastos = GastoProveedor.objects.all()
+
+    proveedor = params.get("proveedor", "")
+    if proveedor.isdigit():
+        gastos = gastos.filter(emppe_id=int(proveedor))
+    producto = params.get("producto", "")
+    if producto.isdigit():
+        gastos = gastos.filter(produ_id=int(producto))
+
+    desde = _mes_param(params, "desde")
+    hasta = _mes_param(params, "hasta")
+    if desde:
+        gastos = gastos.filter(mes__gte=desde)
+    if hasta:
+        gastos = gastos.filter(mes__lte=hasta)
+
+    return gastos.order_by("-mes", "emppe_id", "produ_id")
+
+
+GASTO_COLUMNAS = (
+    "mes", "emppe_id", "emppe__emppe_nom", "emppe__emppe_rut",
+    "produ_id", "produ__produ_sku", "produ__produ_nom", "cantidad", "bruto",
+)
+
 
-    ingresos = 0
-    egresos = 0
+def _gasto_dict(g):
+    return {
+        "mes": g["mes"].strftime("%Y-%m"),
+        "proveedor": {"id": g["emppe_id"], "nombre": g["emppe__emppe_nom"], "rut": g["emppe__emppe_rut"]},
+        "producto": {"id": g["produ_id"], "sku": g["produ__produ_sku"], "nombre": g["produ__produ_nom"]},
+        "cantidad": g["cantidad"],
+        "bruto": g["bruto"],
+    }
 
-    data_docs = []
 
-    for d in documentos:
+def api_gasto_proveedores(request):
+    """Filas paginadas del gasto + total del filtro."""
+    try:
+        gastos = _filtrar_gasto(request.GET)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
 
-        # Calcular MONTO BRUTO del documento
-        bruto = sum(
-            det.dedoc_cant * (det.producto.produ_bruto if det.producto else 0)
-            for det in d.detalles.all()
-        )
+    try:
+        por_pagina = int(request.GET.get("per_page", GASTO_POR_PAGINA))
+    except ValueError:
+        por_pagina = GASTO_POR_PAGINA
+    por_pagina = max(1, min(por_pagina, GASTO_MAX_POR_PAGINA))
+    page_obj = Paginator(gastos.values(*GASTO_COLUMNAS), por_pagina).get_page(request.GET.get("page"))
 
-        # Determinar si es ingreso o egreso
-        tipo_trans = (
-            d.transacciones.first().tipo.tipo_trans.upper()
-            if d.transacciones.exists()
-            else "INGRESO"
-        )
+    totales = gastos.aggregate(total_cantidad=Sum("cantidad"), total_bruto=Sum("bruto"))
 
-        if "INGRESO" in tipo_trans:
-            ingresos += bruto
-        else:
-            egresos += bruto
-
-        # Guardar documento para la tabla del modal
-        data_docs.append({
-            "id": d.pk,
-            "num": d.docum_num,
-            "fecha": d.docum_fecha_emi.strftime("%Y-%m-%d") if d.docum_fecha_emi else "",
-            "estado": d.docum_estado,
-            "cliente": d.empresa.emppe_nom if d.empresa else "Sin cliente",
-            "total": bruto,
-            "tipo_trans": tipo_trans,
-        })
+    return JsonResponse({
+        "results": [_gasto_dict(g) for g in page_obj.object_list],
+        "page": page_obj.number,
+        "num_pages": page_obj.paginator.num_pages,
+        "count": page_obj.paginator.count,
+        "total_cantidad": totales["total_cantidad"] or 0,
+        "total_bruto": totales["total_bruto"] or 0,
+    })
 
-    # ---------------------------------------------
-    # 🧮 CÁLCULO DE UTILIDAD
-    # ---------------------------------------------
-    utilidad = ingresos - egresos
 
-    # ---------------------------------------------
-    # 🟦 CÁLCULO DE BARRAS PARA EL FRONT
-    # ---------------------------------------------
-    barra_total = proye_cost
+def export_gasto_proveedores(request):
+    """CSV en streaming con el mismo filtro de api_gasto_proveedores."""
+    try:
+        gastos = _filtrar_gasto(request.GET).values_list(*GASTO_COLUMNAS)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return respuesta_csv(
+        "gasto_proveedores.csv",
+        ["Mes", "ID proveedor", "Proveedor", "RUT", "ID producto", "SKU", "Producto", "Cantidad", "Bruto"],
+        ([mes.strftime("%Y-%m"), *resto] for mes, *resto in gastos.iterator(chunk_size=2000)),
+    )
 
-    barra_restante = max(proye_cost - egresos, 0)
 
-    # porcentaje para llenar la barra
-    if proye_cost > 0:
-        barra_porcentaje = round((barra_restante / proye_cost) * 100, 2)
-    else:
-        barra_porcentaje = 0
+# ============================================================
+# INGRESOS / EGRESOS / PENDIENTES POR TERRITORIO
+# ============================================================
+def _params_territorio(params):
+    """
+    ?nivel=region|ciudad|comuna&desde=AAAA-MM-DD&hasta=AAAA-MM-DD ->
+    (nivel, desde, hasta); ValueError con el mensaje para el 400.
+    """
+    nivel = params.get("nivel", "region")
+    if nivel not in NIVELES:
+        raise ValueError("nivel debe ser region, ciudad o comuna")
+    fechas = []
+    for nombre in ("desde", "hasta"):
+        try:
+            fecha = parse_date(params.get(nombre, ""))
+        except ValueError:  # formato correcto pero fecha imposible (2024-02-30)
+            fecha = None
+        if params.get(nombre) and fecha is None:
+            raise ValueError(f"{nombre} debe ser una fecha AAAA-MM-DD válida")
+        fechas.append(fecha)
+    return nivel, *fechas
+
 
+def api_territorio(request):
+    """Resumen por región, ciudad o comuna de la empresa + totales."""
+    try:
+        nivel, desde, hasta = _params_territorio(request.GET)
+    except ValueError as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+
+    filas = filas_territorio(nivel, desde, hasta)
     return JsonResponse({
         "success": True,
-        "proyecto": {
-            "id": proyecto.pk,
-            "nombre": proyecto.proye_desc,
-            "cliente": proyecto.cliente.emppe_nom if hasattr(proyecto, "cliente") else "",
-            "proye_cost": proye_cost,
+        "nivel": nivel,
+        "results": filas,
+        "totales": {
+            clave: sum(f[clave] for f in filas)
+            for clave in ("ingresos", "egresos", "por_cobrar", "por_pagar")
         },
-        "docs": data_docs,
-        "ingresos": ingresos,
-        "egresos": egresos,
-        "utilidad": utilidad,
-
-        # datos para la barra de utilidad
-        "barra": {
-            "total": barra_total,
-            "restante": barra_restante,
-            "porcentaje": barra_porcentaje,
-        }
     })
 
-@csrf_exempt
-def api_quitar_documento(request, doc_id):
-    if request.method != "POST":
-        return JsonResponse({"success": False, "error": "Método no permitido"})
-
-    doc = get_object_or_404(Documento, pk=doc_id)
 
-    # quitar relación con proyecto
-    if doc.docum_estado == "ANULADO":
-        return JsonResponse({"success": False, "error": "Documento anulado"})
-
-    doc.proyecto = None
-    doc.save(update_fields=["proyecto"])
-
-    return JsonResponse({"success": True})
\ No newline at end of file
+def export_territorio(request):
+    """CSV en streaming con el mismo filtro de api_territorio."""
+    try:
+        nivel, desde, hasta = _params_territorio(request.GET)
+    except ValueError as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+
+    columnas = columnas_territorio(nivel)
+    return respuesta_csv(
+        f"territorio_{nivel}.csv",
+        [titulo for _, titulo in columnas],
+        (
+            [fila[clave]["nombre"] if isinstance(fila[clave], dict) else fila[clave] for clave, _ in columnas]
+            for fila in filas_territorio(nivel, desde, hasta)
+        ),
+    )
@@ -0,0 +1,205 @@
+# ProductoServicioApp/adjuntos.py
+"""
+Procesamiento de los archivos adjuntos de un producto (ProductoExcel).
+
+La subida solo guarda el archivo (estado PENDIENTE) y lo encola; un hilo
+de trabajo lo abre en modo read_only, lee hasta la primera fila con datos
+y actualiza los valores del adjunto y los precios del producto.
+
+El hilo es un atajo, no una garantía: se pierde si el servidor se reinicia
+y en hostings sin hilos (uWSGI sin enable-threads, PythonAnywhere) nunca
+llega a correr. Ahí se pone ADJUNTOS_EN_SEGUNDO_PLANO = False (se leen en la
+misma petición) y, en todo caso, el reintento real es el comando
+`python manage.py procesar_adjuntos` programado cada pocos minutos.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .importacion import COLUMNAS, validar_precio
+from .models import ProductoExcel
+from .precios import registrar_historial
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES_EXCEL = {".xlsx", ".xls", ".xlsm"}
+
+# Un solo hilo: los adjuntos de un producto se aplican en el orden de subida.
+# Se crea al primer uso, no al importar el módulo.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="adjuntos")
+        return _pool
+
+
+def es_excel(nombre) -> bool:
+    return Path(nombre).suffix.lower() in EXTENSIONES_EXCEL
+
+
+def hash_archivo(archivo) -> str:
+    """SHA-256 del contenido subido (por bloques, sin cargarlo entero)."""
+    digest = hashlib.sha256()
+    for bloque in archivo.chunks():
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+# ==============================
+#   LECTURA (solo la primera fila)
+# ==============================
+def leer_precio_excel(archivo) -> tuple[int, int, int, int]:
+    """(neto, iva, bruto_final, dscto) de la primera fila con datos, o ValueError."""
+    try:
+        workbook = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError("No se pudo leer el archivo. Verifica que sea un .xlsx válido.")
+
+    try:
+        filas = workbook.active.iter_rows(values_only=True)
+        headers = list(next(filas, None) or [])
+        # Las columnas de precio son las 5 primeras de la plantilla (PRODU_SKU es opcional aquí)
+        if headers[:5] != COLUMNAS[:5]:
+            raise ValueError(
+                "La plantilla no coincide con el formato esperado. Descarga nuevamente la plantilla y vuelve a intentarlo."
+            )
+
+        primera_fila = next((row for row in filas if row and any(row)), None)
+    finally:
+        workbook.close()
+
+    if not primera_fila:
+        raise ValueError("El archivo no contiene filas de datos.")
+
+    _, _, bruto, dscto = (tuple(primera_fila) + (None,) * 4)[:4]
+    try:
+        return validar_precio(bruto, dscto)
+    except ValueError as exc:
+        mensaje = str(exc)
+        raise ValueError(mensaje[:1].upper() + mensaje[1:])
+
+
+# ==============================
+#   PROCESAMIENTO
+# ==============================
+def aplicar_valores(adjunto, neto, iva, bruto, dscto) -> bool:
+    """
+    Guarda los valores leídos en el adjunto y en los precios del producto.
+
+    El adjunto se reclama con un UPDATE condicionado a estado PENDIENTE: si
+    el hilo de trabajo y procesar_adjuntos llegan a la vez, solo uno aplica
+    los precios y registra el historial. Devuelve False si otro ya lo hizo.
+    """
+    with transaction.atomic():
+        reclamado = ProductoExcel.objects.filter(
+            pk=adjunto.pk, estado=ProductoExcel.ESTADO_PENDIENTE
+        ).update(
+            valor_neto=neto, valor_iva=iva, valor_bruto=bruto, descuento=dscto,
+            estado=ProductoExcel.ESTADO_PROCESADO, error="",
+        )
+        if not reclamado:
+            return False
+        adjunto.valor_neto, adjunto.valor_iva, adjunto.valor_bruto, adjunto.descuento = neto, iva, bruto, dscto
+        adjunto.estado = ProductoExcel.ESTADO_PROCESADO
+        adjunto.error = ""
+
+        producto = adjunto.producto
+        producto.produ_neto = neto
+        producto.produ_iva = iva
+        producto.produ_bruto = bruto
+        producto.produ_dscto = dscto
+        producto.save(update_fields=["produ_neto", "produ_iva", "produ_bruto", "produ_dscto"])
+        registrar_historial([producto], "excel_producto")
+    return True
+
+
+def procesar_adjunto(adjunto_id) -> bool:
+    """
+    Procesa un adjunto PENDIENTE (si ya no lo está, no hace nada). Devuelve
+    True si esta llamada lo dejó PROCESADO o en ERROR.
+    """
+    adjunto = (
+        ProductoExcel.objects
+        .select_related("producto")
+        .filter(pk=adjunto_id, estado=ProductoExcel.ESTADO_PENDIENTE)
+        .first()
+    )
+    if adjunto is None:
+        return False
+
+    try:
+        with adjunto.archivo.open("rb") as archivo:
+            valores = leer_precio_excel(archivo)
+    except (ValueError, OSError) as exc:
+        return bool(
+            ProductoExcel.objects
+            .filter(pk=adjunto.pk, estado=ProductoExcel.ESTADO_PENDIENTE)
+            .update(estado=ProductoExcel.ESTADO_ERROR, error=str(exc)[:255])
+        )
+
+    return aplicar_valores(adjunto, *valores)
+
+
+def _trabajo(adjunto_id):
+    try:
+        procesar_adjunto(adjunto_id)
+    except Exception:
+        logger.exception("Error procesando el adjunto %s", adjunto_id)
+    finally:
+        # Cada hilo tiene su propia conexión; se cierra al terminar el trabajo
+        connection.close()
+
+
+def _procesar_ahora(adjunto_id):
+    try:
+        procesar_adjunto(adjunto_id)
+    except Exception:
+        # Queda PENDIENTE: lo reintenta el comando procesar_adjuntos
+        logger.exception("Error procesando el adjunto %s", adjunto_id)
+
+
+def encolar(adjunto_id):
+    """
+    Procesa el adjunto cuando la transacción actual confirme: en el hilo de
+    trabajo o, con ADJUNTOS_EN_SEGUNDO_PLANO = False, en la misma petición.
+    """
+    if not getattr(settings, "ADJUNTOS_EN_SEGUNDO_PLANO", True):
+        transaction.on_commit(lambda: _procesar_ahora(adjunto_id))
+        return
+
+    def enviar():
+        try:
+            _obtener_pool().submit(_trabajo, adjunto_id)
+        except RuntimeError:
+            # Sin hilos disponibles (o intérprete cerrándose)
+            _procesar_ahora(adjunto_id)
+
+    transaction.on_commit(enviar)
+
+
+def procesar_pendientes(minutos=0) -> int:
+    """
+    Procesa en este hilo los adjuntos PENDIENTE con al menos `minutos` de
+    antigüedad (para no releer los que el hilo de trabajo está leyendo).
+    Cada uno se reclama al aplicarlo, así que los que otro proceso termina
+    entre medio se saltan. Devuelve cuántos procesó este llamado.
+    """
+    pendientes = ProductoExcel.objects.filter(estado=ProductoExcel.ESTADO_PENDIENTE)
+    if minutos:
+        pendientes = pendientes.filter(creado_en__lte=timezone.now() - timedelta(minutes=minutos))
+    pendientes = list(pendientes.order_by("creado_en", "pk").values_list("pk", flat=True))
+    return sum(procesar_adjunto(adjunto_id) for adjunto_id in pendientes)
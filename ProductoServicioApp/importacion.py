@@ -0,0 +1,290 @@
+# ProductoServicioApp/importacion.py
+"""
+Carga masiva de productos/servicios desde la plantilla Excel.
+
+El libro se recorre en modo read_only (filas en streaming, sin cargar el
+.xlsx completo en memoria), los proveedores referenciados se buscan con
+UNA consulta y los productos + Abastecimiento se insertan con bulk_create
+por bloques, cada bloque en su propia transacción.
+
+Modos (clave: PRODU_SKU):
+- "crear": solo agrega; un SKU ya registrado se informa como error.
+- "actualizar": upsert para refrescar listas de precios; los SKU existentes
+  se actualizan con bulk_update (solo si algo cambió) y los nuevos se crean.
+Con dry_run=True no se escribe nada y solo se devuelve el resumen.
+"""
+import re
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from openpyxl import load_workbook
+
+from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.versiones import invalidar_version
+from .models import Abastecimiento, ProductoServicio
+from .precios import recalcula_campos, registrar_historial
+
+COLUMNAS = ["PRODU_NOM", "PRODU_DESC", "PRODU_BRUTO", "PRODU_DSCTO", "EMPPE_ID (proveedor)", "PRODU_SKU"]
+
+MODOS = ("crear", "actualizar")
+
+# Campos que se comparan/actualizan en modo "actualizar"
+CAMPOS_ACTUALIZABLES = ["produ_nom", "produ_desc", "produ_bruto", "produ_neto", "produ_iva", "produ_dscto"]
+
+# Mismo patrón que ProductoServicio.texto_validator
+TEXTO_RE = re.compile(r"^[A-Za-z0-9ÁÉÍÓÚáéíóúÑñ .\-]+$")
+
+BLOQUE = 1000
+MAX_CAMBIOS_DETALLE = 50  # cambios de ejemplo que se devuelven en el resumen
+
+
+# ==============================
+#   LECTURA (streaming)
+# ==============================
+def abrir_plantilla(archivo):
+    """
+    Abre el libro en modo read_only y valida encabezados.
+    Devuelve (workbook, iterador de filas de datos con su número de fila).
+    """
+    try:
+        workbook = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError("No se pudo leer el archivo. Verifica que sea un .xlsx válido.")
+
+    filas = workbook.active.iter_rows(values_only=True)
+    headers = list(next(filas, None) or [])
+    if headers[: len(COLUMNAS)] != COLUMNAS:
+        workbook.close()
+        raise ValueError(
+            "La plantilla no coincide con el formato esperado. Descarga nuevamente la plantilla y vuelve a intentarlo."
+        )
+    return workbook, enumerate(filas, start=2)
+
+
+def validar_precio(bruto, dscto):
+    """(bruto, dscto) de la planilla -> (neto, iva, bruto_final, dscto_int) o ValueError."""
+    if bruto is None:
+        raise ValueError("el valor bruto es obligatorio.")
+    try:
+        bruto_decimal = Decimal(bruto)
+    except Exception:
+        raise ValueError("el valor bruto debe ser numérico.")
+
+    try:
+        dscto_decimal = Decimal(dscto or 0)
+    except Exception:
+        raise ValueError("el descuento debe ser un número entre 0 y 100.")
+    if dscto_decimal < 0 or dscto_decimal > 100:
+        raise ValueError("el descuento debe estar entre 0 y 100%.")
+
+    neto, iva, bruto_final = recalcula_campos(bruto_decimal, dscto_decimal)
+    return neto, iva, bruto_final, int(dscto_decimal)
+
+
+def _texto(valor, campo, largo, obligatorio=True):
+    texto = str(valor).strip() if valor is not None else ""
+    if isinstance(valor, float) and valor.is_integer():
+        texto = str(int(valor))
+    if not texto:
+        if obligatorio:
+            raise ValueError(f"{campo} es obligatorio.")
+        return ""
+    if len(texto) > largo:
+        raise ValueError(f"{campo} supera los {largo} caracteres.")
+    if not TEXTO_RE.match(texto):
+        raise ValueError(f"{campo}: solo se permiten letras, números, espacios, puntos y guiones.")
+    return texto
+
+
+def _leer_fila(row):
+    """Fila de la plantilla -> (ProductoServicio sin guardar, proveedor_id | None, aviso | None)."""
+    nombre, descripcion, bruto, dscto, proveedor_id, sku = (tuple(row) + (None,) * 6)[:6]
+
+    if not nombre or not descripcion or bruto is None:
+        raise ValueError("nombre, descripción y valor bruto son obligatorios.")
+
+    producto = ProductoServicio(
+        produ_sku=_texto(sku, "el SKU", 20),
+        produ_nom=_texto(nombre, "el nombre", 50),
+        produ_desc=_texto(descripcion, "la descripción", 200),
+    )
+    (
+        producto.produ_neto,
+        producto.produ_iva,
+        producto.produ_bruto,
+        producto.produ_dscto,
+    ) = validar_precio(bruto, dscto)
+
+    aviso = None
+    if proveedor_id:
+        try:
+            proveedor_id = int(proveedor_id)
+        except (TypeError, ValueError):
+            aviso = "el ID de proveedor debe ser numérico; el producto se guardó sin proveedor."
+            proveedor_id = None
+    return producto, proveedor_id or None, aviso
+
+
+def _existentes_por_sku(skus):
+    """{sku: ProductoServicio} de los SKU ya registrados (IN por bloques)."""
+    skus = list(skus)
+    existentes = {}
+    for i in range(0, len(skus), BLOQUE):
+        for producto in ProductoServicio.objects.filter(produ_sku__in=skus[i:i + BLOQUE]).only(
+            "produ_id", "produ_sku", *CAMPOS_ACTUALIZABLES
+        ):
+            existentes[producto.produ_sku] = producto
+    return existentes
+
+
+# ==============================
+#   IMPORTACIÓN
+# ==============================
+def importar_productos(archivo, modo="crear", dry_run=False, al_avanzar=None):
+    """
+    Importa la plantilla y devuelve el resumen:
+        {"creados", "actualizados", "sin_cambios", "errores": [str],
+         "cambios": [{"sku", "campo", "antes", "despues"}]}
+    `al_avanzar(guardados, total)` se llama tras cada bloque (progreso).
+    """
+    if modo not in MODOS:
+        raise ValueError("Modo de importación no válido.")
+
+    workbook, filas = abrir_plantilla(archivo)
+
+    errores: list[str] = []
+    validas = []                 # (n_fila, ProductoServicio, proveedor_id | None)
+    vistos = {}                  # sku -> n_fila (repetidos dentro del archivo)
+
+    try:
+        for row_number, row in filas:
+            if not row or not any(row):
+                continue  # fila completamente vacía
+            try:
+                producto, proveedor_id, aviso = _leer_fila(row)
+            except ValueError as exc:
+                errores.append(f"Fila {row_number}: {exc}")
+                continue
+
+            if producto.produ_sku in vistos:
+                errores.append(
+                    f"Fila {row_number}: SKU {producto.produ_sku} repetido en el archivo (fila {vistos[producto.produ_sku]})."
+                )
+                continue
+            vistos[producto.produ_sku] = row_number
+
+            if aviso:
+                errores.append(f"Fila {row_number}: {aviso}")
+            validas.append((row_number, producto, proveedor_id))
+    finally:
+        workbook.close()
+
+    # Una consulta para los proveedores y otra (por bloques) para los SKU existentes
+    proveedores = set(
+        EmpresaPersona.objects
+        .filter(pk__in={p for _, _, p in validas if p})
+        .values_list("pk", flat=True)
+    )
+    existentes = _existentes_por_sku(vistos)
+
+    nuevos = []                  # (n_fila, producto, proveedor_id)
+    modificados = []             # productos existentes con algún campo distinto
+    enlaces = []                 # Abastecimiento de productos existentes
+    cambios = []
+    sin_cambios = 0
+    for row_number, producto, proveedor_id in validas:
+        if proveedor_id and proveedor_id not in proveedores:
+            errores.append(
+                f"Fila {row_number}: no existe proveedor con ID {proveedor_id}; el producto se guardó sin proveedor."
+            )
+            proveedor_id = None
+
+        actual = existentes.get(producto.produ_sku)
+        if actual is None:
+            nuevos.append((row_number, producto, proveedor_id))
+            continue
+        if modo == "crear":
+            errores.append(f"Fila {row_number}: el SKU {producto.produ_sku} ya está registrado.")
+            continue
+
+        cambiado = False
+        for campo in CAMPOS_ACTUALIZABLES:
+            antes, despues = getattr(actual, campo), getattr(producto, campo)
+            if antes != despues:
+                cambiado = True
+                setattr(actual, campo, despues)
+                if len(cambios) < MAX_CAMBIOS_DETALLE:
+                    cambios.append({"sku": actual.produ_sku, "campo": campo, "antes": antes, "despues": despues})
+        if cambiado:
+            modificados.append(actual)
+        else:
+            sin_cambios += 1
+        if proveedor_id:
+            # Se agrega si aún no estaba asociado (ignore_conflicts)
+            enlaces.append(Abastecimiento(emppe_id=proveedor_id, produ_id=actual.pk))
+
+    resumen = {
+        "creados": len(nuevos),
+        "actualizados": len(modificados),
+        "sin_cambios": sin_cambios,
+        "errores": errores,
+        "cambios": cambios,
+    }
+    if dry_run:
+        return resumen
+
+    total = len(nuevos) + len(modificados)
+    guardados = 0
+    resumen["creados"] = 0
+
+    # Productos nuevos
+    for i in range(0, len(nuevos), BLOQUE):
+        bloque = nuevos[i:i + BLOQUE]
+        try:
+            with transaction.atomic():
+                productos = [producto for _, producto, _ in bloque]
+                ProductoServicio.objects.bulk_create(productos, batch_size=BLOQUE)
+                # MySQL no devuelve los PK del bulk_create: se leen por SKU
+                ids = dict(
+                    ProductoServicio.objects
+                    .filter(produ_sku__in=[producto.produ_sku for producto in productos])
+                    .values_list("produ_sku", "pk")
+                )
+                for producto in productos:
+                    producto.pk = ids[producto.produ_sku]
+                registrar_historial(productos, "importacion")
+                Abastecimiento.objects.bulk_create(
+                    [
+                        Abastecimiento(emppe_id=proveedor_id, produ_id=producto.pk)
+                        for _, producto, proveedor_id in bloque
+                        if proveedor_id
+                    ],
+                    batch_size=BLOQUE,
+                )
+        except IntegrityError:
+            errores.append(
+                f"Filas {bloque[0][0]} a {bloque[-1][0]}: no se pudieron guardar (SKU registrado en paralelo)."
+            )
+        else:
+            resumen["creados"] += len(bloque)
+        guardados += len(bloque)
+        if al_avanzar:
+            al_avanzar(guardados, total)
+
+    # Productos existentes (modo "actualizar")
+    for i in range(0, len(modificados), BLOQUE):
+        bloque = modificados[i:i + BLOQUE]
+        with transaction.atomic():
+            ProductoServicio.objects.bulk_update(bloque, CAMPOS_ACTUALIZABLES, batch_size=BLOQUE)
+            registrar_historial(bloque, "importacion")
+        guardados += len(bloque)
+        if al_avanzar:
+            al_avanzar(guardados, total)
+
+    Abastecimiento.objects.bulk_create(enlaces, batch_size=BLOQUE, ignore_conflicts=True)
+
+    if resumen["creados"] or resumen["actualizados"]:
+        # bulk_create / bulk_update no disparan signals
+        invalidar_version("productos")
+
+    return resumen
@@ -0,0 +1,54 @@
+# ProductoServicioApp/management/commands/importar_productos.py
+from django.core.management.base import BaseCommand, CommandError
+
+from ProductoServicioApp.importacion import MODOS, importar_productos
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos/servicios desde la plantilla Excel (misma lógica "
+        "que la carga masiva web), mostrando el avance por bloque. Pensado "
+        "para listas de precios de proveedores muy grandes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del .xlsx con la plantilla de productos.")
+        parser.add_argument(
+            "--modo",
+            choices=MODOS,
+            default="crear",
+            help='"actualizar" refresca los SKU existentes y crea los nuevos.',
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo muestra el resumen de cambios, sin escribir en la BD.",
+        )
+
+    def handle(self, *args, **options):
+        def al_avanzar(guardados, total):
+            self.stdout.write(f"{guardados}/{total} filas procesadas...")
+
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                resumen = importar_productos(
+                    archivo,
+                    modo=options["modo"],
+                    dry_run=options["dry_run"],
+                    al_avanzar=al_avanzar,
+                )
+        except OSError as exc:
+            raise CommandError(f"No se pudo abrir el archivo: {exc}")
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for cambio in resumen["cambios"]:
+            self.stdout.write(f"SKU {cambio['sku']}: {cambio['campo']} {cambio['antes']} -> {cambio['despues']}")
+        for err in resumen["errores"]:
+            self.stdout.write(self.style.WARNING(err))
+
+        prefijo = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resumen['creados']} nuevo(s), {resumen['actualizados']} actualizado(s), "
+            f"{resumen['sin_cambios']} sin cambios ({len(resumen['errores'])} aviso(s))."
+        ))
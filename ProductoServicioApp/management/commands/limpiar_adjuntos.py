@@ -0,0 +1,91 @@
+# ProductoServicioApp/management/commands/limpiar_adjuntos.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ProductoServicioApp.models import ProductoExcel
+
+CARPETA = "productos_excel"
+
+
+class Command(BaseCommand):
+    help = (
+        "Elimina de productos_excel/ los archivos que ningún ProductoExcel "
+        "referencia (huérfanos) y, con --uso, muestra el espacio usado por producto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Solo lista los huérfanos, sin borrarlos.",
+        )
+        parser.add_argument(
+            "--min-edad",
+            type=int,
+            default=60,
+            help="Minutos mínimos de antigüedad para borrar (evita tocar subidas en curso). Por defecto 60.",
+        )
+        parser.add_argument(
+            "--uso",
+            action="store_true",
+            help="Muestra el espacio ocupado por los adjuntos de cada producto.",
+        )
+
+    def handle(self, *args, **options):
+        storage = ProductoExcel._meta.get_field("archivo").storage
+
+        # Una sola consulta con todos los archivos referenciados
+        referenciados = set(ProductoExcel.objects.values_list("archivo", flat=True))
+
+        try:
+            _, archivos = storage.listdir(CARPETA)
+        except FileNotFoundError:
+            archivos = []
+
+        limite = timezone.now() - timedelta(minutes=options["min_edad"])
+        huerfanos = []
+        bytes_huerfanos = 0
+        for nombre in archivos:
+            ruta = f"{CARPETA}/{nombre}"
+            if ruta in referenciados:
+                continue
+            if storage.get_modified_time(ruta) > limite:
+                continue
+            huerfanos.append(ruta)
+            bytes_huerfanos += storage.size(ruta)
+
+        if options["dry_run"]:
+            for ruta in huerfanos:
+                self.stdout.write(ruta)
+        else:
+            for ruta in huerfanos:
+                storage.delete(ruta)
+
+        prefijo = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{len(huerfanos)} archivo(s) huérfano(s), {bytes_huerfanos / 1024 / 1024:.1f} MB "
+            f"{'por liberar' if options['dry_run'] else 'liberados'}."
+        ))
+
+        if options["uso"]:
+            self._mostrar_uso(storage)
+
+    def _mostrar_uso(self, storage):
+        """Suma de tamaños por producto (un archivo compartido cuenta en cada producto que lo usa)."""
+        uso = {}
+        filas = (
+            ProductoExcel.objects
+            .values_list("producto_id", "producto__produ_sku", "archivo")
+            .order_by("producto_id")
+        )
+        tamanos = {}
+        for produ_id, sku, ruta in filas:
+            if ruta not in tamanos:
+                tamanos[ruta] = storage.size(ruta) if storage.exists(ruta) else 0
+            total, _ = uso.get(produ_id, (0, sku))
+            uso[produ_id] = (total + tamanos[ruta], sku)
+
+        for produ_id, (total, sku) in sorted(uso.items(), key=lambda x: -x[1][0]):
+            self.stdout.write(f"{produ_id}\t{sku}\t{total / 1024:.1f} KB")
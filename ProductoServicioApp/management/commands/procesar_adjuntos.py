@@ -0,0 +1,25 @@
+# ProductoServicioApp/management/commands/procesar_adjuntos.py
+from django.core.management.base import BaseCommand
+
+from ProductoServicioApp.adjuntos import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa los archivos Excel de productos que quedaron en estado "
+        "PENDIENTE (por ejemplo, si el servidor se reinició antes de leerlos "
+        "o el hosting no ejecuta hilos). Es el reintento de adjuntos.py: "
+        "programarlo cada pocos minutos (cron o tarea programada)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutos",
+            type=int,
+            default=0,
+            help="Solo los pendientes con al menos esta antigüedad (p. ej. 5 en una tarea programada).",
+        )
+
+    def handle(self, *args, **options):
+        procesados = procesar_pendientes(minutos=max(0, options["minutos"]))
+        self.stdout.write(self.style.SUCCESS(f"Se procesaron {procesados} adjunto(s) pendiente(s)."))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductoServicioApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productoexcel',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('PROCESADO', 'Procesado'), ('ERROR', 'Error')], default='PROCESADO', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='productoexcel',
+            name='error',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='productoexcel',
+            name='hash_contenido',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='productoexcel',
+            constraint=models.UniqueConstraint(fields=('producto', 'hash_contenido'), name='producto_excel_hash_unico'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductoServicioApp', '0002_productoexcel_estado_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productoservicio',
+            index=models.Index(fields=['produ_nom'], name='produ_nom_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.16 on 2026-10-19 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def registrar_precios_actuales(apps, schema_editor):
+    """Punto de partida del historial: el precio vigente de cada producto."""
+    ProductoServicio = apps.get_model('ProductoServicioApp', 'ProductoServicio')
+    HistorialPrecio = apps.get_model('ProductoServicioApp', 'HistorialPrecio')
+    ahora = django.utils.timezone.now()
+
+    HistorialPrecio.objects.bulk_create(
+        (
+            HistorialPrecio(
+                producto_id=p['produ_id'],
+                fecha_vigencia=ahora,
+                bruto=p['produ_bruto'],
+                neto=p['produ_neto'],
+                iva=p['produ_iva'],
+                dscto=p['produ_dscto'],
+                origen='inicial',
+            )
+            for p in ProductoServicio.objects.values(
+                'produ_id', 'produ_bruto', 'produ_neto', 'produ_iva', 'produ_dscto'
+            ).iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductoServicioApp', '0003_productoservicio_produ_nom_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_vigencia', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bruto', models.PositiveIntegerField()),
+                ('neto', models.PositiveIntegerField()),
+                ('iva', models.PositiveIntegerField()),
+                ('dscto', models.PositiveIntegerField(blank=True, null=True)),
+                ('origen', models.CharField(max_length=20)),
+                ('producto', models.ForeignKey(db_column='PRODU_ID', on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='ProductoServicioApp.productoservicio')),
+            ],
+            options={
+                'db_table': 'HISTORIAL_PRECIO',
+                'ordering': ['-fecha_vigencia', '-id'],
+                'indexes': [models.Index(fields=['producto', 'fecha_vigencia'], name='historial_produ_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(registrar_precios_actuales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductoServicioApp', '0004_historialprecio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productoservicio',
+            index=models.Index(fields=['produ_vigencia_inicio', 'produ_vigencia_fin'], name='produ_vigencia_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:05
+
+import datetime
+
+from django.db import migrations
+
+INICIAL_DESDE = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def adelantar_precios_iniciales(apps, schema_editor):
+    """
+    Las filas 'inicial' sembradas con la fecha de la migración dejaban sin
+    precio cualquier consulta anterior a ella: pasan a regir desde INICIAL_DESDE.
+    """
+    HistorialPrecio = apps.get_model('ProductoServicioApp', 'HistorialPrecio')
+    HistorialPrecio.objects.filter(origen='inicial').update(fecha_vigencia=INICIAL_DESDE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProductoServicioApp', '0005_productoservicio_produ_vigencia_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(adelantar_precios_iniciales, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 # ProductoServicioApp/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, RegexValidator
 from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.versiones import invalidar_version
 from django.utils import timezone
 import os
 
@@ -87,6 +90,12 @@ class ProductoServicio(models.Model):
         db_table = 'PRODUCTOS_SERVICIOS'
         verbose_name = "Producto o Servicio"
         verbose_name_plural = "Productos y Servicios"
+        indexes = [
+            # Búsqueda por prefijo de nombre (typeahead de facturación); el SKU ya es UNIQUE
+            models.Index(fields=['produ_nom'], name='produ_nom_idx'),
+            # Productos vigentes a una fecha (ver vigencia.q_vigente)
+            models.Index(fields=['produ_vigencia_inicio', 'produ_vigencia_fin'], name='produ_vigencia_idx'),
+        ]
 
     def __str__(self):
         return f"{self.produ_nom} - Bruto: ${self.produ_bruto} | Neto: ${self.produ_neto}"
@@ -117,10 +126,53 @@ class Abastecimiento(models.Model):
     def __str__(self):
         return f"{self.emppe.emppe_nom} ↔ {self.produ.produ_nom}"
 
+#========================================
+# HISTORIAL DE PRECIOS
+#========================================
+class HistorialPrecio(models.Model):
+    """
+    Precio de un producto desde `fecha_vigencia` hasta el registro siguiente.
+    Lo escriben todas las vías que cambian precios (ver precios.registrar_historial).
+    """
+    producto = models.ForeignKey(
+        ProductoServicio,
+        related_name="historial_precios",
+        on_delete=models.CASCADE,
+        db_column="PRODU_ID",
+    )
+    fecha_vigencia = models.DateTimeField(default=timezone.now)
+    bruto = models.PositiveIntegerField()
+    neto = models.PositiveIntegerField()
+    iva = models.PositiveIntegerField()
+    dscto = models.PositiveIntegerField(blank=True, null=True)
+    origen = models.CharField(max_length=20)
+
+    class Meta:
+        db_table = "HISTORIAL_PRECIO"
+        ordering = ["-fecha_vigencia", "-id"]
+        indexes = [
+            # Consulta "precio a la fecha": último registro <= fecha por producto
+            models.Index(fields=["producto", "fecha_vigencia"], name="historial_produ_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} desde {self.fecha_vigencia:%Y-%m-%d %H:%M}: ${self.bruto}"
+
+
 #========================================
 # MODELO DE ARCHIVOS EXCEL POR PRODUCTO
 #========================================    
 class ProductoExcel(models.Model):
+    # Estado del procesamiento en segundo plano (ver adjuntos.py)
+    ESTADO_PENDIENTE = "PENDIENTE"
+    ESTADO_PROCESADO = "PROCESADO"
+    ESTADO_ERROR = "ERROR"
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, "Pendiente"),
+        (ESTADO_PROCESADO, "Procesado"),
+        (ESTADO_ERROR, "Error"),
+    ]
+
     producto = models.ForeignKey(
         ProductoServicio,
         related_name="archivos_excel",
@@ -132,14 +184,60 @@ class ProductoExcel(models.Model):
     valor_bruto = models.PositiveIntegerField(default=0)
     descuento = models.PositiveIntegerField(default=0)
     creado_en = models.DateTimeField(default=timezone.now)
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_CHOICES,
+        default=ESTADO_PROCESADO,
+    )
+    error = models.CharField(max_length=255, blank=True, default="")
+    # SHA-256 del contenido: el mismo archivo no se guarda ni se procesa dos veces
+    hash_contenido = models.CharField(max_length=64, blank=True, null=True, db_index=True)
 
     class Meta:
         db_table = "PRODUCTO_EXCEL"
         ordering = ["-creado_en"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["producto", "hash_contenido"],
+                name="producto_excel_hash_unico",
+            ),
+        ]
 
     @property
     def nombre_archivo(self):
         return os.path.basename(self.archivo.name)
 
     def _str_(self):
-        return f"Excel {self.nombre_archivo} para {self.producto.produ_nom}"
\ No newline at end of file
+        return f"Excel {self.nombre_archivo} para {self.producto.produ_nom}"
+
+
+# =========================
+#  VERSIÓN DE PRODUCTOS (cachés)
+# =========================
+@receiver(post_save, sender=ProductoServicio)
+@receiver(post_delete, sender=ProductoServicio)
+def invalidar_version_productos(sender, **kwargs):
+    """Cualquier cambio en productos invalida los totales cacheados de lista_productos."""
+    invalidar_version("productos")
+
+
+# =========================
+#  ARCHIVOS DE ProductoExcel
+# =========================
+@receiver(post_delete, sender=ProductoExcel)
+def borrar_archivo_adjunto(sender, instance: ProductoExcel, **kwargs):
+    """
+    Al eliminar un adjunto (o su producto, en cascada) se borra el archivo
+    del almacenamiento cuando la transacción confirma, salvo que otro
+    adjunto lo siga usando (el mismo archivo puede reutilizarse por hash).
+    """
+    nombre = instance.archivo.name
+    if not nombre:
+        return
+    storage = instance.archivo.storage
+
+    def borrar():
+        if not ProductoExcel.objects.filter(archivo=nombre).exists():
+            storage.delete(nombre)
+
+    transaction.on_commit(borrar)
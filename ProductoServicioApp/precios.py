@@ -0,0 +1,96 @@
+# ProductoServicioApp/precios.py
+"""
+Cálculo de neto/IVA/bruto de un producto a partir del bruto y el descuento.
+Lo usan el formulario, las cargas desde Excel y las actualizaciones masivas,
+así todas redondean igual. Cada una registra además el precio nuevo en el
+historial (HistorialPrecio) para poder consultar el precio a una fecha.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import OuterRef, Subquery
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import HistorialPrecio
+
+IVA_FACTOR = Decimal("1.19")   # 19% IVA
+ROUND = lambda x: x.quantize(Decimal("1"), rounding=ROUND_HALF_UP)  # redondeo a entero
+
+# Se envía con produ_ids=[...] cada vez que registrar_historial guarda precios
+# nuevos; las tablas derivadas de otras apps (ej. gasto por proveedor) lo escuchan.
+precios_cambiados = Signal()
+
+
+def recalcula_campos(precio_bruto: Decimal, dscto_pct: Decimal | int | None):
+    dscto_pct = Decimal(dscto_pct or 0)
+    bruto_final = (precio_bruto * (Decimal("1") - dscto_pct / Decimal("100")))
+    if bruto_final < 0:
+        bruto_final = Decimal("0")
+
+    neto = (bruto_final / IVA_FACTOR)
+    iva = bruto_final - neto
+
+    # Redondeo a entero CLP (Decimal entero)
+    neto_r = ROUND(neto)
+    iva_r = ROUND(iva)
+    bruto_r = ROUND(bruto_final)
+
+    # Retornamos ints para asignar directo a PositiveIntegerField
+    return int(neto_r), int(iva_r), int(bruto_r)
+
+
+# ==============================
+#   HISTORIAL DE PRECIOS
+# ==============================
+def registrar_historial(productos, origen, fecha=None):
+    """
+    Agrega al historial el precio actual de `productos` (instancias ya
+    guardadas) con un solo INSERT por bloque y avisa con precios_cambiados.
+    """
+    fecha = fecha or timezone.now()
+    productos = list(productos)
+    HistorialPrecio.objects.bulk_create(
+        [
+            HistorialPrecio(
+                producto_id=p.pk,
+                fecha_vigencia=fecha,
+                bruto=p.produ_bruto,
+                neto=p.produ_neto,
+                iva=p.produ_iva,
+                dscto=p.produ_dscto,
+                origen=origen,
+            )
+            for p in productos
+        ],
+        batch_size=1000,
+    )
+    precios_cambiados.send(sender=HistorialPrecio, produ_ids=[p.pk for p in productos])
+
+
+def _limite_fecha(fecha):
+    """Fecha (date) -> inicio del día siguiente; un datetime se usa tal cual (inclusive)."""
+    if isinstance(fecha, datetime):
+        return fecha, "fecha_vigencia__lte"
+    siguiente = datetime.combine(fecha + timedelta(days=1), time.min)
+    return timezone.make_aware(siguiente), "fecha_vigencia__lt"
+
+
+def precios_a_fecha(producto_ids, fecha):
+    """
+    {produ_id: HistorialPrecio} con el precio vigente a `fecha` (date o datetime).
+    Un registro por producto usando el índice (producto, fecha_vigencia).
+    Los productos sin historial a esa fecha no aparecen.
+    """
+    limite, lookup = _limite_fecha(fecha)
+    ultimo = (
+        HistorialPrecio.objects
+        .filter(producto=OuterRef("producto"), **{lookup: limite})
+        .order_by("-fecha_vigencia", "-id")
+        .values("id")[:1]
+    )
+    registros = HistorialPrecio.objects.filter(
+        producto_id__in=list(producto_ids),
+        id=Subquery(ultimo),
+    )
+    return {r.producto_id: r for r in registros}
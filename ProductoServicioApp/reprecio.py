@@ -0,0 +1,158 @@
+# ProductoServicioApp/reprecio.py
+"""
+Actualización masiva de precios (reprecio) sobre un conjunto de productos.
+
+Modos:
+- "porcentaje": sube/baja el precio actual en X % (el descuento guardado
+  no cambia, ya está incluido en produ_bruto).
+- "descuento": reemplaza el descuento guardado, igual que editar el
+  producto con otro % de descuento: parte del precio de lista (produ_bruto
+  sin el descuento actual), así repetirlo no acumula descuentos. Un
+  producto con 100% de descuento no tiene precio de lista y queda igual.
+
+Los valores se calculan con recalcula_campos (mismo redondeo que el
+formulario) y se escriben con bulk_update: un UPDATE por bloque.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from EmpresaPersonaApp.versiones import invalidar_version
+from .models import ProductoServicio
+from .precios import recalcula_campos, registrar_historial
+
+MODOS = ("porcentaje", "descuento")
+CAMPOS_PRECIO = ["produ_bruto", "produ_neto", "produ_iva", "produ_dscto"]
+
+BLOQUE = 1000
+MUESTRA_PREVIA = 50  # filas de ejemplo en la previsualización
+
+
+def validar_parametros(modo, valor) -> Decimal:
+    """Devuelve el valor como Decimal o lanza ValueError con el motivo."""
+    if modo not in MODOS:
+        raise ValueError("Modo no válido: usa porcentaje o descuento.")
+    try:
+        valor = Decimal(str(valor).replace(",", "."))
+    except (InvalidOperation, ValueError):
+        raise ValueError("El valor debe ser numérico.")
+    if not valor.is_finite():  # NaN / Infinity
+        raise ValueError("El valor debe ser numérico.")
+
+    if modo == "porcentaje" and valor <= -100:
+        raise ValueError("El porcentaje debe ser mayor a -100%.")
+    if modo == "descuento" and not (0 <= valor <= 100):
+        raise ValueError("El descuento debe estar entre 0 y 100%.")
+    return valor
+
+
+def productos_filtrados(proveedor_id=None, prefijo_sku=None, ids=None):
+    """Productos a repreciar: por proveedor (Abastecimiento), prefijo de SKU y/o selección."""
+    if not (proveedor_id or prefijo_sku or ids):
+        raise ValueError("Indica un proveedor, un prefijo de SKU o una selección de productos.")
+
+    productos = ProductoServicio.objects.all()
+    if proveedor_id:
+        productos = productos.filter(abastecimientos__emppe_id=proveedor_id)
+    if prefijo_sku:
+        productos = productos.filter(produ_sku__startswith=prefijo_sku)
+    if ids:
+        productos = productos.filter(pk__in=ids)
+    return productos
+
+
+def precio_lista(producto) -> Decimal | None:
+    """Bruto antes del descuento guardado; None si el descuento es 100%."""
+    dscto = Decimal(producto.produ_dscto or 0)
+    if dscto >= 100:
+        return None
+    return Decimal(producto.produ_bruto or 0) / (Decimal("1") - dscto / Decimal("100"))
+
+
+def nuevo_precio(producto, modo, valor) -> tuple[int, int, int, int]:
+    """(neto, iva, bruto, dscto) que quedarían en el producto."""
+    if modo == "porcentaje":
+        bruto_actual = Decimal(producto.produ_bruto or 0)
+        neto, iva, bruto = recalcula_campos(bruto_actual * (Decimal("1") + valor / Decimal("100")), 0)
+        return neto, iva, bruto, producto.produ_dscto
+
+    lista = precio_lista(producto)
+    if lista is None:
+        return producto.produ_neto, producto.produ_iva, producto.produ_bruto, producto.produ_dscto
+    neto, iva, bruto = recalcula_campos(lista, valor)
+    return neto, iva, bruto, int(valor)
+
+
+def _recorrer(productos, modo, valor):
+    """Genera (producto, nuevos valores) leyendo solo las columnas de precio."""
+    filas = (
+        productos
+        .only("produ_id", "produ_sku", "produ_nom", *CAMPOS_PRECIO)
+        .order_by("produ_id")
+        .iterator(chunk_size=BLOQUE)
+    )
+    for producto in filas:
+        yield producto, nuevo_precio(producto, modo, valor)
+
+
+def previsualizar(productos, modo, valor):
+    """Cantidad de productos afectados, totales antes/después y filas de ejemplo."""
+    resumen = {
+        "afectados": 0,
+        "cambian": 0,
+        "total_bruto_antes": 0,
+        "total_bruto_despues": 0,
+        "total_neto_antes": 0,
+        "total_neto_despues": 0,
+        "filas": [],
+    }
+    for producto, (neto, iva, bruto, dscto) in _recorrer(productos, modo, valor):
+        resumen["afectados"] += 1
+        resumen["total_bruto_antes"] += producto.produ_bruto
+        resumen["total_bruto_despues"] += bruto
+        resumen["total_neto_antes"] += producto.produ_neto
+        resumen["total_neto_despues"] += neto
+        if (bruto, neto, iva, dscto) == tuple(getattr(producto, c) for c in CAMPOS_PRECIO):
+            continue
+        resumen["cambian"] += 1
+        if len(resumen["filas"]) < MUESTRA_PREVIA:
+            resumen["filas"].append({
+                "id": producto.pk,
+                "sku": producto.produ_sku,
+                "nombre": producto.produ_nom,
+                "bruto_antes": producto.produ_bruto,
+                "bruto_despues": bruto,
+                "dscto_antes": producto.produ_dscto,
+                "dscto_despues": dscto,
+            })
+    return resumen
+
+
+def aplicar(productos, modo, valor) -> int:
+    """Escribe los nuevos precios por bloques. Devuelve cuántos productos cambiaron."""
+    actualizados = 0
+    bloque = []
+
+    def guardar(bloque):
+        with transaction.atomic():
+            ProductoServicio.objects.bulk_update(bloque, CAMPOS_PRECIO, batch_size=BLOQUE)
+            registrar_historial(bloque, "reprecio")
+
+    for producto, (neto, iva, bruto, dscto) in _recorrer(productos, modo, valor):
+        if (bruto, neto, iva, dscto) == tuple(getattr(producto, c) for c in CAMPOS_PRECIO):
+            continue
+        producto.produ_bruto, producto.produ_neto, producto.produ_iva, producto.produ_dscto = bruto, neto, iva, dscto
+        bloque.append(producto)
+        if len(bloque) == BLOQUE:
+            guardar(bloque)
+            actualizados += len(bloque)
+            bloque = []
+
+    if bloque:
+        guardar(bloque)
+        actualizados += len(bloque)
+
+    if actualizados:
+        # bulk_update no dispara signals
+        invalidar_version("productos")
+    return actualizados
@@ -0,0 +1,160 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from openpyxl import Workbook
+
+from EmpresaPersona.pruebas import SesionAdminMixin
+from EmpresaPersonaApp.models import EmpresaPersona
+from . import adjuntos, reprecio
+from .importacion import COLUMNAS, importar_productos
+from .models import Abastecimiento, HistorialPrecio, ProductoExcel, ProductoServicio
+
+
+def archivo_xlsx(filas, encabezados=COLUMNAS):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append(fila)
+    archivo = io.BytesIO()
+    wb.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+class ImportarProductosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = EmpresaPersona.objects.create(
+            emppe_rut="11111111-1", emppe_nom="Proveedor", emppe_fono1="+56912345678",
+            emppe_mail1="a@b.cl", emppe_sit="proveedor",
+        )
+
+    def test_crear_con_sku_historial_y_proveedor(self):
+        resumen = importar_productos(archivo_xlsx([
+            ["Tornillo", "Caja 100", 11900, 0, self.proveedor.pk, "SKU-1"],
+            ["Tuerca", "Caja 50", 5950, 10, None, "SKU-2"],
+        ]))
+        self.assertEqual((resumen["creados"], resumen["errores"]), (2, []))
+
+        tornillo = ProductoServicio.objects.get(produ_sku="SKU-1")
+        self.assertEqual((tornillo.produ_neto, tornillo.produ_iva, tornillo.produ_bruto), (10000, 1900, 11900))
+        self.assertTrue(Abastecimiento.objects.filter(emppe=self.proveedor, produ=tornillo).exists())
+        # Los ids del bulk_create se leen por SKU: el historial apunta a cada producto
+        self.assertEqual(
+            set(HistorialPrecio.objects.filter(origen="importacion").values_list("producto__produ_sku", flat=True)),
+            {"SKU-1", "SKU-2"},
+        )
+
+    def test_errores_por_fila(self):
+        ProductoServicio.objects.create(produ_sku="SKU-1", produ_nom="Existente", produ_bruto=100)
+        resumen = importar_productos(archivo_xlsx([
+            ["Nuevo", "Desc", 100, 0, None, "SKU-1"],
+            ["Otro", "Desc", 100, 0, None, "SKU-9"],
+            ["Otro bis", "Desc", 100, 0, None, "SKU-9"],
+            ["Sin SKU", "Desc", 100, 0, None, None],
+            ["Caro", "Desc", 100, 150, None, "SKU-8"],
+        ]))
+        self.assertEqual(resumen["creados"], 1)
+        self.assertEqual(
+            [e.split(":")[0] for e in resumen["errores"]],
+            ["Fila 4", "Fila 5", "Fila 6", "Fila 2"],
+        )
+
+    def test_actualizar_y_dry_run(self):
+        ProductoServicio.objects.create(
+            produ_sku="SKU-1", produ_nom="Tornillo", produ_desc="Caja 100", produ_bruto=11900,
+            produ_neto=10000, produ_iva=1900, produ_dscto=0,
+        )
+        filas = [
+            ["Tornillo", "Caja 100", 23800, 0, None, "SKU-1"],
+            ["Tuerca", "Caja 50", 5950, 0, None, "SKU-2"],
+        ]
+        simulado = importar_productos(archivo_xlsx(filas), modo="actualizar", dry_run=True)
+        self.assertEqual((simulado["creados"], simulado["actualizados"]), (1, 1))
+        self.assertEqual(ProductoServicio.objects.get(produ_sku="SKU-1").produ_bruto, 11900)
+
+        resumen = importar_productos(archivo_xlsx(filas), modo="actualizar")
+        self.assertEqual((resumen["creados"], resumen["actualizados"]), (1, 1))
+        self.assertEqual(ProductoServicio.objects.get(produ_sku="SKU-1").produ_bruto, 23800)
+        self.assertIn({"sku": "SKU-1", "campo": "produ_bruto", "antes": 11900, "despues": 23800}, resumen["cambios"])
+
+    def test_plantilla_incorrecta(self):
+        with self.assertRaises(ValueError):
+            importar_productos(archivo_xlsx([], encabezados=["OTRA", "COSA"]))
+
+
+@override_settings(ADJUNTOS_EN_SEGUNDO_PLANO=False, MEDIA_ROOT=os.path.join(tempfile.gettempdir(), "adjuntos-tests"))
+class SubirExcelProductoTests(SesionAdminMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = ProductoServicio.objects.create(produ_sku="SKU-1", produ_nom="Tornillo", produ_bruto=100)
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("productoyservicioapp:subir_excel_producto", args=[self.producto.pk])
+
+    def subir(self, contenido):
+        archivo = SimpleUploadedFile("precios.xlsx", contenido)
+        return self.client.post(self.url, {"archivos_excel": archivo}, follow=True)
+
+    def test_sin_hilos_se_procesa_al_confirmar(self):
+        contenido = archivo_xlsx([["Tornillo", "Caja", 23800, 0]]).getvalue()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subir(contenido)
+        adjunto = ProductoExcel.objects.get()
+        self.assertEqual((adjunto.estado, adjunto.valor_bruto), (ProductoExcel.ESTADO_PROCESADO, 23800))
+
+    def test_subida_simultanea_reutiliza_la_fila(self):
+        contenido = archivo_xlsx([["Tornillo", "Caja", 23800, 0]]).getvalue()
+        # La otra petición guardó el mismo archivo entre el chequeo y el INSERT
+        with mock.patch.object(ProductoExcel, "save", side_effect=IntegrityError("producto_excel_hash_unico")):
+            respuesta = self.subir(contenido)
+        self.assertEqual(respuesta.status_code, 200)
+        mensajes = [str(m) for m in respuesta.context["messages"]]
+        self.assertEqual(mensajes, ["precios.xlsx: el mismo archivo ya estaba cargado para este producto."])
+
+    def test_procesar_pendientes_no_repite_uno_ya_reclamado(self):
+        adjunto = ProductoExcel.objects.create(
+            producto=self.producto, archivo="productos_excel/precios.xlsx", hash_contenido="h1",
+            estado=ProductoExcel.ESTADO_PENDIENTE,
+        )
+
+        def leer_mientras_el_hilo_termina(archivo):
+            # El hilo de trabajo lo aplica mientras el comando aún lee el archivo
+            adjuntos.aplicar_valores(ProductoExcel.objects.get(pk=adjunto.pk), 8403, 1597, 10000, 0)
+            return 16807, 3193, 20000, 0
+
+        with mock.patch.object(ProductoExcel.archivo.field.storage, "open", mock.mock_open()), \
+                mock.patch.object(adjuntos, "leer_precio_excel", side_effect=leer_mientras_el_hilo_termina):
+            self.assertEqual(adjuntos.procesar_pendientes(), 0)
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.produ_bruto, 10000)
+        self.assertEqual(HistorialPrecio.objects.filter(origen="excel_producto").count(), 1)
+
+
+class ReprecioTests(TestCase):
+    def test_valores_no_finitos(self):
+        for valor in ("NaN", "sNaN", "Infinity", "-Infinity"):
+            with self.subTest(valor=valor), self.assertRaises(ValueError):
+                reprecio.validar_parametros("porcentaje", valor)
+
+    def test_descuento_parte_del_precio_de_lista(self):
+        producto = ProductoServicio.objects.create(
+            produ_sku="R-1", produ_nom="Tornillo", produ_bruto=9000, produ_neto=7563, produ_iva=1437, produ_dscto=10,
+        )
+        productos = ProductoServicio.objects.filter(pk=producto.pk)
+        reprecio.aplicar(productos, "descuento", Decimal("20"))
+        producto.refresh_from_db()
+        self.assertEqual((producto.produ_bruto, producto.produ_dscto), (8000, 20))
+
+        # Repetirlo no acumula el descuento
+        self.assertEqual(reprecio.aplicar(productos, "descuento", Decimal("20")), 0)
@@ -17,11 +17,21 @@ urlpatterns = [
         views.cargar_productos_excel,
         name='cargar_productos_excel',
     ),
+    path(
+        'reprecio/',
+        views.reprecio_productos,
+        name='reprecio_productos',
+    ),
     path(
         'subir-excel-producto/<int:pk>/',
         views.subir_excel_producto,
         name='subir_excel_producto',
     ),
+    path(
+        'productos/<int:pk>/adjuntos/',
+        views.api_adjuntos_producto,
+        name='api_adjuntos_producto',
+    ),
     path(
         'productos/<int:pk>/eliminar_archivos/',
         views.eliminar_archivos_producto,
@@ -1,42 +1,27 @@
 # ProductoServicioApp/views.py
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from pathlib import Path
 from django.contrib import messages
 
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db import transaction
-from django.db.models import Sum, Prefetch
-from openpyxl import Workbook, load_workbook
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q, Sum, prefetch_related_objects
+from openpyxl import Workbook
 
 from .models import ProductoExcel, ProductoServicio, Abastecimiento
 from .forms import ProductoServicioForm
+from .precios import recalcula_campos, registrar_historial
+from . import adjuntos, importacion, reprecio
 
 # 👇 Importamos el modelo de la otra app para prefetchear proveedores con su dirección
 from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.versiones import obtener_version
 
-IVA_FACTOR = Decimal("1.19")   # 19% IVA
-ROUND = lambda x: x.quantize(Decimal("1"), rounding=ROUND_HALF_UP)  # redondeo a entero
-
-#==================================
-# VISTAS DE PRODUCTOS Y SERVICIOS
-#==================================
-def _recalcula_campos(precio_bruto: Decimal, dscto_pct: Decimal | int | None):
-    dscto_pct = Decimal(dscto_pct or 0)
-    bruto_final = (precio_bruto * (Decimal("1") - dscto_pct / Decimal("100")))
-    if bruto_final < 0:
-        bruto_final = Decimal("0")
-
-    neto = (bruto_final / IVA_FACTOR)
-    iva = bruto_final - neto
-
-    # Redondeo a entero CLP (Decimal entero)
-    neto_r = ROUND(neto)
-    iva_r = ROUND(iva)
-    bruto_r = ROUND(bruto_final)
-
-    # Retornamos ints para asignar directo a PositiveIntegerField
-    return int(neto_r), int(iva_r), int(bruto_r)
+PRODUCTOS_POR_PAGINA = 50
+TOTALES_CACHE_SEGUNDOS = 60 * 60  # la versión cambia con cada escritura; esto es solo un tope
 
 #==================================
 # VISTAS DE PRODUCTOS Y SERVICIOS
@@ -51,13 +36,14 @@ def lista_productos(request):
 
             bruto_in = Decimal(form.cleaned_data.get('produ_bruto') or 0)
             dscto_in = form.cleaned_data.get('produ_dscto') or 0
-            neto, iva, bruto_final = _recalcula_campos(bruto_in, dscto_in)
+            neto, iva, bruto_final = recalcula_campos(bruto_in, dscto_in)
 
             # Asignar ints a campos Integer del modelo
             producto.produ_neto = neto
             producto.produ_iva = iva
             producto.produ_bruto = bruto_final
             producto.save()
+            registrar_historial([producto], "formulario")
 
             # Relación con empresa (Abastecimiento)
             empresa = form.cleaned_data['empresa']
@@ -76,60 +62,77 @@ def lista_productos(request):
             'emppe_dire__ciuda',          
             'emppe_dire__comun',          
         )
+        .order_by('pk')
     )
 
+    q = request.GET.get('q', '').strip()
+    productos = ProductoServicio.objects.order_by('produ_nom', 'produ_id')
+    if q:
+        productos = productos.filter(Q(produ_sku__istartswith=q) | Q(produ_nom__icontains=q))
 
-    productos = (
-        ProductoServicio.objects
-        .prefetch_related(
-            Prefetch('proveedores', queryset=proveedores_qs)
-        )
-        .all()
-    )
+    page_obj = Paginator(productos, PRODUCTOS_POR_PAGINA).get_page(request.GET.get('page'))
+    page_obj.object_list = list(page_obj.object_list)
 
-    # ======= TOTALES =======
-    totales = productos.aggregate(
-        total_neto=Sum('produ_neto'),
-        total_iva=Sum('produ_iva'),
-        total_bruto=Sum('produ_bruto'),
+    # Prefetch solo para los productos de la página
+    prefetch_related_objects(
+        page_obj.object_list,
+        Prefetch('proveedores', queryset=proveedores_qs),
     )
-
-    # 👇👇 AQUÍ armamos el diccionario para el JS
-    adjuntos_map: dict[str, list[dict]] = {}
-
-    for producto in productos:
-        adjuntos = []
-        for adj in producto.archivos_excel.all():
-            extension = Path(adj.archivo.name).suffix.replace(".", "").upper()
-            adjuntos.append(
-                {
-                    "id": adj.pk,
-                    "sku": adj.producto.produ_sku,
-                    "nombre": adj.nombre_archivo,
-                    "url": adj.archivo.url if adj.archivo else "",
-                    "neto": adj.valor_neto,
-                    "iva": adj.valor_iva,
-                    "bruto": adj.valor_bruto,
-                    "descuento": adj.descuento,
-                    "tipo": extension or "ARCHIVO",
-                }
-            )
-
-        producto.archivos_detalle = adjuntos
-        producto.archivos_count = len(adjuntos)
-
-        adjuntos_map[producto.pk] = adjuntos
+    for producto in page_obj.object_list:
+        # .first() sobre el manager haría otra consulta por fila
+        producto.proveedor = next(iter(producto.proveedores.all()), None)
+
+    # ======= TOTALES (cacheados hasta el próximo cambio de productos) =======
+    clave_totales = f"productos-totales-{obtener_version('productos')}"
+    totales = cache.get(clave_totales)
+    if totales is None:
+        totales = ProductoServicio.objects.aggregate(
+            total_neto=Sum('produ_neto'),
+            total_iva=Sum('produ_iva'),
+            total_bruto=Sum('produ_bruto'),
+        )
+        cache.set(clave_totales, totales, TOTALES_CACHE_SEGUNDOS)
 
     context = {
-        'productos': productos,
+        'productos': page_obj.object_list,
+        'page_obj': page_obj,
+        'q': q,
         'form': form,
         'total_neto':  totales.get('total_neto')  or 0,
         'total_iva':   totales.get('total_iva')   or 0,
         'total_bruto': totales.get('total_bruto') or 0,
-        'adjuntos_map': adjuntos_map,
     }
     return render(request, 'producto_servicio/producto_servicio.html', context)
 
+
+#==================================
+# ADJUNTOS DE UN PRODUCTO (JSON)
+#==================================
+def api_adjuntos_producto(request, pk):
+    """Archivos del producto, pedidos al abrir el modal (no se cargan con la lista)."""
+    producto = get_object_or_404(ProductoServicio.objects.only('produ_id', 'produ_sku'), pk=pk)
+
+    adjuntos = []
+    for adj in producto.archivos_excel.all():
+        extension = Path(adj.archivo.name).suffix.replace(".", "").upper()
+        adjuntos.append(
+            {
+                "id": adj.pk,
+                "sku": producto.produ_sku,
+                "nombre": adj.nombre_archivo,
+                "url": adj.archivo.url if adj.archivo else "",
+                "neto": adj.valor_neto,
+                "iva": adj.valor_iva,
+                "bruto": adj.valor_bruto,
+                "descuento": adj.descuento,
+                "tipo": extension or "ARCHIVO",
+                "estado": adj.estado,
+                "error": adj.error,
+            }
+        )
+
+    return JsonResponse({"producto": producto.pk, "adjuntos": adjuntos})
+
 #==================================
 # EDICIÓN DE PRODUCTOS Y SERVICIOS
 #==================================
@@ -138,6 +141,7 @@ def editar_producto(request, pk):
     producto = get_object_or_404(ProductoServicio, pk=pk)
     abastecimiento = Abastecimiento.objects.filter(produ=producto).first()
     empresa_actual = abastecimiento.emppe if abastecimiento else None
+    precio_anterior = (producto.produ_bruto, producto.produ_neto, producto.produ_iva, producto.produ_dscto)
 
     if request.method == 'POST':
         form = ProductoServicioForm(request.POST, instance=producto)
@@ -146,12 +150,14 @@ def editar_producto(request, pk):
 
             bruto_in = Decimal(form.cleaned_data.get('produ_bruto') or 0)
             dscto_in = form.cleaned_data.get('produ_dscto') or 0
-            neto, iva, bruto_final = _recalcula_campos(bruto_in, dscto_in)
+            neto, iva, bruto_final = recalcula_campos(bruto_in, dscto_in)
 
             producto.produ_neto = neto
             producto.produ_iva = iva
             producto.produ_bruto = bruto_final
             producto.save()
+            if (producto.produ_bruto, producto.produ_neto, producto.produ_iva, producto.produ_dscto) != precio_anterior:
+                registrar_historial([producto], "formulario")
 
             # Empresa/proveedor
             nueva_empresa = form.cleaned_data['empresa']
@@ -178,16 +184,8 @@ def descargar_plantilla_productos(request):
     ws.title = "Productos o Servicios"
 
     # Encabezados de la tabla 
-    headers = [
-        "PRODU_NOM",
-        "PRODU_DESC",
-        "PRODU_BRUTO",
-        "PRODU_DSCTO",
-        "EMPPE_ID (proveedor)",
-    ]
-
     # Agregar encabezados en la primera fila
-    ws.append(headers)
+    ws.append(importacion.COLUMNAS)
 
     # Fila de ejemplo para guiar el llenado
     ws.append([
@@ -196,6 +194,7 @@ def descargar_plantilla_productos(request):
         10000,
         0,
         None,  # Dejar en blanco u optar por un ID numérico de proveedor existente
+        "SKU-0001",  # Clave del producto: si ya existe, el modo "actualizar" lo refresca
     ])
 
     # Preparar respuesta HTTP para descarga
@@ -212,8 +211,11 @@ def descargar_plantilla_productos(request):
 #==================================
 # CARGA MASIVA DESDE EXCEL
 #==================================
-@transaction.atomic
+MAX_AVISOS_IMPORTACION = 20  # el resto se resume en un solo mensaje
+
+
 def cargar_productos_excel(request):
+    # Sin @transaction.atomic: importacion guarda por bloques, cada uno en su transacción
     if request.method != "POST":
         messages.error(request, "Debes seleccionar un archivo Excel para importar.")
         return redirect("productoyservicioapp:lista_productos")
@@ -223,146 +225,54 @@ def cargar_productos_excel(request):
         messages.error(request, "Selecciona un archivo .xlsx con la plantilla de productos.")
         return redirect("productoyservicioapp:lista_productos")
 
+    modo = request.POST.get("modo", "crear")
+    dry_run = request.POST.get("dry_run") in ("1", "on", "true")
+
     try:
-        workbook = load_workbook(archivo)
-    except Exception:
-        messages.error(request, "No se pudo leer el archivo. Verifica que sea un .xlsx válido.")
+        resumen = importacion.importar_productos(archivo, modo=modo, dry_run=dry_run)
+    except ValueError as exc:
+        messages.error(request, str(exc))
         return redirect("productoyservicioapp:lista_productos")
 
-    sheet = workbook.active
-    expected_headers = ["PRODU_NOM", "PRODU_DESC", "PRODU_BRUTO", "PRODU_DSCTO", "EMPPE_ID (proveedor)"]
-    headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
-
-    if headers[: len(expected_headers)] != expected_headers:
-        messages.error(
+    errores = resumen["errores"]
+    if dry_run:
+        messages.info(
             request,
-            "La plantilla no coincide con el formato esperado. Descarga nuevamente la plantilla y vuelve a intentarlo.",
+            f"Simulación: {resumen['creados']} producto(s) nuevo(s), {resumen['actualizados']} "
+            f"por actualizar y {resumen['sin_cambios']} sin cambios. No se guardó nada.",
         )
-        return redirect("productoyservicioapp:lista_productos")
-
-    creados = 0
-    errores: list[str] = []
-
-    for row_number, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-        nombre, descripcion, bruto, dscto, proveedor_id = row[:5]
-
-        if not any(row):
-            continue  # fila completamente vacía
-
-        if not nombre or not descripcion or bruto is None:
-            errores.append(f"Fila {row_number}: nombre, descripción y valor bruto son obligatorios.")
-            continue
-
-        try:
-            bruto_decimal = Decimal(bruto)
-        except Exception:
-            errores.append(f"Fila {row_number}: el valor bruto debe ser numérico.")
-            continue
-
-        dscto_value = dscto or 0
-        try:
-            dscto_decimal = Decimal(dscto_value)
-        except Exception:
-            errores.append(f"Fila {row_number}: el descuento debe ser un número entre 0 y 100.")
-            continue
-
-        if dscto_decimal < 0 or dscto_decimal > 100:
-            errores.append(f"Fila {row_number}: el descuento debe estar entre 0 y 100%.")
-            continue
-
-        neto, iva, bruto_final = _recalcula_campos(bruto_decimal, dscto_decimal)
-
-        producto = ProductoServicio(
-            produ_nom=str(nombre).strip(),
-            produ_desc=str(descripcion).strip(),
-            produ_bruto=bruto_final,
-            produ_neto=neto,
-            produ_iva=iva,
-            produ_dscto=int(dscto_decimal),
+        for cambio in resumen["cambios"][:MAX_AVISOS_IMPORTACION]:
+            messages.info(
+                request,
+                f"SKU {cambio['sku']}: {cambio['campo']} {cambio['antes']} → {cambio['despues']}",
+            )
+    elif resumen["creados"] or resumen["actualizados"]:
+        messages.success(
+            request,
+            f"Se importaron {resumen['creados']} productos/servicios nuevos y se actualizaron "
+            f"{resumen['actualizados']} desde el Excel.",
         )
-        producto.save()
-        creados += 1
-
-        if proveedor_id:
-            try:
-                proveedor_id_int = int(proveedor_id)
-            except (TypeError, ValueError):
-                errores.append(
-                    f"Fila {row_number}: el ID de proveedor debe ser numérico; el producto se creó sin proveedor."
-                )
-                continue
-
-            proveedor = EmpresaPersona.objects.filter(pk=proveedor_id_int).first()
-            if proveedor:
-                Abastecimiento.objects.get_or_create(emppe=proveedor, produ=producto)
-            else:
-                errores.append(
-                    f"Fila {row_number}: no existe proveedor con ID {proveedor_id_int}; el producto se creó sin proveedor."
-                )
-
-    if creados:
-        messages.success(request, f"Se importaron {creados} productos/servicios desde el Excel.")
-
-    if errores:
-        for err in errores:
-            messages.warning(request, err)
-
-    return redirect("productoyservicioapp:lista_productos")
-
-#======================================
-# CARGA DE ARCHIVOS EXCEL POR PRODUCTO
-#======================================
-def _procesar_excel_producto(archivo) -> tuple[int, int, int, int]:
-    try:
-        workbook = load_workbook(archivo)
-    except Exception:
-        raise ValueError("No se pudo leer el archivo. Verifica que sea un .xlsx válido.")
-
-    sheet = workbook.active
-    expected_headers = ["PRODU_NOM", "PRODU_DESC", "PRODU_BRUTO", "PRODU_DSCTO", "EMPPE_ID (proveedor)"]
-    headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
 
-    if headers[: len(expected_headers)] != expected_headers:
-        raise ValueError(
-            "La plantilla no coincide con el formato esperado. Descarga nuevamente la plantilla y vuelve a intentarlo."
+    for err in errores[:MAX_AVISOS_IMPORTACION]:
+        messages.warning(request, err)
+    if len(errores) > MAX_AVISOS_IMPORTACION:
+        messages.warning(
+            request,
+            f"... y {len(errores) - MAX_AVISOS_IMPORTACION} aviso(s) más. "
+            "Para listas muy grandes usa: python manage.py importar_productos <archivo>.",
         )
 
-    primera_fila = None
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        if any(row):
-            primera_fila = row
-            break
-
-    if not primera_fila:
-        raise ValueError("El archivo no contiene filas de datos.")
-
-    _, _, bruto, dscto, _ = primera_fila[:5]
-
-    if bruto is None:
-        raise ValueError("La fila de datos debe incluir un valor bruto.")
-
-    try:
-        bruto_decimal = Decimal(bruto)
-    except Exception:
-        raise ValueError("El valor bruto debe ser numérico.")
-
-    dscto_value = dscto or 0
-    try:
-        dscto_decimal = Decimal(dscto_value)
-    except Exception:
-        raise ValueError("El descuento debe ser un número entre 0 y 100.")
-
-    if dscto_decimal < 0 or dscto_decimal > 100:
-        raise ValueError("El descuento debe estar entre 0 y 100%.")
-
-    neto, iva, bruto_final = _recalcula_campos(bruto_decimal, dscto_decimal)
-    return neto, iva, bruto_final, int(dscto_decimal)
+    return redirect("productoyservicioapp:lista_productos")
 
 #======================================
 # CARGA DE ARCHIVOS EXCEL POR PRODUCTO
 #======================================
-@transaction.atomic
 def subir_excel_producto(request, pk):
+    """
+    Guarda los archivos de inmediato; los Excel quedan PENDIENTE y se leen
+    en segundo plano (ver adjuntos.py). Un archivo idéntico (mismo hash) no
+    se vuelve a guardar ni a procesar.
+    """
     producto = get_object_or_404(ProductoServicio, pk=pk)
 
     if request.method != "POST":
@@ -375,62 +285,107 @@ def subir_excel_producto(request, pk):
         return redirect("productoyservicioapp:lista_productos")
 
     procesados = 0
-    errores: list[str] = []
-    actualizados = 0
+    en_proceso = 0
+    duplicados: list[str] = []
 
     for archivo in archivos:
-        extension = Path(archivo.name).suffix.lower()
-        es_excel = extension in {".xlsx", ".xls", ".xlsm"}
-
-        if es_excel:
-            try:
-                archivo.seek(0)
-                neto, iva, bruto_final, dscto = _procesar_excel_producto(archivo)
-                archivo.seek(0)
-            except ValueError as exc:
-                errores.append(f"{archivo.name}: {exc}")
-                continue
+        contenido_hash = adjuntos.hash_archivo(archivo)
+        if ProductoExcel.objects.filter(producto=producto, hash_contenido=contenido_hash).exists():
+            duplicados.append(archivo.name)
+            continue
 
-            producto.produ_neto = neto
-            producto.produ_iva = iva
-            producto.produ_bruto = bruto_final
-            producto.produ_dscto = dscto
-            producto.save(update_fields=["produ_neto", "produ_iva", "produ_bruto", "produ_dscto"])
-            actualizados += 1
-        else:
-            neto = producto.produ_neto
-            iva = producto.produ_iva
-            bruto_final = producto.produ_bruto
-            dscto = producto.produ_dscto or 0
-
-        ProductoExcel.objects.create(
-            producto=producto,
-            archivo=archivo,
-            valor_neto=neto,
-            valor_iva=iva,
-            valor_bruto=bruto_final,
-            descuento=dscto,
+        # Mismo archivo en otro producto ("-estado" deja primero los PROCESADO)
+        previo = (
+            ProductoExcel.objects
+            .filter(hash_contenido=contenido_hash)
+            .order_by("-estado", "pk")
+            .first()
         )
 
+        es_excel = adjuntos.es_excel(archivo.name)
+        adjunto = None
+        try:
+            with transaction.atomic():
+                adjunto = ProductoExcel(
+                    producto=producto,
+                    # Si otro producto ya subió el mismo archivo se reutiliza el guardado
+                    archivo=previo.archivo.name if previo else archivo,
+                    hash_contenido=contenido_hash,
+                    valor_neto=producto.produ_neto,
+                    valor_iva=producto.produ_iva,
+                    valor_bruto=producto.produ_bruto,
+                    descuento=producto.produ_dscto or 0,
+                    estado=ProductoExcel.ESTADO_PENDIENTE if es_excel else ProductoExcel.ESTADO_PROCESADO,
+                )
+                adjunto.save()
+
+                if es_excel and previo and previo.estado == ProductoExcel.ESTADO_PROCESADO:
+                    # Ya se leyó antes: se copian los valores sin volver a abrirlo
+                    adjuntos.aplicar_valores(
+                        adjunto, previo.valor_neto, previo.valor_iva, previo.valor_bruto, previo.descuento
+                    )
+                elif es_excel:
+                    adjuntos.encolar(adjunto.pk)
+                    en_proceso += 1
+        except IntegrityError:
+            # Otra petición subió el mismo archivo al mismo tiempo: se usa esa fila
+            if adjunto is not None and not previo and adjunto.archivo.name:
+                nombre = adjunto.archivo.name
+                if not ProductoExcel.objects.filter(archivo=nombre).exists():
+                    adjunto.archivo.storage.delete(nombre)
+            duplicados.append(archivo.name)
+            continue
+
         procesados += 1
 
     if procesados:
-        detalle_actualizados = (
-            f" y se actualizaron sus datos contables con {actualizados} archivo(s) Excel"
-            if actualizados
+        detalle_en_proceso = (
+            f"; {en_proceso} Excel se están procesando y actualizarán sus datos contables en unos segundos"
+            if en_proceso
             else ""
         )
         messages.success(
             request,
-            f"Se cargaron {procesados} archivo(s) para '{producto.produ_nom}'{detalle_actualizados}.",
+            f"Se cargaron {procesados} archivo(s) para '{producto.produ_nom}'{detalle_en_proceso}.",
         )
 
-    if errores:
-        for err in errores:
-            messages.warning(request, err)
+    for nombre in duplicados:
+        messages.warning(request, f"{nombre}: el mismo archivo ya estaba cargado para este producto.")
 
     return redirect("productoyservicioapp:lista_productos")
 
+#==================================
+# REPRECIO MASIVO
+#==================================
+def reprecio_productos(request):
+    """
+    POST modo=porcentaje|descuento, valor, y filtros proveedor / sku_prefijo / ids.
+    Sin aplicar=1 solo devuelve la previsualización (nada se guarda).
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Método no permitido"}, status=405)
+
+    modo = request.POST.get("modo", "")
+    ids = [int(x) for x in request.POST.get("ids", "").split(",") if x.strip().isdigit()]
+    proveedor = request.POST.get("proveedor", "")
+
+    try:
+        valor = reprecio.validar_parametros(modo, request.POST.get("valor", ""))
+        productos = reprecio.productos_filtrados(
+            proveedor_id=int(proveedor) if proveedor.isdigit() else None,
+            prefijo_sku=request.POST.get("sku_prefijo", "").strip(),
+            ids=ids,
+        )
+    except ValueError as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+
+    if request.POST.get("aplicar") != "1":
+        return JsonResponse({"success": True, "preview": reprecio.previsualizar(productos, modo, valor)})
+
+    actualizados = reprecio.aplicar(productos, modo, valor)
+    messages.success(request, f"Se actualizaron los precios de {actualizados} producto(s)/servicio(s).")
+    return JsonResponse({"success": True, "actualizados": actualizados})
+
 #==============================================
 # ELIMINACIÓN DE ARCHIVOS EXCEL POR PRODUCTO
 #==============================================
@@ -0,0 +1,58 @@
+# ProductoServicioApp/vigencia.py
+"""
+Rango de vigencia de los productos (produ_vigencia_inicio / _fin).
+
+Un producto está vigente en una fecha si no tiene inicio o empieza antes,
+y no tiene fin o termina después. Las consultas usan el índice
+produ_vigencia_idx; los límites vacíos (NULL) no restringen.
+"""
+from django.db.models import Q
+
+from .models import ProductoServicio
+
+
+def q_vigente(fecha) -> Q:
+    """Filtro 'vigente en `fecha`' para ProductoServicio."""
+    return (
+        (Q(produ_vigencia_inicio__isnull=True) | Q(produ_vigencia_inicio__lte=fecha))
+        & (Q(produ_vigencia_fin__isnull=True) | Q(produ_vigencia_fin__gte=fecha))
+    )
+
+
+def productos_vigentes(fecha, productos=None):
+    """Productos vigentes en `fecha` (sobre `productos` o todo el catálogo)."""
+    if productos is None:
+        productos = ProductoServicio.objects.all()
+    return productos.filter(q_vigente(fecha))
+
+
+def errores_vigencia(ids, fecha_emi=None, fecha_recl=None) -> list[tuple[str, str]]:
+    """
+    [(campo, mensaje)] de los productos `ids` fuera de vigencia en la emisión
+    o el reclamo. Una sola consulta que solo trae los productos con problema.
+    """
+    fechas = [f for f in (fecha_emi, fecha_recl) if f]
+    if not ids or not fechas:
+        return []
+
+    fuera = (
+        ProductoServicio.objects
+        .filter(pk__in=ids)
+        .filter(Q(produ_vigencia_inicio__gt=min(fechas)) | Q(produ_vigencia_fin__lt=max(fechas)))
+        .values_list("produ_nom", "produ_vigencia_inicio", "produ_vigencia_fin")
+        .order_by("produ_nom")
+    )
+
+    errores = []
+    for nombre, inicio, fin in fuera:
+        for campo, fecha, etiqueta in (
+            ("docum_fecha_emi", fecha_emi, "La emisión"),
+            ("docum_fecha_recl", fecha_recl, "El reclamo"),
+        ):
+            if not fecha:
+                continue
+            if inicio and fecha < inicio:
+                errores.append((campo, f"{etiqueta} para {nombre} debe ser ≥ {inicio}."))
+            if fin and fecha > fin:
+                errores.append((campo, f"{etiqueta} para {nombre} debe ser ≤ {fin}."))
+    return errores
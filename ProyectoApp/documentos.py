@@ -0,0 +1,84 @@
+# ProyectoApp/documentos.py
+"""
+Asignación de documentos a proyectos en bloque.
+
+Acciones:
+- "asignar": documentos sin proyecto pasan al proyecto destino.
+- "mover": documentos (con o sin proyecto) pasan al proyecto destino.
+- "quitar": documentos quedan sin proyecto.
+
+Los ANULADO nunca se tocan. Todo se escribe con un solo UPDATE; como
+update() no dispara signals, al final se invalida una vez la versión de
+cada proyecto afectado (origen y destino).
+"""
+from django.db import transaction
+
+from FacturacionApp.models import Documento
+from .models import Proyecto, invalidar_version_proyecto
+
+ACCIONES = ("asignar", "mover", "quitar")
+
+
+def cambiar_proyecto(ids, accion, proyecto_id=None) -> dict:
+    """
+    Aplica `accion` sobre los documentos `ids`. Devuelve
+    {"actualizados": n, "omitidos": {id: motivo}}; ValueError si los
+    parámetros no son válidos.
+    """
+    if accion not in ACCIONES:
+        raise ValueError("Acción no válida: usa asignar, mover o quitar.")
+    if accion != "quitar" and not proyecto_id:
+        raise ValueError("Indica el proyecto de destino.")
+
+    ids = set(ids)
+    omitidos = {}
+
+    with transaction.atomic():
+        # El destino se bloquea junto con los documentos: no puede borrarse
+        # entre la validación y el UPDATE
+        destino = None
+        if accion != "quitar":
+            destino = (
+                Proyecto.objects.select_for_update()
+                .filter(pk=proyecto_id)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if destino is None:
+                raise ValueError("El proyecto de destino no existe.")
+
+        # Bloquea las filas para leer el proyecto de origen y actualizar sin carreras
+        actuales = {
+            doc_id: (estado, origen)
+            for doc_id, estado, origen in (
+                Documento.objects
+                .select_for_update()
+                .filter(pk__in=ids)
+                .values_list("pk", "docum_estado", "proyecto_id")
+            )
+        }
+        origenes = {doc_id: origen for doc_id, (_, origen) in actuales.items()}
+
+        elegibles = []
+        for doc_id in ids:
+            if doc_id not in actuales:
+                omitidos[doc_id] = "no existe"
+            elif actuales[doc_id][0] == "ANULADO":
+                omitidos[doc_id] = "documento anulado"
+            elif accion == "asignar" and origenes[doc_id] is not None:
+                omitidos[doc_id] = "ya tiene proyecto"
+            elif origenes[doc_id] == destino:
+                omitidos[doc_id] = "sin cambios"
+            else:
+                elegibles.append(doc_id)
+
+        actualizados = 0
+        if elegibles:
+            actualizados = Documento.objects.filter(pk__in=elegibles).update(proyecto_id=destino)
+
+            # Resúmenes de proyecto: una invalidación por proyecto afectado
+            afectados = {origenes[doc_id] for doc_id in elegibles} | {destino}
+            for afectado in afectados:
+                invalidar_version_proyecto(afectado)
+
+    return {"actualizados": actualizados, "omitidos": omitidos}
@@ -0,0 +1,272 @@
+# ProyectoApp/finanzas.py
+"""
+Cálculos financieros de proyectos hechos en SQL.
+
+El tipo de un documento es el nombre (tipo_trans INGRESO / EGRESO, no el
+tipo_id) de su primera transacción y su monto bruto es
+Σ dedoc_cant × produ_bruto de sus líneas. Los documentos ANULADO no
+cuentan. Ambas reglas son las de los reportes de gasto, territorio y
+estados de cuenta. La utilidad de un proyecto es proye_cost + ingresos −
+egresos.
+"""
+from django.db.models import Case, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek
+
+from FacturacionApp.models import DetalleDoc, Transaccion
+from .models import Proyecto
+
+TIPO_INGRESO = "INGRESO"
+TIPO_EGRESO = "EGRESO"
+ESTADOS_POR_COBRAR = ("PENDIENTE", "MITAD")
+
+
+def tipo_primera_transaccion(documento_ref="documento"):
+    """Subquery con el nombre del tipo (tipo_trans) de la primera transacción del documento."""
+    return Subquery(
+        Transaccion.objects
+        .filter(documento=OuterRef(documento_ref))
+        .order_by("pk")
+        .values("tipo__tipo_trans")[:1]
+    )
+
+
+def es_tipo(tipo, campo="tipo_doc_trans"):
+    """Q sobre el nombre anotado con tipo_primera_transaccion() (como "EGRESO" in tipo_trans)."""
+    return Q(**{f"{campo}__icontains": tipo})
+
+
+def bruto_lineas(**extra):
+    """Expresión Σ dedoc_cant × produ_bruto sobre DetalleDoc."""
+    return Sum(F("dedoc_cant") * F("producto__produ_bruto"), output_field=IntegerField(), **extra)
+
+
+def pagado_lineas(**extra):
+    """Expresión Σ dedoc_pagado × produ_bruto sobre DetalleDoc."""
+    return Sum(F("dedoc_pagado") * F("producto__produ_bruto"), output_field=IntegerField(), **extra)
+
+
+def pendiente_lineas(**extra):
+    """Expresión Σ (dedoc_cant − dedoc_pagado) × produ_bruto sobre DetalleDoc."""
+    return Sum(
+        (F("dedoc_cant") - F("dedoc_pagado")) * F("producto__produ_bruto"),
+        output_field=IntegerField(),
+        **extra,
+    )
+
+
+def documentos_con_totales(documentos):
+    """
+    Anota total_calc (bruto) y tipo_trans_calc en un queryset
+    de Documento, sin recorrer detalles ni transacciones en Python.
+    """
+    bruto = (
+        DetalleDoc.objects
+        .filter(documento=OuterRef("pk"), producto__isnull=False)
+        .values("documento")
+        .annotate(total=bruto_lineas())
+        .values("total")
+    )
+    return documentos.annotate(
+        total_calc=Coalesce(Subquery(bruto, output_field=IntegerField()), Value(0)),
+        tipo_trans_calc=tipo_primera_transaccion("pk"),
+    )
+
+
+def _total_por_tipo(tipo, expresion=bruto_lineas, **filtros):
+    """
+    Subquery: Σ `expresion` sobre las líneas de los documentos no anulados
+    del proyecto (OuterRef pk) de un tipo, con filtros extra opcionales
+    sobre DetalleDoc.
+    """
+    lineas = (
+        DetalleDoc.objects
+        .filter(documento__proyecto=OuterRef("pk"), producto__isnull=False, **filtros)
+        .exclude(documento__docum_estado="ANULADO")
+        .annotate(tipo_doc_trans=tipo_primera_transaccion())
+        .filter(es_tipo(tipo))
+        .values("documento__proyecto")
+        .annotate(total=expresion())
+        .values("total")
+    )
+    return Coalesce(Subquery(lineas, output_field=IntegerField()), Value(0))
+
+
+def con_finanzas(proyectos):
+    """
+    Anota ingresos_calc, egresos_calc y utilidad_calc en un queryset de
+    Proyecto (una subconsulta agrupada por proyecto, sin bucles en Python).
+    """
+    return proyectos.annotate(
+        ingresos_calc=_total_por_tipo(TIPO_INGRESO),
+        egresos_calc=_total_por_tipo(TIPO_EGRESO),
+    ).annotate(
+        utilidad_calc=Coalesce(F("proye_cost"), Value(0)) + F("ingresos_calc") - F("egresos_calc"),
+    )
+
+
+def con_cartera(proyectos, hoy):
+    """
+    Anota por_cobrar_calc (lo no pagado de los ingresos PENDIENTE/MITAD) y
+    por_cobrar_vencido_calc (de eso, lo con docum_fecha_ven < hoy).
+    """
+    return proyectos.annotate(
+        por_cobrar_calc=_total_por_tipo(
+            TIPO_INGRESO, pendiente_lineas,
+            documento__docum_estado__in=ESTADOS_POR_COBRAR,
+        ),
+        por_cobrar_vencido_calc=_total_por_tipo(
+            TIPO_INGRESO, pendiente_lineas,
+            documento__docum_estado__in=ESTADOS_POR_COBRAR,
+            documento__docum_fecha_ven__lt=hoy,
+        ),
+    )
+
+
+def con_margen(proyectos_con_finanzas):
+    """
+    Anota margen_calc = utilidad / (presupuesto + ingresos) sobre un queryset
+    anotado con con_finanzas; NULL si esa base no es positiva.
+    """
+    return proyectos_con_finanzas.annotate(
+        margen_base_calc=Coalesce(F("proye_cost"), Value(0)) + F("ingresos_calc"),
+    ).annotate(
+        margen_calc=Case(
+            When(
+                margen_base_calc__gt=0,
+                then=F("utilidad_calc") * Value(1.0) / F("margen_base_calc"),
+            ),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def totales(proyectos_con_finanzas) -> dict:
+    """utilidad_total y egresos_total de un queryset anotado con con_finanzas."""
+    resultado = proyectos_con_finanzas.aggregate(
+        utilidad_total=Sum("utilidad_calc"),
+        egresos_total=Sum("egresos_calc"),
+    )
+    return {clave: valor or 0 for clave, valor in resultado.items()}
+
+
+# ==============================
+#   FLUJO DE CAJA POR PERIODO
+# ==============================
+PERIODOS = {
+    "mes": TruncMonth,
+    "semana": TruncWeek,  # semanas ISO: empiezan el lunes
+}
+
+
+def serie_flujo(proyecto, periodo="mes") -> list[dict]:
+    """
+    Serie por mes o semana de emisión (docum_fecha_emi) del proyecto:
+    ingresos y egresos, pagado vs pendiente de cada uno y el egreso
+    acumulado contra proye_cost. Una consulta agrupada; el acumulado se
+    suma en Python sobre los periodos ya ordenados.
+    """
+    truncar = PERIODOS[periodo]
+    es_ingreso = es_tipo(TIPO_INGRESO)
+    es_egreso = es_tipo(TIPO_EGRESO)
+
+    filas = (
+        DetalleDoc.objects
+        .filter(documento__proyecto=proyecto, producto__isnull=False)
+        .exclude(documento__docum_estado="ANULADO")
+        .annotate(
+            tipo_doc_trans=tipo_primera_transaccion(),
+            periodo=truncar("documento__docum_fecha_emi"),
+        )
+        .values("periodo")
+        .annotate(
+            ingresos=bruto_lineas(filter=es_ingreso),
+            ingresos_pagados=pagado_lineas(filter=es_ingreso),
+            egresos=bruto_lineas(filter=es_egreso),
+            egresos_pagados=pagado_lineas(filter=es_egreso),
+        )
+        .order_by("periodo")
+    )
+
+    presupuesto = proyecto.proye_cost or 0
+    acumulado = 0
+    serie = []
+    for fila in filas:
+        ingresos = fila["ingresos"] or 0
+        egresos = fila["egresos"] or 0
+        ingresos_pagados = fila["ingresos_pagados"] or 0
+        egresos_pagados = fila["egresos_pagados"] or 0
+        acumulado += egresos
+
+        serie.append({
+            "periodo": fila["periodo"].isoformat(),
+            "ingresos": ingresos,
+            "ingresos_pagados": ingresos_pagados,
+            "ingresos_pendientes": ingresos - ingresos_pagados,
+            "egresos": egresos,
+            "egresos_pagados": egresos_pagados,
+            "egresos_pendientes": egresos - egresos_pagados,
+            "egresos_acumulados": acumulado,
+            "presupuesto_restante": presupuesto - acumulado,
+            "presupuesto_usado_pct": round(acumulado * 100 / presupuesto, 2) if presupuesto > 0 else None,
+        })
+    return serie
+
+
+# ==============================
+#   REPORTE DE CARTERA (todos los proyectos)
+# ==============================
+REPORTE_COLUMNAS = (
+    ("proye_idp", "ID"),
+    ("proye_desc", "Proyecto"),
+    ("proye_estado", "Estado"),
+    ("cliente__emppe_nom", "Cliente"),
+    ("presupuesto", "Presupuesto"),
+    ("ingresos", "Ingresos"),
+    ("egresos", "Egresos"),
+    ("presupuesto_usado_pct", "% presupuesto usado"),
+    ("utilidad", "Utilidad"),
+    ("margen_pct", "Margen %"),
+    ("por_cobrar", "Por cobrar"),
+    ("por_cobrar_vencido", "Por cobrar vencido"),
+)
+
+
+def reporte_cartera(hoy, orden="-utilidad_calc"):
+    """
+    Queryset de dicts con una fila por proyecto: presupuesto vs egresos,
+    utilidad, margen y cuentas por cobrar (pendientes y vencidas). Una sola
+    consulta (subconsultas agrupadas por proyecto); se recorre con
+    .iterator() para exportar sin cargarlo entero. `orden` puede ser un
+    campo o una expresión (ej. F("margen_calc").desc(nulls_last=True)).
+    """
+    return (
+        con_cartera(con_margen(con_finanzas(Proyecto.objects.all())), hoy)
+        .order_by(orden, "proye_idt")
+        .values(
+            "proye_idt", "proye_idp", "proye_desc", "proye_estado", "cliente__emppe_nom",
+            "proye_cost", "ingresos_calc", "egresos_calc", "utilidad_calc",
+            "por_cobrar_calc", "por_cobrar_vencido_calc",
+        )
+    )
+
+
+def fila_reporte(p) -> dict:
+    """Fila del reporte con los porcentajes calculados (claves de REPORTE_COLUMNAS)."""
+    presupuesto = p["proye_cost"] or 0
+    ingresos, egresos, utilidad = p["ingresos_calc"], p["egresos_calc"], p["utilidad_calc"]
+    base_margen = presupuesto + ingresos
+    return {
+        "id": p["proye_idt"],
+        "proye_idp": p["proye_idp"],
+        "proye_desc": p["proye_desc"],
+        "proye_estado": p["proye_estado"],
+        "cliente__emppe_nom": p["cliente__emppe_nom"] or "Sin asignar",
+        "presupuesto": presupuesto,
+        "ingresos": ingresos,
+        "egresos": egresos,
+        "presupuesto_usado_pct": round(egresos * 100 / presupuesto, 2) if presupuesto > 0 else None,
+        "utilidad": utilidad,
+        "margen_pct": round(utilidad * 100 / base_margen, 2) if base_margen > 0 else None,
+        "por_cobrar": p["por_cobrar_calc"],
+        "por_cobrar_vencido": p["por_cobrar_vencido_calc"],
+    }
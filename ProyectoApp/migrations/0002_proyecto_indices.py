@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-19 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProyectoApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['proye_idp'], name='proye_idp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['proye_estado', 'proye_fecha_sol'], name='proye_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['cliente', 'proye_fecha_sol'], name='proye_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['proye_fecha_sol'], name='proye_fecha_sol_idx'),
+        ),
+    ]
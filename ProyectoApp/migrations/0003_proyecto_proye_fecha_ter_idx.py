@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ProyectoApp', '0002_proyecto_indices'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['proye_fecha_ter'], name='proye_fecha_ter_idx'),
+        ),
+    ]
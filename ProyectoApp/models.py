@@ -1,7 +1,10 @@
 # ProyectoApp/models.py
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.versiones import invalidar_version, obtener_version
 
 class Proyecto(models.Model):
     ESTADOS = [
@@ -30,6 +33,37 @@ class Proyecto(models.Model):
 
     class Meta:
         db_table = "proyecto"
+        indexes = [
+            # Chequeo de duplicados de ProyectoForm y búsqueda por prefijo del ID público
+            models.Index(fields=["proye_idp"], name="proye_idp_idx"),
+            # Filtros de lista_proyectos: estado / cliente + rango de fecha de solicitud
+            models.Index(fields=["proye_estado", "proye_fecha_sol"], name="proye_estado_fecha_idx"),
+            models.Index(fields=["cliente", "proye_fecha_sol"], name="proye_cliente_fecha_idx"),
+            models.Index(fields=["proye_fecha_sol"], name="proye_fecha_sol_idx"),
+            # ?tipo_fecha=ter: rango por fecha de término
+            models.Index(fields=["proye_fecha_ter"], name="proye_fecha_ter_idx"),
+        ]
 
     def __str__(self):
         return f"{self.proye_desc} ({self.proye_estado})"
+
+
+# =============================
+#   VERSIÓN DE DATOS POR PROYECTO
+# =============================
+def version_proyecto(proyecto_id) -> str:
+    """Versión de los datos financieros de un proyecto (para claves de caché)."""
+    return obtener_version(f"proyecto-{proyecto_id}")
+
+
+def invalidar_version_proyecto(proyecto_id) -> None:
+    """Lo llaman las escrituras del proyecto y de sus documentos/detalles/transacciones."""
+    if proyecto_id:
+        invalidar_version(f"proyecto-{proyecto_id}")
+
+
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+def invalidar_version_proyecto_editado(sender, instance, **kwargs):
+    """proye_cost entra en los cálculos del proyecto."""
+    invalidar_version_proyecto(instance.pk)
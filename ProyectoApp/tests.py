@@ -1,3 +1,198 @@
+import json
+from datetime import date
+
 from django.test import TestCase
+from django.urls import reverse
+
+from EmpresaPersona.pruebas import EGRESO, INGRESO, SesionAdminMixin, crear_documento, crear_empresa
+from FacturacionApp.models import Documento, TipoTransaccion
+from ProductoServicioApp.models import ProductoServicio
+from .documentos import cambiar_proyecto
+from .finanzas import con_finanzas, con_margen, fila_reporte, reporte_cartera, serie_flujo
+from .models import Proyecto
+
+
+def crear_proyecto(idp, costo=0, cliente=None):
+    return Proyecto.objects.create(
+        proye_idp=idp, proye_desc=f"Proyecto {idp}", proye_estado="En Progreso",
+        proye_fecha_sol=date(2024, 1, 1), proye_cost=costo, cliente=cliente,
+    )
+
+
+# ==============================
+#   CÁLCULOS FINANCIEROS
+# ==============================
+class FinanzasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.producto = ProductoServicio.objects.create(produ_sku="F-1", produ_nom="Hora", produ_bruto=1000)
+        cls.empresa = crear_empresa("11.111.111-1", "Providencia")
+        cls.proyecto = crear_proyecto("P-1", costo=10000, cliente=cls.empresa)
+
+        for tipo, cantidad, pagado, fecha in (
+            (INGRESO, 5, 2, date(2024, 1, 10)),
+            (INGRESO, 3, 0, date(2024, 2, 10)),
+            (EGRESO, 4, 4, date(2024, 1, 20)),
+            (EGRESO, 2, 0, date(2024, 2, 5)),
+        ):
+            doc = crear_documento(cls.empresa, tipo, [(cls.producto, cantidad, pagado)], fecha=fecha)
+            Documento.objects.filter(pk=doc.pk).update(proyecto=cls.proyecto)
+        # Sin proyecto: no cuenta
+        crear_documento(cls.empresa, INGRESO, [(cls.producto, 50, 0)])
+        # Anulados: no cuentan en ingresos, egresos ni por cobrar
+        anulados = [
+            crear_documento(cls.empresa, tipo, [(cls.producto, 7, 0)], fecha=date(2024, 1, 15), estado="ANULADO")
+            for tipo in (INGRESO, EGRESO)
+        ]
+        Documento.objects.filter(pk__in=[d.pk for d in anulados]).update(proyecto=cls.proyecto)
+
+    def test_ingresos_egresos_y_utilidad(self):
+        p = con_finanzas(Proyecto.objects.filter(pk=self.proyecto.pk)).get()
+        self.assertEqual((p.ingresos_calc, p.egresos_calc), (8000, 6000))
+        self.assertEqual(p.utilidad_calc, 10000 + 8000 - 6000)
+
+    def test_tipo_por_nombre_no_por_id(self):
+        # El tipo se reconoce por tipo_trans aunque su tipo_id no sea 1 ni 2
+        TipoTransaccion.objects.create(tipo_id=9, tipo_trans="EGRESO PROVEEDOR")
+        doc = crear_documento(self.empresa, "EGRESO PROVEEDOR", [(self.producto, 1, 0)])
+        Documento.objects.filter(pk=doc.pk).update(proyecto=self.proyecto)
+        p = con_finanzas(Proyecto.objects.filter(pk=self.proyecto.pk)).get()
+        self.assertEqual((p.ingresos_calc, p.egresos_calc), (8000, 7000))
+
+    def test_margen_sobre_presupuesto_mas_ingresos(self):
+        p = con_margen(con_finanzas(Proyecto.objects.filter(pk=self.proyecto.pk))).get()
+        self.assertAlmostEqual(p.margen_calc, 12000 / 18000)
+
+    def test_margen_nulo_sin_base(self):
+        vacio = crear_proyecto("P-0")
+        p = con_margen(con_finanzas(Proyecto.objects.filter(pk=vacio.pk))).get()
+        self.assertIsNone(p.margen_calc)
+
+    def test_fila_reporte(self):
+        fila = fila_reporte(reporte_cartera(date(2024, 2, 1)).get(proye_idt=self.proyecto.pk))
+        self.assertEqual(fila["presupuesto_usado_pct"], 60.0)
+        self.assertEqual(fila["margen_pct"], 66.67)
+        # Por cobrar: ingresos PENDIENTE sin pagar (3 + 3 unidades)
+        self.assertEqual(fila["por_cobrar"], 6000)
+
+    def test_serie_flujo_mensual(self):
+        serie = serie_flujo(self.proyecto, "mes")
+        self.assertEqual([f["periodo"] for f in serie], ["2024-01-01", "2024-02-01"])
+        enero, febrero = serie
+        self.assertEqual((enero["ingresos"], enero["ingresos_pagados"]), (5000, 2000))
+        self.assertEqual(enero["egresos_pendientes"], 0)
+        self.assertEqual(febrero["egresos_acumulados"], 6000)
+        self.assertEqual(febrero["presupuesto_restante"], 4000)
+
+
+# ==============================
+#   CAMBIO DE PROYECTO EN BLOQUE
+# ==============================
+class CambiarProyectoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        producto = ProductoServicio.objects.create(produ_sku="C-1", produ_nom="Hora", produ_bruto=100)
+        empresa = crear_empresa("22.222.222-2", "Providencia")
+        cls.origen = crear_proyecto("O-1")
+        cls.destino = crear_proyecto("D-1")
+        cls.libre = crear_documento(empresa, INGRESO, [(producto, 1, 0)])
+        cls.asignado = crear_documento(empresa, INGRESO, [(producto, 1, 0)])
+        cls.anulado = crear_documento(empresa, INGRESO, [(producto, 1, 0)], estado="ANULADO")
+        Documento.objects.filter(pk__in=[cls.asignado.pk, cls.anulado.pk]).update(proyecto=cls.origen)
+
+    def proyecto_de(self, doc):
+        return Documento.objects.values_list("proyecto_id", flat=True).get(pk=doc.pk)
+
+    def test_asignar_solo_los_que_no_tienen_proyecto(self):
+        resultado = cambiar_proyecto([self.libre.pk, self.asignado.pk], "asignar", self.destino.pk)
+        self.assertEqual(resultado["actualizados"], 1)
+        self.assertEqual(resultado["omitidos"], {self.asignado.pk: "ya tiene proyecto"})
+        self.assertEqual(self.proyecto_de(self.libre), self.destino.pk)
+
+    def test_mover_omite_anulados_e_inexistentes(self):
+        resultado = cambiar_proyecto([self.asignado.pk, self.anulado.pk, 999999], "mover", self.destino.pk)
+        self.assertEqual(resultado["actualizados"], 1)
+        self.assertEqual(
+            resultado["omitidos"], {self.anulado.pk: "documento anulado", 999999: "no existe"}
+        )
+        self.assertEqual(self.proyecto_de(self.anulado), self.origen.pk)
+
+    def test_quitar(self):
+        resultado = cambiar_proyecto([self.asignado.pk, self.libre.pk], "quitar")
+        self.assertEqual(resultado["actualizados"], 1)
+        self.assertEqual(resultado["omitidos"], {self.libre.pk: "sin cambios"})
+        self.assertIsNone(self.proyecto_de(self.asignado))
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            cambiar_proyecto([self.libre.pk], "borrar", self.destino.pk)
+        with self.assertRaises(ValueError):
+            cambiar_proyecto([self.libre.pk], "mover")
+        with self.assertRaises(ValueError):
+            cambiar_proyecto([self.libre.pk], "mover", 999999)
+        self.assertIsNone(self.proyecto_de(self.libre))
+
+
+# ==============================
+#   APIS: PARÁMETROS INVÁLIDOS Y FORMATO DE RESPUESTA
+# ==============================
+class ApisProyectoTests(SesionAdminMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        producto = ProductoServicio.objects.create(produ_sku="A-1", produ_nom="Hora", produ_bruto=1000)
+        empresa = crear_empresa("33.333.333-3", "Providencia")
+        cls.proyectos = [crear_proyecto(f"R-{i}", costo=1000 * i) for i in range(1, 4)]
+        # Márgenes: R-1 = 0 / 2000, R-2 = 3000 / 4000, R-3 = 6000 / 6000
+        for i, proyecto in enumerate(cls.proyectos, start=1):
+            docs = [crear_documento(empresa, INGRESO, [(producto, i, 0)])]
+            if i < 3:
+                docs.append(crear_documento(empresa, EGRESO, [(producto, 3 - i, 0)]))
+            Documento.objects.filter(pk__in=[d.pk for d in docs]).update(proyecto=proyecto)
+        cls.doc = docs[0]
+
+    def masivo(self, **datos):
+        return self.client.post(
+            reverse("proyectoapp:api_documentos_masivo"), json.dumps(datos), content_type="application/json",
+        )
+
+    def test_masivo_proyecto_no_numerico(self):
+        respuesta = self.masivo(accion="mover", documentos=[self.doc.pk], proyecto="abc")
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_masivo_documentos_no_lista_de_ids(self):
+        destino = self.proyectos[0].pk
+        for documentos in ("123", {"1": 1}, [str(self.doc.pk)], [1.5], [True], None):
+            with self.subTest(documentos=documentos):
+                respuesta = self.masivo(accion="mover", documentos=documentos, proyecto=destino)
+                self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Documento.objects.get(pk=self.doc.pk).proyecto_id, self.proyectos[2].pk)
+
+    def test_documentos_por_proyecto_per_page_cero(self):
+        proyecto = self.proyectos[0]
+        respuesta = self.client.get(
+            reverse("proyectoapp:api_documentos_por_proyecto", args=[proyecto.pk]),
+            {"per_page": "0", "page": "99"},
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        data = respuesta.json()
+        self.assertEqual((data["page"], len(data["docs"])), (2, 1))
+        # Claves de la antigua API de FacturacionApp
+        self.assertEqual((data["ingresos"], data["egresos"], data["utilidad"]), (1000, 2000, 0))
+        self.assertEqual(data["proyecto"]["proye_cost"], 1000)
+
+    def test_lista_fecha_imposible_se_ignora(self):
+        respuesta = self.client.get(
+            reverse("proyectoapp:lista_proyectos"), {"desde": "2024-02-30", "tipo_fecha": "ter"}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context["proyectos"]), 3)
 
-# Create your tests here.
+    def test_reporte_sin_solapamiento(self):
+        respuesta = self.client.get(reverse("proyectoapp:api_reporte_proyectos"), {"n": "2"})
+        data = respuesta.json()
+        mejores = [f["id"] for f in data["mejores"]]
+        peores = [f["id"] for f in data["peores"]]
+        # Con menos de 2N proyectos "peores" trae solo los que no están en "mejores"
+        r1, r2, r3 = (p.pk for p in self.proyectos)
+        self.assertEqual(mejores, [r3, r2])
+        self.assertEqual(peores, [r1])
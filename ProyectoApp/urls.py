@@ -13,6 +13,12 @@ urlpatterns = [
     path("<int:pk>/detalle/", views.detalle_proyecto, name="detalle_proyecto"),
     path("ver/<int:pk>/", views.ver_proyecto, name="ver_proyecto"),
     path("api/documentos/<int:proye_idt>/", views.api_documentos_por_proyecto, name="api_documentos_por_proyecto"),
+    path("api/flujo/<int:pk>/", views.api_flujo_proyecto, name="api_flujo_proyecto"),
+    path("api/documentos/masivo/", views.api_documentos_masivo, name="api_documentos_masivo"),
+
+    # Reporte de cartera (todos los proyectos)
+    path("reporte/", views.api_reporte_proyectos, name="api_reporte_proyectos"),
+    path("reporte/exportar/", views.export_reporte_proyectos, name="export_reporte_proyectos"),
 
 
 ]
\ No newline at end of file
@@ -2,15 +2,33 @@
 from decimal import ROUND_HALF_UP, Decimal
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.db.models import Q, Sum, F
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from urllib.parse import urlencode
+import json
+import tempfile
+
+import openpyxl
 from FacturacionApp.models import Documento, DetalleDoc
 
-from .models import Proyecto
+from .models import Proyecto, version_proyecto
 from EmpresaPersonaApp.models import EmpresaPersona
+from EmpresaPersonaApp.descargas import respuesta_csv
+from EmpresaPersonaApp.versiones import obtener_version
 from .forms import ProyectoForm
+from .documentos import cambiar_proyecto
+from .finanzas import (
+    PERIODOS, REPORTE_COLUMNAS,
+    con_cartera, con_finanzas, documentos_con_totales, fila_reporte,
+    reporte_cartera, serie_flujo, totales,
+)
 
 
 # Detecta solicitudes AJAX
@@ -52,46 +70,58 @@ def _cliente_info(proyecto):
 # -----------------------------
 # LISTAR PROYECTOS
 # -----------------------------
-def lista_proyectos(request):
-
-    proyectos = Proyecto.objects.all().order_by("-proye_idt")
-
-    utilidad_total = 0
-    egresos_total = 0
-
-    # Agregamos valores calculados al objeto proyecto
-    for p in proyectos:
-
-        documentos = Documento.objects.filter(proyecto=p)
+PROYECTOS_POR_PAGINA = 50
+FILTROS_PROYECTOS = ("q", "estado", "por_cliente", "tipo_fecha", "desde", "hasta")
+
+
+def _fecha_filtro(valor):
+    """AAAA-MM-DD -> date; vacío o imposible (2024-02-30) -> None (el filtro se ignora)."""
+    try:
+        return parse_date(valor or "")
+    except ValueError:
+        return None
+
+
+def _filtrar_proyectos(proyectos, filtros):
+    """
+    Filtros de la lista (todos opcionales, respaldados por índices de Proyecto):
+    ?estado=, ?por_cliente=<id>, ?desde=/?hasta= sobre proye_fecha_sol
+    (o proye_fecha_ter con ?tipo_fecha=ter) y ?q= (prefijo de proye_idp o
+    texto dentro de proye_desc).
+    """
+    if filtros["estado"]:
+        proyectos = proyectos.filter(proye_estado=filtros["estado"])
+    if filtros["por_cliente"].isdigit():
+        proyectos = proyectos.filter(cliente_id=int(filtros["por_cliente"]))
+
+    campo_fecha = "proye_fecha_ter" if filtros["tipo_fecha"] == "ter" else "proye_fecha_sol"
+    desde = _fecha_filtro(filtros["desde"])
+    if desde:
+        proyectos = proyectos.filter(**{f"{campo_fecha}__gte": desde})
+    hasta = _fecha_filtro(filtros["hasta"])
+    if hasta:
+        proyectos = proyectos.filter(**{f"{campo_fecha}__lte": hasta})
+
+    q = filtros["q"]
+    if q:
+        proyectos = proyectos.filter(Q(proye_idp__istartswith=q) | Q(proye_desc__icontains=q))
+    return proyectos
 
-        ingresos = 0
-        egresos = 0
 
-        for d in documentos:
-
-            bruto = 0
-
-            for det in d.detalles.all():
-                if det.producto:
-                    bruto += det.dedoc_cant * det.producto.produ_bruto
+def lista_proyectos(request):
 
-            trans = d.transaccion
-            if trans:
-                if trans.tipo.tipo_id == 1:  # ingreso
-                    ingresos += bruto
-                elif trans.tipo.tipo_id == 2:  # egreso
-                    egresos += bruto
+    filtros = {clave: request.GET.get(clave, "").strip() for clave in FILTROS_PROYECTOS}
 
-        costo = p.proye_cost or 0
-        utilidad = costo + ingresos - egresos
+    # Utilidad y egresos por proyecto en SQL (ver finanzas.con_finanzas)
+    proyectos = con_finanzas(
+        _filtrar_proyectos(Proyecto.objects.select_related("cliente"), filtros)
+        .order_by("-proye_idt")
+    )
 
-        # Guardar en el objeto (no en BD)
-        p.utilidad_calc = utilidad
-        p.egresos_calc = egresos
+    # Totales de los proyectos filtrados: una sola agregación
+    totales_globales = totales(proyectos)
 
-        # Acumulados globales
-        utilidad_total += utilidad
-        egresos_total += egresos
+    page_obj = Paginator(proyectos, PROYECTOS_POR_PAGINA).get_page(request.GET.get("page"))
 
     clientes = EmpresaPersona.objects.filter(
         emppe_est=True,
@@ -99,16 +129,20 @@ def lista_proyectos(request):
     ).order_by("emppe_nom")
 
     return render(request, "proyecto/proyecto.html", {
-        "proyectos": proyectos,
+        "proyectos": page_obj.object_list,
+        "page_obj": page_obj,
+        "filtros": filtros,
+        "hay_filtros": any(filtros[c] for c in FILTROS_PROYECTOS if c != "tipo_fecha"),
+        # Para mantener los filtros al cambiar de página
+        "querystring": urlencode({c: v for c, v in filtros.items() if v}),
+        "estados": Proyecto.ESTADOS,
         "form": ProyectoForm(),
         "clientes": clientes,
-        "utilidad_total": utilidad_total,
-        "egresos_total": egresos_total,
+        "utilidad_total": totales_globales["utilidad_total"],
+        "egresos_total": totales_globales["egresos_total"],
     })
 
 
-
-
 # -----------------------------
 # CREAR PROYECTO
 # -----------------------------
@@ -290,79 +324,272 @@ def detalle_proyecto(request, pk):
 
 # -----------------------------
 # API: DOCUMENTOS ASOCIADOS A UN PROYECTO
+# (también en /facturacion/proyecto/<id>/documentos/)
 # -----------------------------
-def api_documentos_por_proyecto(request, proye_idt):
-
-    proyecto = get_object_or_404(Proyecto, pk=proye_idt)
-    documentos = Documento.objects.filter(proyecto=proyecto)
-
-    ingresos = 0
-    egresos = 0
-
-    docs_list = []
-
-    for d in documentos:
+DOCUMENTOS_POR_PAGINA = 50
+DOCUMENTOS_MAX_POR_PAGINA = 200
+DOCUMENTOS_CACHE_SEGUNDOS = 60 * 60
+
+
+def _documentos_del_proyecto(proyecto):
+    """Documentos del proyecto con bruto y tipo anotados, más recientes primero."""
+    return documentos_con_totales(
+        Documento.objects.filter(proyecto=proyecto)
+    ).order_by("-docum_fecha_emi", "-docum_id").values(
+        "docum_id", "docum_num", "docum_fecha_emi", "docum_estado",
+        "empresa__emppe_nom", "total_calc", "tipo_trans_calc",
+    )
 
-        # --- Calcular monto bruto ---
-        bruto = sum(
-            det.dedoc_cant * (det.producto.produ_bruto if det.producto else 0)
-            for det in d.detalles.all()
-        )
 
-        # --- Detectar ingreso/egreso según TRANSACCIÓN ---
-        trans = d.transaccion   # propiedad del modelo: d.transacciones.first()
-
-        if trans:
-            if trans.tipo.tipo_id == 1:      # 1 = ingreso
-                ingresos += bruto
-            elif trans.tipo.tipo_id == 2:    # 2 = egreso
-                egresos += bruto
-        else:
-            # si NO hay transacción asociada lo tratamos como "no clasificado"
-            pass
-
-        # --- Agregar documento al listado ---
-        docs_list.append({
-            "id": d.pk,
-            "num": d.docum_num,
-            "fecha": d.docum_fecha_emi.strftime("%Y-%m-%d") if d.docum_fecha_emi else "",
-            "estado": d.docum_estado,
-            "cliente": d.empresa.emppe_nom if d.empresa else "Sin cliente",
-            "total": bruto,
-            "tipo_trans": trans.tipo.tipo_trans if trans else None,
-        })
+def _documentos_por_proyecto(proyecto, page_obj):
+    """Cuerpo de la respuesta: totales del proyecto + una página de documentos."""
+    # Totales de TODOS los documentos: la misma anotación que lista_proyectos
+    fin = con_finanzas(Proyecto.objects.filter(pk=proyecto.pk)).values(
+        "ingresos_calc", "egresos_calc", "utilidad_calc"
+    ).get()
+    ingresos, egresos, utilidad = fin["ingresos_calc"], fin["egresos_calc"], fin["utilidad_calc"]
+
+    docs_list = [
+        {
+            "id": d["docum_id"],
+            "num": d["docum_num"],
+            "fecha": d["docum_fecha_emi"].strftime("%Y-%m-%d") if d["docum_fecha_emi"] else "",
+            "estado": d["docum_estado"],
+            "cliente": d["empresa__emppe_nom"] or "Sin cliente",
+            "total": d["total_calc"],
+            "tipo_trans": d["tipo_trans_calc"],
+        }
+        for d in page_obj.object_list
+    ]
 
     # --- Cálculos financieros del proyecto ---
     costo_proyecto = proyecto.proye_cost or 0
-    utilidad = costo_proyecto + ingresos - egresos
-
     restante = costo_proyecto - egresos
     porcentaje_restante = 0
     if costo_proyecto > 0:
         porcentaje_restante = max(0, min(100, int((restante / costo_proyecto) * 100)))
 
-    return JsonResponse({
+    return {
         "success": True,
         "proyecto": {
+            "id": proyecto.pk,
+            "nombre": proyecto.proye_desc,
+            "cliente": proyecto.cliente.emppe_nom if proyecto.cliente else "",
             "costo": costo_proyecto,
+            "proye_cost": costo_proyecto,  # nombre de la antigua API de FacturacionApp
             "ingresos": ingresos,
             "egresos": egresos,
             "utilidad": utilidad,
             "porcentaje_restante": porcentaje_restante,
         },
-        "docs": docs_list
+        "docs": docs_list,
+        # Totales también en la raíz, como la antigua API de FacturacionApp
+        "ingresos": ingresos,
+        "egresos": egresos,
+        "utilidad": utilidad,
+        "page": page_obj.number,
+        "num_pages": page_obj.paginator.num_pages,
+        "count": page_obj.paginator.count,
+        "barra": {
+            "total": costo_proyecto,
+            "restante": max(restante, 0),
+            "porcentaje": round(max(restante, 0) * 100 / costo_proyecto, 2) if costo_proyecto > 0 else 0,
+        },
+    }
+
+
+def api_documentos_por_proyecto(request, proye_idt):
+    """
+    GET ?page=N&per_page=50 -> documentos del proyecto (paginados) y sus
+    totales. Utilidad = proye_cost + ingresos − egresos, con el tipo de la
+    primera transacción (igual que lista_proyectos y ver_proyecto).
+    """
+    proyecto = get_object_or_404(Proyecto.objects.select_related("cliente"), pk=proye_idt)
+
+    try:
+        por_pagina = int(request.GET.get("per_page", DOCUMENTOS_POR_PAGINA))
+    except ValueError:
+        por_pagina = DOCUMENTOS_POR_PAGINA
+    por_pagina = max(1, min(por_pagina, DOCUMENTOS_MAX_POR_PAGINA))
+
+    # get_page normaliza ?page= (un COUNT); la página solo se lee si no está en caché
+    page_obj = Paginator(_documentos_del_proyecto(proyecto), por_pagina).get_page(request.GET.get("page"))
+
+    # version_proyecto cambia con cualquier escritura en los documentos del proyecto
+    clave = (
+        f"proyecto-documentos-{proye_idt}-{page_obj.number}-{por_pagina}-{version_proyecto(proye_idt)}"
+        f"-{obtener_version('productos')}-{obtener_version('personas')}"
+    )
+    data = cache.get(clave)
+    if data is None:
+        data = _documentos_por_proyecto(proyecto, page_obj)
+        cache.set(clave, data, DOCUMENTOS_CACHE_SEGUNDOS)
+
+    return JsonResponse(data)
+
+
+# -----------------------------
+# API: FLUJO DE CAJA DEL PROYECTO (serie para gráfico)
+# -----------------------------
+FLUJO_CACHE_SEGUNDOS = 60 * 60
+
+
+def api_flujo_proyecto(request, pk):
+    """GET ?periodo=mes|semana -> serie de ingresos/egresos del proyecto."""
+    periodo = request.GET.get("periodo", "mes")
+    if periodo not in PERIODOS:
+        return JsonResponse({"success": False, "error": "periodo debe ser mes o semana"}, status=400)
+
+    proyecto = get_object_or_404(Proyecto, pk=pk)
+
+    # Cambia con cualquier escritura del proyecto o sus documentos, y con los precios
+    clave = f"proyecto-flujo-{pk}-{periodo}-{version_proyecto(pk)}-{obtener_version('productos')}"
+    serie = cache.get(clave)
+    if serie is None:
+        serie = serie_flujo(proyecto, periodo)
+        cache.set(clave, serie, FLUJO_CACHE_SEGUNDOS)
+
+    return JsonResponse({
+        "success": True,
+        "periodo": periodo,
+        "presupuesto": proyecto.proye_cost or 0,
+        "serie": serie,
+    })
+
+
+# -----------------------------
+# REPORTE DE CARTERA (todos los proyectos)
+# -----------------------------
+REPORTE_TOP_N = 10
+REPORTE_TOP_MAX = 100
+
+
+def api_reporte_proyectos(request):
+    """
+    GET ?n=10 -> los N proyectos de mayor y menor margen (utilidad /
+    (presupuesto + ingresos)) + totales de la cartera. Los proyectos sin
+    base para el margen quedan al final; un proyecto nunca aparece en
+    ambas listas (con menos de 2N proyectos, "peores" trae el resto).
+    """
+    try:
+        n = max(1, min(int(request.GET.get("n", REPORTE_TOP_N)), REPORTE_TOP_MAX))
+    except ValueError:
+        n = REPORTE_TOP_N
+
+    hoy = timezone.localdate()
+    margen = F("margen_calc")
+    mejores = [fila_reporte(p) for p in reporte_cartera(hoy, margen.desc(nulls_last=True))[:n]]
+    peores = [
+        fila_reporte(p)
+        for p in reporte_cartera(hoy, margen.asc(nulls_last=True))
+        .exclude(proye_idt__in=[fila["id"] for fila in mejores])[:n]
+    ]
+
+    resumen = con_cartera(con_finanzas(Proyecto.objects.all()), hoy).aggregate(
+        presupuesto=Sum("proye_cost"),
+        ingresos=Sum("ingresos_calc"),
+        egresos=Sum("egresos_calc"),
+        utilidad=Sum("utilidad_calc"),
+        por_cobrar=Sum("por_cobrar_calc"),
+        por_cobrar_vencido=Sum("por_cobrar_vencido_calc"),
+    )
+
+    return JsonResponse({
+        "success": True,
+        "resumen": {clave: valor or 0 for clave, valor in resumen.items()},
+        "mejores": mejores,
+        "peores": peores,
+    })
+
+
+def export_reporte_proyectos(request):
+    """GET ?formato=csv|xlsx -> reporte de todos los proyectos (ordenado por utilidad)."""
+    formato = request.GET.get("formato", "xlsx")
+    filas = (fila_reporte(p) for p in reporte_cartera(timezone.localdate()).iterator(chunk_size=500))
+    encabezados = [titulo for _, titulo in REPORTE_COLUMNAS]
+    claves = [clave for clave, _ in REPORTE_COLUMNAS]
+
+    if formato == "csv":
+        return respuesta_csv(
+            "reporte_proyectos.csv",
+            encabezados,
+            ([fila[c] if fila[c] is not None else "" for c in claves] for fila in filas),
+        )
+
+    # XLSX en modo write_only: las filas van a un archivo temporal y se envía por bloques
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Proyectos")
+    ws.append(encabezados)
+    for fila in filas:
+        ws.append([fila[c] for c in claves])
+
+    archivo = tempfile.TemporaryFile()
+    wb.save(archivo)
+    archivo.seek(0)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename="reporte_proyectos.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+
+# -----------------------------
+# API: ASIGNAR / MOVER / QUITAR DOCUMENTOS (en bloque)
+# -----------------------------
+DOCUMENTOS_MASIVO_MAX = 5000
+
+
+@require_POST
+def api_documentos_masivo(request):
+    """
+    POST JSON {"accion": "asignar"|"mover"|"quitar", "documentos": [ids],
+    "proyecto": id_destino} -> un solo UPDATE (ver documentos.cambiar_proyecto).
+    """
+    try:
+        datos = json.loads(request.body or "{}")
+        ids = datos.get("documentos", [])
+        proyecto_id = datos.get("proyecto")
+        if proyecto_id not in (None, ""):
+            proyecto_id = int(proyecto_id)
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({"success": False, "error": "JSON inválido"}, status=400)
+
+    # Solo una lista de enteros: un string o un objeto se recorrerían como ids
+    if not isinstance(ids, list) or not all(type(x) is int for x in ids):
+        return JsonResponse(
+            {"success": False, "error": "documentos debe ser una lista de ids numéricos."},
+            status=400,
+        )
+
+    if not ids or len(ids) > DOCUMENTOS_MASIVO_MAX:
+        return JsonResponse(
+            {"success": False, "error": f"Indica entre 1 y {DOCUMENTOS_MASIVO_MAX} documentos."},
+            status=400,
+        )
+
+    try:
+        resultado = cambiar_proyecto(ids, datos.get("accion"), proyecto_id)
+    except ValueError as exc:
+        return JsonResponse({"success": False, "error": str(exc)}, status=400)
+
+    return JsonResponse({
+        "success": True,
+        "actualizados": resultado["actualizados"],
+        "omitidos": {str(doc_id): motivo for doc_id, motivo in resultado["omitidos"].items()},
     })
 
+
 @csrf_exempt
 def api_quitar_documento(request, doc_id):
+    """Quita un documento de su proyecto (también en /facturacion/api/documento/<id>/quitar/)."""
     if request.method != "POST":
         return JsonResponse({"success": False, "error": "Método no permitido"})
 
-    doc = get_object_or_404(Documento, pk=doc_id)
-
-    # quitar relación con proyecto
-    doc.proyecto = None
-    doc.save(update_fields=["proyecto"])
+    get_object_or_404(Documento, pk=doc_id)
+    resultado = cambiar_proyecto([doc_id], "quitar")
+    if resultado["omitidos"].get(doc_id) == "documento anulado":
+        return JsonResponse({"success": False, "error": "Documento anulado"})
 
     return JsonResponse({"success": True})
 